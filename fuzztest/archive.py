@@ -0,0 +1,258 @@
+#!/bin/python3
+
+import io
+import json
+import os
+import shutil
+import sys
+import zipfile
+
+import numpy as np
+
+from fuzzers.afl_output import FILE_CHUNK_SIZE, PLOT_DATA_HEADER, file_digest, read_fuzzer_stats
+
+
+ARCHIVE_NAME = 'campaign.zip'
+# Bump whenever the layout of the archive changes.
+ARCHIVE_VERSION = 1
+
+# Members of the archive
+META_MEMBER = 'archive.json'
+PLOT_DATA_MEMBER = 'plot_data.npz'
+FUZZER_STATS_MEMBER = 'fuzzer_stats.json'
+BLOB_DIR = 'blobs'
+
+# Stored as columns and parsed stats instead of blobs, and written back in
+# afl-fuzz's format when unpacked.
+PLOT_DATA_PATH = os.path.join('output', 'plot_data')
+FUZZER_STATS_PATH = os.path.join('output', 'fuzzer_stats')
+PLOT_DATA_FORMAT = '%d, %d, %d, %d, %d, %d, %0.02f%%, %d, %d, %d, %0.02f'
+# Timestamps of the members; those of the packed files are in archive.json.
+MEMBER_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def archive_path(fuzzer_dir):
+    return os.path.join(fuzzer_dir, ARCHIVE_NAME)
+
+
+def is_archived(fuzzer_dir):
+    return os.path.exists(archive_path(fuzzer_dir))
+
+
+class CampaignArchive:
+    """Read a campaign packed by pack_campaign() without unpacking it.
+
+    The archive is a zip of:
+      archive.json       version, and the path, SHA-1, size, mtime and mode
+                         of every file of the campaign directory
+      plot_data.npz      one array per plot_data column, map_size in percent
+      fuzzer_stats.json  the fields of fuzzer_stats, as strings
+      blobs/<sha1>       the content of the other files, once per content
+    """
+
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        self.meta = json.loads(self.zip.read(META_MEMBER))
+        if self.meta.get('version') != ARCHIVE_VERSION:
+            self.zip.close()
+            raise ValueError('{}: unsupported archive version {}'.format(path, self.meta.get('version')))
+        self.entries = {entry['path']: entry for entry in self.meta['files']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def plot_data(self, columns=None):
+        """Return {column: array} of plot_data, or None if the campaign had none."""
+        if PLOT_DATA_MEMBER not in self.zip.namelist():
+            return None
+        with self.zip.open(PLOT_DATA_MEMBER) as f, np.load(io.BytesIO(f.read())) as npz:
+            return {column: npz[column] for column in (columns or npz.files)}
+
+    def fuzzer_stats(self):
+        """Return the fields of fuzzer_stats, {} if the campaign had none."""
+        if FUZZER_STATS_MEMBER not in self.zip.namelist():
+            return {}
+        return json.loads(self.zip.read(FUZZER_STATS_MEMBER))
+
+    def files(self):
+        """Return the paths of the packed files, relative to the campaign."""
+        return list(self.entries)
+
+    def read(self, path):
+        """Return the content of the packed file |path|; KeyError if there is none."""
+        return self.zip.read('{}/{}'.format(BLOB_DIR, self.entries[path]['sha1']))
+
+
+def plot_data_columns(path):
+    """Parse the plot_data at |path| into {column: array}."""
+    from time2bug import PLOT_DATA_COLUMNS, read_plot_data
+    plot_data = read_plot_data(path, PLOT_DATA_COLUMNS)
+    columns = {column: plot_data[column].to_numpy() for column in PLOT_DATA_COLUMNS}
+    columns['map_size'] = np.char.rstrip(columns['map_size'].astype(str), '%').astype(np.float64)
+    return columns
+
+
+def pack_campaign(fuzzer_dir, keep=False):
+    """Pack the directory of a finished campaign into ARCHIVE_NAME in it, and
+    remove everything else unless |keep|. Return (files, distinct blobs)."""
+    path = archive_path(fuzzer_dir)
+    tmp_path = '{}.tmp'.format(path)
+    try:
+        files, blobs = write_archive(fuzzer_dir, tmp_path)
+        with zipfile.ZipFile(tmp_path) as archive:
+            bad = archive.testzip()
+        if bad is not None:
+            raise ValueError('{}: corrupt member {}'.format(tmp_path, bad))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    if not keep:
+        for name in os.listdir(fuzzer_dir):
+            if name == ARCHIVE_NAME:
+                continue
+            child = os.path.join(fuzzer_dir, name)
+            if os.path.isdir(child) and not os.path.islink(child):
+                shutil.rmtree(child)
+            else:
+                os.unlink(child)
+    return files, blobs
+
+
+def write_archive(fuzzer_dir, path):
+    """Write the archive of |fuzzer_dir| to |path|, return (files, distinct blobs)."""
+    files = []
+    dirs = []
+    blobs = set()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, dir_names, file_names in os.walk(fuzzer_dir):
+            dir_names.sort()
+            rel_root = os.path.relpath(root, fuzzer_dir)
+            if rel_root != '.':
+                dirs.append(rel_root)
+            for name in sorted(file_names):
+                file_path = os.path.join(root, name)
+                rel_path = os.path.normpath(os.path.join(rel_root, name))
+                if root == fuzzer_dir and name in (ARCHIVE_NAME, os.path.basename(path)):
+                    continue
+                if rel_path == PLOT_DATA_PATH:
+                    try:
+                        columns = plot_data_columns(file_path)
+                    except ValueError:
+                        # Nothing to parse, e.g. only the header: keep the file as it is.
+                        columns = None
+                    if columns is not None:
+                        buffer = io.BytesIO()
+                        np.savez_compressed(buffer, **columns)
+                        # Already compressed
+                        archive.writestr(PLOT_DATA_MEMBER, buffer.getvalue(), zipfile.ZIP_STORED)
+                        continue
+                if rel_path == FUZZER_STATS_PATH:
+                    archive.writestr(FUZZER_STATS_MEMBER, json.dumps(read_fuzzer_stats(file_path), indent=1))
+                    continue
+
+                st = os.lstat(file_path)
+                entry = {'path': rel_path, 'mtime_ns': st.st_mtime_ns, 'mode': st.st_mode & 0o7777}
+                if os.path.islink(file_path):
+                    entry['link'] = os.readlink(file_path)
+                else:
+                    digest = file_digest(file_path)
+                    entry.update(sha1=digest, size=st.st_size)
+                    if digest not in blobs:
+                        member = zipfile.ZipInfo('{}/{}'.format(BLOB_DIR, digest), MEMBER_DATE_TIME)
+                        member.compress_type = zipfile.ZIP_DEFLATED
+                        with open(file_path, 'rb') as src, archive.open(member, 'w') as dst:
+                            shutil.copyfileobj(src, dst, FILE_CHUNK_SIZE)
+                        blobs.add(digest)
+                files.append(entry)
+
+        archive.writestr(META_MEMBER, json.dumps({'version': ARCHIVE_VERSION, 'files': files, 'dirs': dirs}))
+    return len(files), len(blobs)
+
+
+def unpack_campaign(fuzzer_dir):
+    """Restore the directory of a campaign from its archive and remove it."""
+    path = archive_path(fuzzer_dir)
+    with CampaignArchive(path) as archive:
+        for rel_dir in archive.meta['dirs']:
+            os.makedirs(os.path.join(fuzzer_dir, rel_dir), exist_ok=True)
+
+        plot_data = archive.plot_data()
+        if plot_data is not None:
+            from time2bug import PLOT_DATA_COLUMNS
+            with open(os.path.join(fuzzer_dir, PLOT_DATA_PATH), 'w') as f:
+                f.write(PLOT_DATA_HEADER)
+                # Not np.savetxt(), which cannot format the '%%' of map_size.
+                for row in zip(*(plot_data[column].tolist() for column in PLOT_DATA_COLUMNS)):
+                    f.write(PLOT_DATA_FORMAT % row + '\n')
+        stats = archive.fuzzer_stats()
+        if stats:
+            with open(os.path.join(fuzzer_dir, FUZZER_STATS_PATH), 'w') as f:
+                f.write(''.join('{:<18}: {}\n'.format(key, value) for key, value in stats.items()))
+
+        for entry in archive.meta['files']:
+            file_path = os.path.join(fuzzer_dir, entry['path'])
+            if 'link' in entry:
+                os.symlink(entry['link'], file_path)
+                continue
+            with open(file_path, 'wb') as f:
+                f.write(archive.read(entry['path']))
+            os.chmod(file_path, entry['mode'])
+            os.utime(file_path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+    os.unlink(path)
+
+
+def finished_campaigns(results_dir, everything=False):
+    """Yield (key, fuzzer_dir) of the campaigns of |results_dir| that are not
+    archived yet and that the experiment manifest records as done; all of
+    them with |everything| or if there is no manifest."""
+    from manifest import DONE, MANIFEST_NAME, Manifest
+    from time2bug import iter_campaigns
+
+    manifest = None
+    if not everything and os.path.exists(os.path.join(results_dir, MANIFEST_NAME)):
+        manifest = Manifest(os.path.join(results_dir, MANIFEST_NAME))
+    for trial, target, fuzzer, fuzzer_dir in iter_campaigns(results_dir):
+        key = '{}/{}/{}'.format(trial, target, fuzzer)
+        if is_archived(fuzzer_dir):
+            continue
+        if manifest is not None and manifest.entries.get(key, {}).get('state') != DONE:
+            continue
+        yield key, fuzzer_dir
+
+
+if __name__ == '__main__':
+    import argparse
+    from time2bug import iter_campaigns
+
+    parser = argparse.ArgumentParser(description='Pack finished campaigns into one file each, or unpack them')
+    parser.add_argument('results_dir', type=str, help='results directory of run_fuzz.py')
+    parser.add_argument('--all', action='store_true', help='also pack campaigns the manifest does not record as done')
+    parser.add_argument('--keep', action='store_true', help='keep the packed files next to the archive')
+    parser.add_argument('--unpack', action='store_true', help='restore the campaign directories from their archives')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print('Error: {} is not a directory'.format(args.results_dir), file=sys.stderr)
+        sys.exit(1)
+
+    if args.unpack:
+        for trial, target, fuzzer, fuzzer_dir in iter_campaigns(args.results_dir):
+            if is_archived(fuzzer_dir):
+                unpack_campaign(fuzzer_dir)
+                print('[+] {}/{}/{}: unpacked'.format(trial, target, fuzzer), file=sys.stderr)
+        sys.exit(0)
+
+    for key, fuzzer_dir in finished_campaigns(args.results_dir, args.all):
+        files, blobs = pack_campaign(fuzzer_dir, args.keep)
+        print('[+] {}: {} files, {} distinct, {} bytes'.format(
+            key, files, blobs, os.path.getsize(archive_path(fuzzer_dir))), file=sys.stderr)
@@ -0,0 +1,221 @@
+#!/bin/python3
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from fuzzers.profiles import build_name, get_profile
+
+
+# Bump whenever the layout of the results changes.
+BENCH_VERSION = 1
+
+# Seconds of each phase, in the order they happen: image builds (one record
+# per image, see run_fuzz.build_images), then the startup of a campaign in
+# its fuzzer image (see fuzz.py bench). wall is the whole `docker run`.
+BUILD_PHASES = ['base', 'target', 'fuzzer']
+STARTUP_PHASES = ['seed_prep', 'forkserver', 'dry_run', 'first_exec', 'wall']
+PHASES = BUILD_PHASES + STARTUP_PHASES
+
+
+def revision():
+    """Return the commit the harness is at, with -dirty if it has changes."""
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty', '--abbrev=12'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_startup(target, fuzzer, runs):
+    """Start |runs| campaigns of |fuzzer| on |target| up to their first exec
+    and return their timings, None if one failed."""
+    from run_fuzz import run_cache_step
+
+    samples = []
+    for run in range(runs):
+        start = time.time()
+        output = run_cache_step(target, fuzzer, [], ['bench'])
+        wall = time.time() - start
+        if output is None:
+            print('[-] Failed to start {} on {}'.format(fuzzer, target), file=sys.stderr)
+            return None
+        sample = json.loads(output)
+        sample['wall'] = round(wall, 3)
+        samples.append(sample)
+    return samples
+
+
+def phase_table(result):
+    """Return {(target, fuzzer): {phase: seconds}} of a benchmark result, the
+    median of the runs for the startup phases."""
+    builds = {record['image']: record for record in result['builds'] if record['ok']}
+    table = {}
+    for entry in result['startup']:
+        target, fuzzer = entry['target'], entry['fuzzer']
+        target_tag = os.path.join('fuzztest', 'target', target)
+        images = {
+            'base': 'fuzztest/base',
+            'target': target_tag,
+            'fuzzer': os.path.join(target_tag, build_name(fuzzer)),
+        }
+        phases = {phase: builds[image]['seconds'] for phase, image in images.items() if image in builds}
+        if entry['runs']:
+            for phase in STARTUP_PHASES:
+                phases[phase] = round(statistics.median(run[phase] for run in entry['runs']), 3)
+        table[(target, fuzzer)] = phases
+    return table
+
+
+def run_bench(targets, fuzzers, runs, out_dir, build=True, cached=False, parallel=0):
+    """Build the images of |targets| and |fuzzers| from scratch, unless
+    |cached| or not |build|, then time the startup of each pair |runs| times.
+    Return the result, written to |out_dir|/<revision>.json."""
+    from run_fuzz import build_images, print_build_times
+
+    result = {
+        'version': BENCH_VERSION,
+        'revision': revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'cached': cached,
+        'builds': [],
+        'startup': [],
+    }
+
+    if build:
+        log_dir = os.path.join(out_dir, 'build_logs')
+        os.makedirs(log_dir, exist_ok=True)
+        result['builds'] = build_images(targets, fuzzers, max(parallel, 1), log_dir, quiet=parallel > 0,
+                                        no_cache=not cached)
+        print_build_times(result['builds'])
+
+    for target in targets:
+        for fuzzer in fuzzers:
+            samples = bench_startup(target, fuzzer, runs)
+            result['startup'].append({'target': target, 'fuzzer': fuzzer, 'ok': samples is not None, 'runs': samples or []})
+
+    path = os.path.join(out_dir, '{}.json'.format(result['revision']))
+    with open(path + '.tmp', 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(path + '.tmp', path)
+    print('[+] Results: {}'.format(path))
+    return result
+
+
+def format_seconds(seconds):
+    return '{:>9.2f}'.format(seconds) if seconds is not None else '{:>9}'.format('-')
+
+
+def print_table(result, baseline=None):
+    """Print the phases of every target and fuzzer, and with |baseline| the
+    overhead of each fuzzer over that one on the same target."""
+    table = phase_table(result)
+    row = '{{:<{}}} {{:<{}}} {{}}'.format(max([len('target')] + [len(target) for target, _ in table]),
+                                         max([len('fuzzer'), len('vs {}'.format(baseline))] + [len(fuzzer) for _, fuzzer in table]))
+    print(row.format('target', 'fuzzer', ' '.join('{:>9}'.format(phase[:9]) for phase in PHASES)))
+    for (target, fuzzer), phases in sorted(table.items()):
+        print(row.format(target, fuzzer, ' '.join(format_seconds(phases.get(phase)) for phase in PHASES)))
+        base = table.get((target, baseline))
+        if base is None or fuzzer == baseline:
+            continue
+        overhead = []
+        for phase in PHASES:
+            if phases.get(phase) is not None and base.get(phase):
+                overhead.append('{:>+8.0%}'.format(phases[phase] / base[phase] - 1) + ' ')
+            else:
+                overhead.append('{:>9}'.format('-'))
+        print(row.format('', 'vs ' + baseline, ' '.join(overhead)))
+
+
+def compare(old, new, threshold, min_seconds):
+    """Print the phases of two results side by side; return the regressions,
+    phases that got slower by more than |threshold| and |min_seconds|."""
+    old_table = phase_table(old)
+    new_table = phase_table(new)
+    regressions = []
+    keys = sorted(set(old_table) & set(new_table))
+    row = '{{}} {{:<{}}} {{:<{}}} {{:<11}} {{}} {{}} {{:>+8.1%}}'.format(
+        max([0] + [len(target) for target, _ in keys]), max([0] + [len(fuzzer) for _, fuzzer in keys]))
+    print('{} -> {}'.format(old['revision'], new['revision']))
+    for key in keys:
+        for phase in PHASES:
+            before = old_table[key].get(phase)
+            after = new_table[key].get(phase)
+            if before is None or after is None:
+                continue
+            slower = after - before > max(before * threshold, min_seconds)
+            if slower:
+                regressions.append((key, phase))
+            print(row.format(
+                '!' if slower else ' ', key[0], key[1], phase, format_seconds(before), format_seconds(after),
+                after / before - 1 if before else 0))
+    return regressions
+
+
+def load_result(path):
+    with open(path, 'r') as f:
+        result = json.load(f)
+    if result.get('version') != BENCH_VERSION:
+        raise ValueError('{}: unsupported benchmark version {}'.format(path, result.get('version')))
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Time the image builds and the startup of campaigns, or compare two such benchmarks')
+    parser.add_argument('-f', '--fuzzers', nargs='+', help='fuzzers to benchmark')
+    parser.add_argument('-t', '--targets', nargs='+', help='targets to benchmark')
+    parser.add_argument('-n', '--runs', type=int, help='startups to time per target and fuzzer', default=3)
+    parser.add_argument('-pb', '--parallel-build', type=int, help='parallel count of builders', default=0)
+    parser.add_argument('--cached', action='store_true', help='time builds with the docker build cache instead of from scratch')
+    parser.add_argument('--no-build', action='store_true', help='only time the startup, in the images built already')
+    parser.add_argument('--baseline', type=str, help='fuzzer to report the overhead of the others against, e.g. afl', default=None)
+    parser.add_argument('-o', '--out-dir', type=str, help='directory to store the results, one <revision>.json per run', default='./bench_results')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results instead, exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, help='relative slowdown of a phase counted as a regression', default=0.1)
+    parser.add_argument('--min-seconds', type=float, help='slowdowns below this many seconds are noise', default=1.0)
+
+    args = parser.parse_args()
+
+    if args.compare:
+        try:
+            old, new = [load_result(path) for path in args.compare]
+        except (OSError, ValueError) as e:
+            print('[-] {}'.format(e), file=sys.stderr)
+            sys.exit(1)
+        regressions = compare(old, new, args.threshold, args.min_seconds)
+        if regressions:
+            print('[-] {} phases slower: {}'.format(len(regressions), ', '.join(
+                '{}/{}:{}'.format(target, fuzzer, phase) for (target, fuzzer), phase in regressions)))
+            sys.exit(1)
+        sys.exit(0)
+
+    if not args.targets or not args.fuzzers:
+        parser.error('--targets and --fuzzers are required')
+    if args.runs < 1:
+        parser.error('--runs must be at least 1')
+    for fuzzer in args.fuzzers:
+        try:
+            profile = get_profile(fuzzer)
+        except ValueError as e:
+            parser.error(str(e))
+        if profile['coverage']:
+            parser.error('{} is a coverage build, it does not fuzz'.format(fuzzer))
+    if args.baseline is not None and args.baseline not in args.fuzzers:
+        parser.error('--baseline must be one of --fuzzers')
+
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    result = run_bench(args.targets, args.fuzzers, args.runs, out_dir, build=not args.no_build, cached=args.cached,
+                       parallel=args.parallel_build)
+    print_table(result, args.baseline)
+
+    if not all(record['ok'] for record in result['builds']) or not all(entry['ok'] for entry in result['startup']):
+        print('[-] Failed!')
+        sys.exit(1)
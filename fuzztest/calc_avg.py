@@ -1,44 +1,149 @@
+import math
+import os
+
+import numpy as np
 import pandas as pd
 
+from time2bug import RESULTS_HEADER, index_results
+
+
+# Column names used by other result tables, e.g. notebooks/fuzzbench.csv
+COLUMN_ALIASES = {
+    'subject': 'target',
+    'crashes': 'total_crashes',
+}
+
+# Upper bound of resampled values held in memory at once while bootstrapping.
+BOOTSTRAP_CHUNK_ELEMENTS = 1 << 22
+
+
+def load_results(path):
+    """Load a results CSV, or index a results directory on the fly."""
+    if os.path.isdir(path):
+        # Read straight from the incremental index of the results directory.
+        return pd.DataFrame(index_results(path), columns=RESULTS_HEADER.split(','))
+
+    results = pd.read_csv(path, skipinitialspace=True).rename(columns=COLUMN_ALIASES)
+    # Anything that is not a time, e.g. 'Timeout', means no crash was found.
+    results['tte'] = pd.to_numeric(results['tte'], errors='coerce').fillna(-1)
+    if 'distinct_bugs' not in results:
+        # Results from before triage.py: not triaged.
+        results['distinct_bugs'] = -1
+        results['bug_ttes'] = ''
+    # An empty field is read as NaN.
+    results['bug_ttes'] = results['bug_ttes'].fillna('')
+    return results
+
+
+def bug_hashes(bug_ttes):
+    """Return the stack hashes of a bug_ttes column value."""
+    return [bug.split(':', 1)[0] for bug in bug_ttes.split(';') if bug]
+
+
+def bootstrap_mean_ci(values, n_boot, confidence, rng):
+    """Return the percentile bootstrap confidence interval of the mean of |values|."""
+    n = len(values)
+    if n == 0 or n_boot <= 0:
+        return np.nan, np.nan
+
+    means = np.empty(n_boot)
+    chunk = max(1, BOOTSTRAP_CHUNK_ELEMENTS // n)
+    for start in range(0, n_boot, chunk):
+        stop = min(start + chunk, n_boot)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[idx].mean(axis=1)
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return low, high
+
+
+def mann_whitney_a12(x, y):
+    """Compare samples |x| and |y| where lower values are better.
+
+    Return (u, p, a12): the Mann-Whitney U statistic of |x|, its two-sided
+    p-value (normal approximation with tie and continuity correction) and the
+    Vargha-Delaney A12, i.e. the probability that a value of |x| is lower than
+    one of |y|, counting ties as half."""
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return np.nan, np.nan, np.nan
+
+    ranks = pd.Series(np.concatenate([x, y])).rank().to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    a12 = 1 - u / (n1 * n2)
+
+    n = n1 + n2
+    _, ties = np.unique(ranks, return_counts=True)
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0, a12
+
+    z = (abs(u - n1 * n2 / 2) - 0.5) / sigma
+    p = min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+    return u, p, a12
+
+
+def summarize(results, baseline=None, n_boot=1000, confidence=0.95, seed=0):
+    """Aggregate per (target, fuzzer) statistics of |results|.
+
+    A tte of -1 means the trial found no crash: it is excluded from the tte
+    statistics and ranked last when comparing against |baseline|. Distinct bug
+    statistics only count triaged trials; bugs_union is the number of distinct
+    bugs found by any of them."""
+    results = results.assign(
+        tte=results['tte'].where(results['tte'] != -1),
+        total_crashes=results['total_crashes'].where(results['total_crashes'] != 0),
+        distinct_bugs=results['distinct_bugs'].where(results['distinct_bugs'] != -1))
+
+    groups = results.groupby(['target', 'fuzzer'], sort=False)
+    summary = groups.agg(
+        valuable_count=('tte', 'count'),
+        tte_avg=('tte', 'mean'),
+        tte_median=('tte', 'median'),
+        crashes_avg=('total_crashes', 'mean'),
+        crashes_median=('total_crashes', 'median'),
+        bugs_avg=('distinct_bugs', 'mean'),
+        bugs_median=('distinct_bugs', 'median'),
+        bugs_union=('bug_ttes', lambda column: len(set(h for value in column for h in bug_hashes(value)))))
+    quartiles = groups['tte'].quantile([0.25, 0.75]).unstack()
+    summary['tte_iqr'] = quartiles[0.75] - quartiles[0.25]
+
+    rng = np.random.default_rng(seed)
+    samples = {key: group.to_numpy(dtype=float) for key, group in groups['tte']}
+    ci = [bootstrap_mean_ci(values[~np.isnan(values)], n_boot, confidence, rng)
+          for values in (samples[key] for key in summary.index)]
+    summary['tte_ci_low'] = [low for low, _ in ci]
+    summary['tte_ci_high'] = [high for _, high in ci]
+
+    if baseline is not None:
+        stats = []
+        for target, fuzzer in summary.index:
+            if fuzzer == baseline or (target, baseline) not in samples:
+                stats.append((np.nan, np.nan, np.nan))
+                continue
+            x = np.nan_to_num(samples[(target, fuzzer)], nan=np.inf)
+            y = np.nan_to_num(samples[(target, baseline)], nan=np.inf)
+            stats.append(mann_whitney_a12(x, y))
+        summary['mwu_u'] = [u for u, _, _ in stats]
+        summary['mwu_p'] = [p for _, p, _ in stats]
+        summary['a12'] = [a12 for _, _, a12 in stats]
+
+    # Keep the historical output: averages are 0 when nothing was found.
+    summary[['tte_avg', 'crashes_avg']] = summary[['tte_avg', 'crashes_avg']].fillna(0)
+    return summary.reset_index()
+
 
 if __name__ == '__main__':
-    import sys
-
-    if len(sys.argv) != 2:
-        print('Usage: calc_tte.py <results.csv>')
-        sys.exit(1)
-    
-    results = pd.read_csv(sys.argv[1])
-
-    print('target,fuzzer,valuable_count,tte_avg,crashes_avg')
-    targets = {}
-    for index, row in results.iterrows():
-        if row['target'] not in targets:
-            targets[row['target']] = {}
-        
-        if row['fuzzer'] not in targets[row['target']]:
-            targets[row['target']][row['fuzzer']] = [[], []]
-        
-        if row['tte'] != -1:
-            targets[row['target']][row['fuzzer']][0].append(row['tte'])
-        if row['total_crashes'] != 0:
-            targets[row['target']][row['fuzzer']][1].append(row['total_crashes'])
-    
-    for target in targets:
-        for fuzzer in targets[target]:
-            valuable_count = len(targets[target][fuzzer][0])
-            if valuable_count == 0:
-                tte_avg = None
-            else:
-                tte_avg = sum(targets[target][fuzzer][0]) / len(targets[target][fuzzer][0])
-            
-            if len(targets[target][fuzzer][1]) == 0:
-                crashes_avg = None
-            else:
-                crashes_avg = sum(targets[target][fuzzer][1]) / len(targets[target][fuzzer][1])
-            
-            str_tte_avg = '0' if tte_avg is None else '{:.4f}'.format(tte_avg)
-            str_crashes_avg = '0' if crashes_avg is None else '{:.4f}'.format(crashes_avg)
-            print(f'{target},{fuzzer},{valuable_count},{str_tte_avg},{str_crashes_avg}')
-            
-            
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Calculate TTE and crash statistics')
+    parser.add_argument('results', type=str, help='results csv of time2bug, or a results directory')
+    parser.add_argument('-b', '--baseline', type=str, help='fuzzer to compare the others against', default=None)
+    parser.add_argument('--bootstrap', type=int, help='bootstrap resamples for confidence intervals, 0 to disable', default=1000)
+    parser.add_argument('--confidence', type=float, help='confidence level of the intervals', default=0.95)
+    parser.add_argument('--seed', type=int, help='seed of the bootstrap', default=0)
+
+    args = parser.parse_args()
+
+    summary = summarize(load_results(args.results), args.baseline, args.bootstrap, args.confidence, args.seed)
+    print(summary.to_csv(index=False, float_format='%.4f'), end='')
@@ -0,0 +1,200 @@
+#!/bin/python3
+
+import asyncio
+import collections
+import os
+import shlex
+import time
+
+from topology import Slot
+
+
+# Default ssh command; BatchMode fails instead of prompting for a password.
+SSH_COMMAND = 'ssh -o BatchMode=yes'
+
+# Seconds between two pulls of the output of a running remote campaign.
+PULL_INTERVAL = 60
+# Files changed this long before a pull started are fetched again by the next
+# one: covers files written while the pull ran and some clock skew.
+PULL_SLACK = 60
+
+# Seed corpora pushed to a node, under its data directory.
+REMOTE_SEED_DIR = '.seed_cache'
+
+# A node of the inventory: ssh destination, cpus to run campaigns on, and the
+# directory results are written to on that node.
+Host = collections.namedtuple('Host', ['name', 'cores', 'data_dir'])
+
+
+def read_inventory(path, default_data_dir):
+    """Parse a host inventory: one `<host> <cores> [<data dir>]` per line.
+
+    The data directory defaults to |default_data_dir|, the one used locally."""
+    hosts = []
+    with open(path, 'r') as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (2, 3) or not fields[1].isdigit() or int(fields[1]) < 1:
+                raise ValueError('{}:{}: expected `<host> <cores> [<data dir>]`'.format(path, lineno))
+            data_dir = fields[2] if len(fields) == 3 else default_data_dir
+            if not os.path.isabs(data_dir):
+                raise ValueError('{}:{}: the data dir of {} must be absolute'.format(path, lineno, fields[0]))
+            hosts.append(Host(fields[0], int(fields[1]), data_dir))
+    if not hosts:
+        raise ValueError('{}: no host'.format(path))
+    if len(set(host.name for host in hosts)) != len(hosts):
+        raise ValueError('{}: a host is listed twice'.format(path))
+    return hosts
+
+
+def plan_slots(hosts):
+    """Return one slot per core of every host, taking cores from the hosts in
+    turn so that campaigns are spread over all of them."""
+    slots = []
+    for cpu in range(max(host.cores for host in hosts)):
+        for host in hosts:
+            if cpu < host.cores:
+                slots.append(Slot(cpu, None, host.name))
+    return slots
+
+
+async def run_piped(producer, consumer):
+    """Run |producer| | |consumer|, return the stdout of the consumer, or None
+    if either failed."""
+    read_fd, write_fd = os.pipe()
+    try:
+        producer_proc = await asyncio.create_subprocess_exec(*producer, stdin=asyncio.subprocess.DEVNULL,
+                                                             stdout=write_fd, stderr=asyncio.subprocess.DEVNULL)
+        os.close(write_fd)
+        write_fd = None
+        consumer_proc = await asyncio.create_subprocess_exec(*consumer, stdin=read_fd,
+                                                             stdout=asyncio.subprocess.PIPE,
+                                                             stderr=asyncio.subprocess.DEVNULL)
+        os.close(read_fd)
+        read_fd = None
+        output, _ = await consumer_proc.communicate()
+        ok = await producer_proc.wait() == 0 and consumer_proc.returncode == 0
+    finally:
+        for fd in (read_fd, write_fd):
+            if fd is not None:
+                os.close(fd)
+    return output if ok else None
+
+
+class Cluster:
+    """Run campaigns on the nodes of an inventory over ssh.
+
+    A campaign runs in the data directory of its node, at the same place
+    relative to it as locally, and its output directory is pulled back as a
+    compressed tar stream every PULL_INTERVAL seconds. The first pull of every
+    run copies the whole directory and removes the local files that are gone
+    on the node; later pulls only carry files changed since the previous one.
+    |ssh| is the argv that runs a command on a host, e.g. ssh-local to run
+    everything on this machine."""
+
+    def __init__(self, hosts, data_dir, ssh=SSH_COMMAND):
+        self.hosts = {host.name: host for host in hosts}
+        self.data_dir = data_dir
+        self.ssh = shlex.split(ssh)
+        self.pushed_seeds = {}
+
+    def remote(self, host):
+        """Return the argv prefix running a command on |host|."""
+        return self.ssh + [host]
+
+    def command(self, host, command):
+        return self.remote(host) + [shlex.join(command)]
+
+    def remote_path(self, host, path):
+        """Return where local |path| under the data directory lives on |host|."""
+        return os.path.join(self.hosts[host].data_dir, os.path.relpath(path, self.data_dir))
+
+    async def run(self, host, command):
+        proc = await asyncio.create_subprocess_exec(*self.command(host, command),
+                                                    stdin=asyncio.subprocess.DEVNULL,
+                                                    stdout=asyncio.subprocess.DEVNULL,
+                                                    stderr=asyncio.subprocess.DEVNULL)
+        return await proc.wait() == 0
+
+    async def push(self, host, local_dir, remote_dir):
+        """Copy the directory |local_dir| to |remote_dir| on |host|, both with
+        the same name."""
+        remote_parent = os.path.dirname(remote_dir)
+        unpack = 'mkdir -p {0} && rm -rf {1} && tar -xzf - -C {0}'.format(shlex.quote(remote_parent), shlex.quote(remote_dir))
+        pack = ['tar', '-czf', '-', '-C', os.path.dirname(local_dir), os.path.basename(local_dir)]
+        return await run_piped(pack, self.remote(host) + [unpack]) is not None
+
+    async def push_seeds(self, host, seed_dir):
+        """Copy a cached seed corpus to |host| once, return its path there."""
+        # Cached corpora are named by their key, the same name is the same seeds.
+        remote_dir = os.path.join(self.hosts[host].data_dir, REMOTE_SEED_DIR,
+                                  os.path.basename(os.path.dirname(seed_dir)), os.path.basename(seed_dir))
+        key = (host, remote_dir)
+        if key not in self.pushed_seeds:
+            self.pushed_seeds[key] = asyncio.ensure_future(self.push(host, seed_dir, remote_dir))
+        if not await self.pushed_seeds[key]:
+            self.pushed_seeds.pop(key, None)
+            return None
+        return remote_dir
+
+    async def prepare(self, campaign, host):
+        """Set up the directories of |campaign| on |host|; return the campaign
+        with its paths there, or None on failure.
+
+        A resumed campaign gets its local output directory, which is where it
+        was pulled to, a new one starts from an empty one."""
+        fuzz_dir = self.remote_path(host, campaign.fuzz_dir)
+        seed_dir = None
+        if campaign.seed_dir is not None:
+            seed_dir = await self.push_seeds(host, campaign.seed_dir)
+            if seed_dir is None:
+                return None
+
+        output_dir = os.path.join(fuzz_dir, 'output')
+        ok = await self.run(host, ['sh', '-c', 'mkdir -p {0} && rm -rf {1} && mkdir {1}'.format(
+            shlex.quote(os.path.join(fuzz_dir, 'input')), shlex.quote(output_dir))])
+        if ok and campaign.resume:
+            ok = await self.push(host, os.path.join(campaign.fuzz_dir, 'output'), output_dir)
+        if not ok:
+            return None
+        return campaign._replace(fuzz_dir=fuzz_dir, seed_dir=seed_dir)
+
+    async def pull(self, host, campaign, since=None):
+        """Fetch the output directory of |campaign| from |host|: the files
+        changed after |since|, or all of it, removing local files that are
+        not on the host. Return True on success."""
+        pack = ['tar', '-czf', '-', '-C', self.remote_path(host, campaign.fuzz_dir)]
+        if since is not None:
+            pack.append('--newer-mtime=@{}'.format(int(since)))
+        pack.append('output')
+        # -v lists the members unpacked
+        names = await run_piped(self.command(host, pack), ['tar', '-xzvf', '-', '-C', campaign.fuzz_dir])
+        if names is None:
+            return False
+
+        if since is None:
+            names = set(os.path.normpath(name) for name in names.decode(errors='replace').splitlines())
+            output_dir = os.path.join(campaign.fuzz_dir, 'output')
+            for root, _, files in os.walk(output_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if os.path.relpath(path, campaign.fuzz_dir) not in names:
+                        os.unlink(path)
+        return True
+
+    async def follow(self, host, campaign, exited):
+        """Pull the output of |campaign| every PULL_INTERVAL seconds, and once
+        more when the event |exited| is set."""
+        since = None
+        while not exited.is_set():
+            try:
+                await asyncio.wait_for(exited.wait(), PULL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            start = time.time()
+            if await self.pull(host, campaign, since):
+                since = start - PULL_SLACK
+            elif exited.is_set():
+                print('[-] Failed to pull the output of {} from {}'.format(campaign.fuzz_dir, host))
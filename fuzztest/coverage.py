@@ -0,0 +1,105 @@
+#!/bin/python3
+
+import collections
+import os
+import shutil
+import sys
+import tempfile
+
+
+COVERAGE_NAME = 'coverage.csv'
+# Profile of the source-based coverage build, see fuzzers/profiles.py.
+COVERAGE_PROFILE = 'coverage'
+
+
+def queue_mtime(output_dir):
+    """Return the latest mtime of the queue directories of |output_dir|,
+    which changes whenever an input is added or removed, or None if there is
+    no queue."""
+    queue_dirs = [os.path.join(output_dir, 'queue')]
+    for name in sorted(os.listdir(output_dir)):
+        if os.path.exists(os.path.join(output_dir, name, 'fuzzer_stats')):
+            queue_dirs.append(os.path.join(output_dir, name, 'queue'))
+    mtimes = [os.stat(queue_dir).st_mtime_ns for queue_dir in queue_dirs if os.path.isdir(queue_dir)]
+    return max(mtimes, default=None)
+
+
+def build_coverage(targets):
+    """Build the coverage image of each of |targets| on top of its history
+    image, which run_fuzz.py --build must have built."""
+    from run_fuzz import build_fuzzer
+    return all([build_fuzzer(COVERAGE_PROFILE, target) for target in targets])
+
+
+def measure_results(results_dir, cache_dir, interval, force=False):
+    """Measure the coverage over time of every campaign of |results_dir|
+    whose queue changed since its last measurement, or all of them with
+    |force|, into <campaign>/COVERAGE_NAME.
+
+    The campaigns of a target are measured by one container of its coverage
+    image; the coverage of every input is cached under |cache_dir|/<target>."""
+    from run_fuzz import run_cache_step
+    from time2bug import iter_campaigns
+
+    groups = collections.defaultdict(list)
+    for trial, target, fuzzer, fuzzer_dir in iter_campaigns(results_dir):
+        output_dir = os.path.join(fuzzer_dir, 'output')
+        mtime = queue_mtime(output_dir) if os.path.isdir(output_dir) else None
+        if mtime is None:
+            continue
+        series_path = os.path.join(fuzzer_dir, COVERAGE_NAME)
+        if force or not os.path.exists(series_path) or os.stat(series_path).st_mtime_ns < mtime:
+            groups[target].append((trial, fuzzer, fuzzer_dir))
+
+    for target, campaigns in groups.items():
+        target_cache_dir = os.path.join(cache_dir, target)
+        os.makedirs(target_cache_dir, exist_ok=True)
+        series_dir = tempfile.mkdtemp(prefix='.series-', dir=target_cache_dir)
+        try:
+            output_dirs = [os.path.join('/results', os.path.relpath(fuzzer_dir, results_dir), 'output')
+                           for _, _, fuzzer_dir in campaigns]
+            key = run_cache_step(target, COVERAGE_PROFILE,
+                                 [(results_dir, '/results:ro'), (target_cache_dir, '/coverage'), (series_dir, '/series')],
+                                 ['coverage', '/coverage', '/series', str(interval)] + output_dirs)
+            if key is None:
+                print('[-] Failed to measure the coverage of {}'.format(target), file=sys.stderr)
+                continue
+
+            for idx, (trial, fuzzer, fuzzer_dir) in enumerate(campaigns):
+                series_path = os.path.join(fuzzer_dir, COVERAGE_NAME)
+                shutil.copy(os.path.join(series_dir, '{}.csv'.format(idx)), series_path + '.tmp')
+                os.replace(series_path + '.tmp', series_path)
+                with open(series_path, 'r') as f:
+                    last = f.read().splitlines()[-1].split(',')
+                print('[+] {}/{}/{}: {} inputs, {} of {} lines covered'.format(
+                    trial, target, fuzzer, last[1], last[2], last[3]), file=sys.stderr)
+        finally:
+            shutil.rmtree(series_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure the source coverage over time of all campaigns')
+    parser.add_argument('results_dir', type=str, help='results directory of run_fuzz.py')
+    parser.add_argument('-b', '--build', action='store_true', help='build the coverage images of the targets first')
+    parser.add_argument('--interval', type=float, help='seconds of fuzzing between two points of a series', default=15 * 60)
+    parser.add_argument('--cache-dir', type=str, help='directory to store the coverage of every input', default='./coverage_cache')
+    parser.add_argument('-f', '--force', action='store_true', help='measure campaigns again even if their queue did not change')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print('Error: {} is not a directory'.format(args.results_dir), file=sys.stderr)
+        sys.exit(1)
+    if args.interval <= 0:
+        parser.error('--interval must be positive')
+
+    results_dir = os.path.abspath(args.results_dir)
+    if args.build:
+        from time2bug import iter_campaigns
+        targets = sorted(set(target for _, target, _, _ in iter_campaigns(results_dir)))
+        if not build_coverage(targets):
+            print('[-] Failed!', file=sys.stderr)
+            sys.exit(1)
+
+    measure_results(results_dir, os.path.abspath(args.cache_dir), args.interval, args.force)
@@ -0,0 +1,84 @@
+#!/bin/python3
+
+# Reading the output directory afl-fuzz and the driver leave for a campaign.
+# The driver (fuzz.py, copied next to this file into the fuzzer images) and
+# the host scripts (triage.py, archive.py, time2bug.py) share these, so the
+# crashes they see and the times they map them to cannot drift apart.
+
+import hashlib
+import json
+import os
+
+
+FUZZER_STATS = 'fuzzer_stats'
+PLOT_DATA_HEADER = ('# unix_time, cycles_done, cur_path, paths_total, pending_total, pending_favs, '
+                    'map_size, unique_crashes, unique_hangs, max_depth, execs_per_sec\n')
+# start_time of the first run, offset: seconds not fuzzed so far, resumes, and
+# history: [resume time, offset then] of every resume, oldest first, to map
+# the mtimes of crashes and queue entries to fuzzing time.
+RESUME_STATE = 'resume.json'
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def read_fuzzer_stats(path):
+    """Parse a fuzzer_stats file into a dict of strings."""
+    stats = {}
+    with open(path, 'r') as f:
+        for line in f:
+            key, sep, value = line.partition(':')
+            if sep:
+                stats[key.strip()] = value.strip()
+    return stats
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        chunk = f.read(FILE_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(FILE_CHUNK_SIZE)
+    return digest.hexdigest()
+
+
+def instance_dirs(output_dir):
+    """Return |output_dir| and the instance directories of an ensemble in it."""
+    dirs = [output_dir]
+    for name in sorted(os.listdir(output_dir)):
+        if os.path.exists(os.path.join(output_dir, name, FUZZER_STATS)):
+            dirs.append(os.path.join(output_dir, name))
+    return dirs
+
+
+def crash_inputs(output_dir):
+    """Yield the crashing inputs afl-fuzz saved in |output_dir|: its crashes
+    directory, the crashes.<date> directories in-place resumes renamed it to,
+    and the same in every instance directory of an ensemble."""
+    for instance_dir in instance_dirs(output_dir):
+        for name in sorted(os.listdir(instance_dir)):
+            crash_dir = os.path.join(instance_dir, name)
+            if (name == 'crashes' or name.startswith('crashes.')) and os.path.isdir(crash_dir):
+                for crash in sorted(os.listdir(crash_dir)):
+                    if crash.startswith('id:'):
+                        yield os.path.join(crash_dir, crash)
+
+
+def resume_history(output_dir):
+    """Return [(resume time, seconds not fuzzed before it)] of the in-place
+    resumes of the campaign in |output_dir|, oldest first."""
+    try:
+        with open(os.path.join(output_dir, RESUME_STATE), 'r') as f:
+            return [tuple(entry) for entry in json.load(f).get('history', [])]
+    except (OSError, ValueError):
+        return []
+
+
+def fuzzing_time(mtime, start, history):
+    """Return the seconds a campaign started at |start| had fuzzed at the
+    wall-clock |mtime|, leaving out the time it was down before a resume."""
+    downtime = 0
+    for resumed, offset in history:
+        if mtime < resumed:
+            break
+        downtime = offset
+    return max(mtime - start - downtime, 0)
@@ -0,0 +1,142 @@
+// Persistent replay driver of the coverage build, linked in place of the
+// fuzzing engine (see fuzz.py coverage):
+//
+//   <target> replay     reads `<input>\t<record>` lines on stdin, runs each
+//                       input and writes the profile counters it hit to
+//                       <record>, as (uint32 index, uint64 count) pairs
+//   <target> snapshot   reads record paths on stdin and adds their counts up;
+//                       a `@<path>` line writes a raw profile of the sum so
+//                       far to <path>, for llvm-profdata and llvm-cov
+//
+// Counts of separate runs add up like llvm-profdata merge does, so a
+// snapshot is the profile of running all of its inputs in one process.
+
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+uint64_t *__llvm_profile_begin_counters(void);
+uint64_t *__llvm_profile_end_counters(void);
+void __llvm_profile_reset_counters(void);
+void __llvm_profile_set_filename(const char *name);
+int __llvm_profile_write_file(void);
+
+int LLVMFuzzerTestOneInput(const uint8_t *data, size_t size);
+__attribute__((weak)) int LLVMFuzzerInitialize(int *argc, char ***argv);
+
+struct record_entry {
+  uint32_t index;
+  uint64_t count;
+} __attribute__((packed));
+
+static uint8_t *read_file(const char *path, size_t *size) {
+  FILE *f = fopen(path, "rb");
+  if (!f) return NULL;
+  fseek(f, 0, SEEK_END);
+  *size = ftell(f);
+  fseek(f, 0, SEEK_SET);
+  uint8_t *data = malloc(*size ? *size : 1);
+  if (data && fread(data, 1, *size, f) != *size) {
+    free(data);
+    data = NULL;
+  }
+  fclose(f);
+  return data;
+}
+
+static int write_record(const char *path) {
+  const uint64_t *begin = __llvm_profile_begin_counters();
+  const uint64_t *end = __llvm_profile_end_counters();
+  char tmp_path[4096];
+  snprintf(tmp_path, sizeof(tmp_path), "%s.tmp", path);
+
+  FILE *f = fopen(tmp_path, "wb");
+  if (!f) return -1;
+  for (const uint64_t *counter = begin; counter < end; counter++) {
+    if (*counter) {
+      struct record_entry entry = {counter - begin, *counter};
+      fwrite(&entry, sizeof(entry), 1, f);
+    }
+  }
+  if (fclose(f)) return -1;
+  return rename(tmp_path, path);
+}
+
+static char *read_line(char **line, size_t *capacity) {
+  ssize_t length = getline(line, capacity, stdin);
+  if (length <= 0) return NULL;
+  if ((*line)[length - 1] == '\n') (*line)[length - 1] = '\0';
+  return *line;
+}
+
+static int replay(void) {
+  char *line = NULL;
+  size_t capacity = 0;
+  while (read_line(&line, &capacity)) {
+    char *record = strchr(line, '\t');
+    if (!record) continue;
+    *record++ = '\0';
+
+    __llvm_profile_reset_counters();
+    size_t size;
+    uint8_t *data = read_file(line, &size);
+    // An input that is gone covers nothing.
+    if (data) {
+      LLVMFuzzerTestOneInput(data, size);
+      free(data);
+    }
+    if (write_record(record)) {
+      perror(record);
+      return 1;
+    }
+  }
+  return 0;
+}
+
+static int snapshot(void) {
+  uint64_t *begin = __llvm_profile_begin_counters();
+  size_t counters = __llvm_profile_end_counters() - begin;
+  uint64_t *sum = calloc(counters ? counters : 1, sizeof(*sum));
+  char *line = NULL;
+  size_t capacity = 0;
+  while (read_line(&line, &capacity)) {
+    if (line[0] == '@') {
+      memcpy(begin, sum, counters * sizeof(*sum));
+      __llvm_profile_set_filename(line + 1);
+      if (__llvm_profile_write_file()) {
+        fprintf(stderr, "Failed to write %s\n", line + 1);
+        return 1;
+      }
+      continue;
+    }
+
+    FILE *f = fopen(line, "rb");
+    if (!f) {
+      perror(line);
+      return 1;
+    }
+    struct record_entry entry;
+    while (fread(&entry, sizeof(entry), 1, f) == 1) {
+      if (entry.index < counters) sum[entry.index] += entry.count;
+    }
+    fclose(f);
+  }
+  return 0;
+}
+
+int main(int argc, char **argv) {
+  int status = 2;
+  if (LLVMFuzzerInitialize) LLVMFuzzerInitialize(&argc, &argv);
+  if (argc == 2 && !strcmp(argv[1], "replay")) {
+    status = replay();
+  } else if (argc == 2 && !strcmp(argv[1], "snapshot")) {
+    status = snapshot();
+  } else {
+    fprintf(stderr, "Usage: %s replay|snapshot < list\n", argv[0]);
+  }
+  // Skip the profile the runtime writes at exit, records are written above.
+  fflush(stdout);
+  _exit(status);
+}
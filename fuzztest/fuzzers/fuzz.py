@@ -0,0 +1,1178 @@
+#!/bin/python3
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# modify from https://github.com/google/fuzzbench
+
+
+import subprocess
+import os
+import shutil
+import zipfile
+import hashlib
+import json
+import pty
+import re
+import select
+import signal
+import configparser
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import profiles
+from afl_output import (FUZZER_STATS, PLOT_DATA_HEADER, RESUME_STATE, crash_inputs, file_digest, fuzzing_time,
+                        instance_dirs, read_fuzzer_stats, resume_history)
+
+
+INPUT_DIR = '/data/input'
+OUTPUT_DIR = '/data/output'
+PLOT_DATA = 'plot_data'
+# An in-place resume of afl-fuzz starts a new plot_data: the rows of the
+# earlier runs wait here until they are merged back.
+PLOT_DATA_PREV = PLOT_DATA + '.prev'
+# plot_data columns: unix_time, ..., unique_crashes, unique_hangs, ...
+PLOT_UNIX_TIME = 0
+PLOT_UNIQUE_CRASHES = 7
+PLOT_UNIQUE_HANGS = 8
+
+# With FUZZ_INSTANCES > 1, one afl-fuzz -M and the others -S share the output
+# directory as their sync dir (see docs/parallel_fuzzing.txt); the driver sums
+# their fuzzer_stats up into its fuzzer_stats and plot_data, like afl-whatsup,
+# every ENSEMBLE_STATS_INTERVAL seconds.
+ENSEMBLE_MASTER = 'master'
+ENSEMBLE_STATS_INTERVAL = 5
+ENSEMBLE_SUMMED_STATS = ['execs_done', 'execs_per_sec', 'paths_found', 'paths_imported', 'pending_favs',
+                         'pending_total', 'unique_crashes', 'unique_hangs']
+ENSEMBLE_LATEST_STATS = ['last_update', 'cycles_done', 'paths_total', 'max_depth', 'last_path', 'last_crash',
+                         'last_hang']
+
+# With FUZZ_TMPFS_DIR, afl-fuzz writes to that RAM-backed directory instead of
+# the bind-mounted OUTPUT_DIR, which gets a copy of it every
+# FUZZ_CHECKPOINT_INTERVAL seconds and when fuzzing ends.
+CHECKPOINT_INTERVAL = 5 * 60
+CHECKPOINT_SUFFIX = '.checkpoint'
+# Rewritten on every execution, not worth a copy.
+CHECKPOINT_SKIPPED = ['.cur_input']
+
+CORPUS_ELEMENT_BYTES_LIMIT = 1 * 1024 * 1024
+SEED_CHUNK_SIZE = 64 * 1024
+AFL_SHOWMAP = '/afl/afl-showmap'
+CMIN_TIMEOUT_MS = 1000
+# The `triage` command replays every crash once through the target on stdin
+# and keeps the kind and the stack of the sanitizer report.
+TRIAGE_TIMEOUT = 10
+TRIAGE_STACK_FRAMES = 8
+TRIAGE_ASAN_OPTIONS = ['symbolize=1', 'detect_leaks=0', 'allocator_may_return_null=1', 'handle_abort=1',
+                       'handle_segv=1', 'handle_sigbus=1', 'handle_sigfpe=1', 'handle_sigill=1']
+TRIAGE_UBSAN_OPTIONS = ['symbolize=1', 'halt_on_error=1', 'print_stacktrace=1']
+# Frames of the sanitizer runtimes say nothing about the bug.
+TRIAGE_RUNTIME_FRAMES = ('__asan', '__lsan', '__ubsan', '__sanitizer', '__interceptor_', 'asan_', 'ubsan_')
+# The frames below the entry point belong to the driver.
+TRIAGE_ENTRY_FRAME = 'LLVMFuzzerTestOneInput'
+# The `coverage` command replays queue inputs COVERAGE_BATCH at a time in one
+# process, and measures llvm-cov COVERAGE_TOTALS of the inputs found by each
+# interval of fuzzing.
+COVERAGE_BATCH = 256
+COVERAGE_INPUT_TIMEOUT = 1
+COVERAGE_TOTALS = ['lines', 'regions', 'functions']
+COVERAGE_HEADER = ('time,inputs,lines_covered,lines_total,regions_covered,regions_total,'
+                   'functions_covered,functions_total\n')
+SANITIZER_ERROR_RE = re.compile(r'==\d+==ERROR: \w+Sanitizer: (.+?)(?: on | at | 0x| \(|$)')
+SANITIZER_ACCESS_RE = re.compile(r'^(READ|WRITE) of size ')
+STACK_FRAME_RE = re.compile(r'^\s*#\d+ 0x[0-9a-f]+(?: in (.+))? (\S+)$')
+# Startup benchmark: afl-fuzz output that ends each phase, see afl-fuzz.c.
+BENCH_MARKS = [
+    ('forkserver', 'All right - fork server is up.'),
+    ('dry_run', 'All test cases processed.'),
+    ('first_exec', 'Entering queue cycle 1.'),
+]
+BENCH_TIMEOUT = 10 * 60
+BENCH_LOG_LINES = 20
+CHURN_INDEX_SCRIPT = '/afl/llvm_mode/churn-index.py'
+# Written once per target image by history/Dockerfile.
+CHURN_INDEX_LIST = '/churn-index.list'
+
+SANITIZER_FLAGS = [
+    '-fsanitize=address',
+    # Matches UBSan features enabled in OSS-Fuzz.
+    # See https://github.com/google/oss-fuzz/blob/master/infra/base-images/base-builder/Dockerfile#L94
+    '-fsanitize=array-bounds,bool,builtin,enum,float-divide-by-zero,function,'
+    'integer-divide-by-zero,null,object-size,return,returns-nonnull-attribute,'
+    'shift,signed-integer-overflow,unreachable,vla-bound,vptr',
+]
+
+BUGS_OPTIMIZATION_LEVEL = '-O1'
+
+# Source-based coverage build, without sanitizers, see coverage/driver.c.
+COVERAGE_FLAGS = ['-fprofile-instr-generate', '-fcoverage-mapping']
+COVERAGE_LIB = '/libCoverage.a'
+
+
+LIBCPLUSPLUS_FLAG = '-stdlib=libc++'
+
+def append_flags(env_var, additional_flags, env=None):
+    """Append |additional_flags| to those already set in the value of |env_var|
+    and assign env_var to the result."""
+    if env is None:
+        env = os.environ
+
+    env_var_value = env.get(env_var)
+    flags = env_var_value.split(' ') if env_var_value else []
+    flags.extend(additional_flags)
+    env[env_var] = ' '.join(flags)
+
+
+def set_compilation_flags(env=None, sanitizers=True):
+    """Set compilation flags."""
+    if env is None:
+        env = os.environ
+
+    env['CFLAGS'] = ''
+    env['CXXFLAGS'] = ''
+    sanitizer_flags = SANITIZER_FLAGS if sanitizers else []
+
+    append_flags('CFLAGS',
+                    sanitizer_flags + [BUGS_OPTIMIZATION_LEVEL],
+                    env=env)
+    append_flags('CXXFLAGS',
+                    sanitizer_flags +
+                    [LIBCPLUSPLUS_FLAG, BUGS_OPTIMIZATION_LEVEL],
+                    env=env)
+    
+
+def initialize_env(env=None):
+    """Set initial flags before fuzzer.build() is called."""
+    set_compilation_flags(env, sanitizers=not get_profile()['coverage'])
+
+    for env_var in ['CFLAGS', 'CXXFLAGS']:
+        print('[+] {env_var} = {env_value}'.format(env_var=env_var,
+                                               env_value=os.getenv(env_var)))
+
+
+
+
+def get_profile():
+    """Return the profile of the variant this container builds or runs."""
+    return profiles.get_profile(os.environ['FUZZ_PROFILE'])
+
+
+def prepare_build_environment(profile):
+    if profile['coverage']:
+        append_flags('CFLAGS', COVERAGE_FLAGS)
+        append_flags('CXXFLAGS', COVERAGE_FLAGS)
+        os.environ['FUZZER_LIB'] = COVERAGE_LIB
+        os.environ.update(profile['build_env'])
+        return
+
+    cflags = [
+        '-fsanitize-coverage=trace-pc-guard', '-fsanitize=address',
+        '-fsanitize-address-use-after-scope'
+    ]
+    append_flags('CFLAGS', cflags)
+    append_flags('CXXFLAGS', cflags)
+    append_flags('ASAN_OPTIONS', ['abort_on_error=1', 'symbolize=0'])
+
+    os.environ['FUZZER_LIB'] = '/libAFL.a'
+
+    # Compiler and pass knobs of the variant
+    os.environ.update(profile['build_env'])
+
+
+def build_churn_index():
+    """Use the history index of the target image, or walk the history of the
+    target sources now, so that the pass reads ages and changes from the
+    index instead of running git for every file."""
+    if os.path.exists(CHURN_INDEX_LIST):
+        with open(CHURN_INDEX_LIST, 'r') as f:
+            indexes = f.read()
+    elif os.path.exists(CHURN_INDEX_SCRIPT):
+        try:
+            indexes = subprocess.check_output(['python3', CHURN_INDEX_SCRIPT, '--src', os.environ['SRC']]).decode()
+        except subprocess.CalledProcessError:
+            print('[-] Failed to build the churn index, falling back to git')
+            return
+    else:
+        return
+
+    indexes = indexes.strip()
+    if indexes:
+        os.environ['AFLCHURN_INDEX'] = indexes
+        print('[+] AFLCHURN_INDEX = {}'.format(indexes))
+
+
+def build():
+    profile = get_profile()
+    prepare_build_environment(profile)
+    if profile['churn_index']:
+        build_churn_index()
+
+    env = os.environ.copy()
+    fuzzer_lib = env['FUZZER_LIB']
+    env['LIB_FUZZING_ENGINE'] = fuzzer_lib
+    if os.path.exists(fuzzer_lib):
+        # Make /usr/lib/libFuzzingEngine.a point to our library for OSS-Fuzz
+        # so we can build projects that are using -lFuzzingEngine.
+        shutil.copy(fuzzer_lib, '/usr/lib/libFuzzingEngine.a')
+
+
+    subprocess.check_call(['/bin/bash', '-ex', '/build.sh'], env=env)
+
+
+def create_seed_file_for_empty_corpus(input_corpus):
+    """Create a fake seed file in an empty corpus, skip otherwise."""
+    if os.listdir(input_corpus):
+        # Input corpus has some files, no need of a seed file. Bail out.
+        return
+
+    print('Creating a fake seed file in empty corpus directory.')
+    default_seed_file = os.path.join(input_corpus, 'default_seed')
+    with open(default_seed_file, 'w') as file_handle:
+        file_handle.write('hi')
+
+
+class SeedExtractor:
+    """Unpack the members of a seed corpus zip, each named by its SHA-1.
+
+    Every member is read once: it is hashed while being written to a temporary
+    file, which is then renamed to its digest, or dropped if a seed with the
+    same digest is already there. Members are unpacked by a pool of threads,
+    each with its own handle on the zip, closed once the pool is done."""
+
+    def __init__(self, zip_path, seed_dir):
+        self.zip_path = zip_path
+        self.seed_dir = seed_dir
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.zip_files = []
+        self.digests = set(os.listdir(seed_dir))
+        self.counts = {'extracted': 0, 'deduped': 0, 'skipped': 0}
+
+    def zip_file(self):
+        if not hasattr(self.local, 'zip_file'):
+            self.local.zip_file = zipfile.ZipFile(self.zip_path)
+            with self.lock:
+                self.zip_files.append(self.local.zip_file)
+        return self.local.zip_file
+
+    def extract(self, member):
+        digest = hashlib.sha1()
+        fd, tmp_path = tempfile.mkstemp(prefix='.seed-', dir=self.seed_dir)
+        # mkstemp creates the file 0600, seeds are shared read-only
+        os.fchmod(fd, 0o644)
+        try:
+            with os.fdopen(fd, 'wb') as dst_file, self.zip_file().open(member, 'r') as src_file:
+                chunk = src_file.read(SEED_CHUNK_SIZE)
+                while chunk:
+                    digest.update(chunk)
+                    dst_file.write(chunk)
+                    chunk = src_file.read(SEED_CHUNK_SIZE)
+
+            sha1sum = digest.hexdigest()
+            with self.lock:
+                duplicate = sha1sum in self.digests
+                self.digests.add(sha1sum)
+                self.counts['deduped' if duplicate else 'extracted'] += 1
+            if not duplicate:
+                os.rename(tmp_path, os.path.join(self.seed_dir, sha1sum))
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def run(self):
+        with zipfile.ZipFile(self.zip_path) as zip_file:
+            members = []
+            for member in zip_file.infolist():
+                if member.filename.endswith('/'):
+                    # Ignore directories.
+                    continue
+
+                # Allow callers to opt-out of unpacking large files.
+                if member.file_size > CORPUS_ELEMENT_BYTES_LIMIT:
+                    self.counts['skipped'] += 1
+                    continue
+
+                members.append(member)
+
+        try:
+            with ThreadPoolExecutor() as executor:
+                # list() re-raises the first failure
+                list(executor.map(self.extract, members))
+        finally:
+            for zip_file in self.zip_files:
+                zip_file.close()
+
+        return self.counts
+
+
+def prepare_seed(seed_dir):
+    seed_corpus_dir = seed_corpus_path()
+    if os.path.exists(seed_corpus_dir):
+        start = time.time()
+        counts = SeedExtractor(seed_corpus_dir, seed_dir).run()
+        print('[+] Seed corpus: {} extracted, {} deduped, {} skipped (larger than {} bytes) in {:.1f}s'.format(
+            counts['extracted'], counts['deduped'], counts['skipped'], CORPUS_ELEMENT_BYTES_LIMIT, time.time() - start))
+    
+    create_seed_file_for_empty_corpus(seed_dir)
+      
+
+def seed_corpus_path():
+    return os.path.join(os.environ['OUT'], os.environ['FUZZ_TARGET'] + '_seed_corpus.zip')
+
+
+def seed_corpus_key(zip_path):
+    """Return a digest of the members of the seed corpus zip.
+
+    Only names, sizes and CRCs are hashed, so the zips of the same seeds built
+    into different fuzzer images get the same key."""
+    digest = hashlib.sha1()
+    if os.path.exists(zip_path):
+        with zipfile.ZipFile(zip_path) as zip_file:
+            for member in sorted(zip_file.infolist(), key=lambda m: m.filename):
+                digest.update('{}\0{}\0{}\n'.format(member.filename, member.file_size, member.CRC).encode())
+    digest.update(str(CORPUS_ELEMENT_BYTES_LIMIT).encode())
+    return digest.hexdigest()
+
+
+def cache_seed(cache_dir):
+    """Extract the seed corpus into |cache_dir|/<key> unless it is there, print the key."""
+    key = seed_corpus_key(seed_corpus_path())
+    seed_dir = os.path.join(cache_dir, key)
+    if os.path.isdir(seed_dir):
+        print('[+] Seed corpus already cached: {}'.format(seed_dir))
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix='.{}-'.format(key), dir=cache_dir)
+        prepare_seed(tmp_dir)
+        os.chmod(tmp_dir, 0o755)
+        os.rename(tmp_dir, seed_dir)
+        print('[+] Seed corpus cached: {}'.format(seed_dir))
+    print(key)
+
+
+def corpus_key(seed_dir):
+    """Return a digest of the seed names and sizes; cached seeds are named by
+    their SHA-1, so this identifies the content."""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(seed_dir)):
+        digest.update('{}\0{}\n'.format(name, os.path.getsize(os.path.join(seed_dir, name))).encode())
+    return digest.hexdigest()
+
+
+def trace_seed(target_binary, seed_path, trace_path):
+    """Return the tuples |seed_path| covers, like afl-cmin (-Z).
+
+    Crashing and hanging seeds cover nothing."""
+    command = [AFL_SHOWMAP, '-q', '-Z', '-m', 'none', '-t', str(CMIN_TIMEOUT_MS), '-o', trace_path, '--', target_binary]
+    with open(seed_path, 'rb') as stdin:
+        subprocess.call(command, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with open(trace_path, 'r') as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+    finally:
+        if os.path.exists(trace_path):
+            os.unlink(trace_path)
+
+
+def minimize_corpus(target_binary, seed_dir, output_dir, jobs):
+    """Copy to |output_dir| the smallest seed of |seed_dir| covering each tuple.
+
+    Seeds are traced by |jobs| afl-showmap processes at once. Return the
+    number of seeds before and after."""
+    seeds = sorted(os.listdir(seed_dir), key=lambda name: (os.path.getsize(os.path.join(seed_dir, name)), name))
+
+    def trace(idx):
+        return trace_seed(target_binary, os.path.join(seed_dir, seeds[idx]), os.path.join(output_dir, '.trace-{}'.format(idx)))
+
+    with ThreadPoolExecutor(jobs) as executor:
+        traces = list(executor.map(trace, range(len(seeds))))
+
+    # Seeds are sorted by size, the first one seen for a tuple is the smallest.
+    best = {}
+    for name, tuples in zip(seeds, traces):
+        for t in tuples:
+            best.setdefault(t, name)
+
+    keep = set(best.values())
+    if not keep:
+        print('[-] No seed produced any coverage, keeping the full corpus')
+        keep = set(seeds)
+
+    for name in keep:
+        shutil.copy(os.path.join(seed_dir, name), os.path.join(output_dir, name))
+
+    return len(seeds), len(keep)
+
+
+def cache_cmin(cache_dir, seed_dir):
+    """Minimize |seed_dir| against the target binary into |cache_dir|/<key>
+    unless it is there, print the key.
+
+    The key is made of the binary and corpus digests, so trials, and variants
+    sharing a build, reuse the minimized corpus."""
+    target_binary = os.path.join(os.environ['OUT'], os.environ['FUZZ_TARGET'])
+    key = '{}-{}'.format(file_digest(target_binary), corpus_key(seed_dir))
+    cmin_dir = os.path.join(cache_dir, key)
+    if os.path.isdir(cmin_dir):
+        print('[+] Minimized corpus already cached: {}'.format(cmin_dir))
+    else:
+        # The target runs outside of afl-fuzz, set what prepare_fuzz_environment would.
+        os.environ['AFL_SKIP_CPUFREQ'] = '1'
+        os.environ['AFL_NO_AFFINITY'] = '1'
+        start = time.time()
+        tmp_dir = tempfile.mkdtemp(prefix='.{}-'.format(key), dir=cache_dir)
+        total, kept = minimize_corpus(target_binary, seed_dir, tmp_dir, len(os.sched_getaffinity(0)))
+        os.chmod(tmp_dir, 0o755)
+        os.rename(tmp_dir, cmin_dir)
+        print('[+] Minimized corpus: {} of {} seeds kept in {:.1f}s: {}'.format(kept, total, time.time() - start, cmin_dir))
+    print(key)
+
+
+def normalize_frame(symbol, location):
+    """Return `<function> <file>` of a stack frame, without what changes from
+    one build to another: addresses, lines and parameters; None for frames of
+    the sanitizer runtimes."""
+    if symbol is None:
+        # Not symbolized: `(<module>+<offset>)`
+        return location.strip('()')
+    if symbol.startswith(TRIAGE_RUNTIME_FRAMES):
+        return None
+    function = symbol.split('(', 1)[0] or symbol
+    if location.startswith('('):
+        return function
+    return '{} {}'.format(function, os.path.basename(location.split(':', 1)[0]))
+
+
+def parse_sanitizer_report(report):
+    """Return (kind, frames) of the first sanitizer report in |report|: kind is
+    e.g. 'heap-buffer-overflow READ', or None if there is no report."""
+    kind = None
+    frames = []
+    for line in report.splitlines():
+        if kind is None:
+            match = SANITIZER_ERROR_RE.search(line)
+            if match:
+                kind = match.group(1)
+            elif ': runtime error: ' in line:
+                kind = 'undefined-behavior'
+            continue
+
+        match = STACK_FRAME_RE.match(line)
+        if match is None:
+            access = SANITIZER_ACCESS_RE.match(line)
+            if frames:
+                break
+            if access:
+                kind = '{} {}'.format(kind, access.group(1))
+            continue
+        frame = normalize_frame(*match.groups())
+        if frame is not None:
+            frames.append(frame)
+        if frame and frame.split(' ', 1)[0] == TRIAGE_ENTRY_FRAME or len(frames) == TRIAGE_STACK_FRAMES:
+            break
+    return kind, frames
+
+
+def replay_crash(target_binary, crash_path):
+    """Run |target_binary| on |crash_path|, return the record of the crash."""
+    env = os.environ.copy()
+    env['ASAN_OPTIONS'] = ':'.join(TRIAGE_ASAN_OPTIONS)
+    env['UBSAN_OPTIONS'] = ':'.join(TRIAGE_UBSAN_OPTIONS)
+    with open(crash_path, 'rb') as stdin:
+        try:
+            proc = subprocess.run([target_binary], stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                  env=env, timeout=TRIAGE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return {'reproduced': False, 'kind': 'timeout', 'frames': []}
+
+    kind, frames = parse_sanitizer_report(proc.stderr.decode(errors='replace'))
+    if kind is None and proc.returncode < 0:
+        # Killed by a signal the sanitizers do not handle.
+        kind = 'signal {}'.format(-proc.returncode)
+    return {'reproduced': kind is not None, 'kind': kind, 'frames': frames}
+
+
+def cache_triage(cache_dir, output_dirs):
+    """Replay the crashes of |output_dirs| against the target binary, keep the
+    record of each in |cache_dir|/<key>/<input sha1>.json, print the key.
+
+    The key is the digest of the binary, so inputs already replayed against
+    it, by an earlier triage or from another campaign, are not run again.
+    Crashes are replayed by one process per cpu of the container."""
+    target_binary = os.path.join(os.environ['OUT'], os.environ['FUZZ_TARGET'])
+    key = file_digest(target_binary)
+    triage_dir = os.path.join(cache_dir, key)
+    os.makedirs(triage_dir, exist_ok=True)
+
+    pending = {}
+    for output_dir in output_dirs:
+        for path in crash_inputs(output_dir):
+            pending.setdefault(file_digest(path), path)
+    cached = set(name[:-len('.json')] for name in os.listdir(triage_dir) if name.endswith('.json'))
+    pending = [(digest, path) for digest, path in pending.items() if digest not in cached]
+
+    def replay(item):
+        digest, path = item
+        record = replay_crash(target_binary, path)
+        replace_file(os.path.join(triage_dir, digest + '.json'), json.dumps(record))
+        return record['reproduced']
+
+    start = time.time()
+    with ThreadPoolExecutor(len(os.sched_getaffinity(0))) as executor:
+        reproduced = sum(executor.map(replay, pending))
+    print('[+] Triage: {} new crashes replayed, {} reproduced in {:.1f}s: {}'.format(
+        len(pending), reproduced, time.time() - start, triage_dir))
+    print(key)
+
+
+def queue_inputs(output_dir):
+    """Return (mtime, path) of the inputs in the queues of |output_dir|, of all
+    instances of an ensemble, oldest first."""
+    inputs = []
+    for instance_dir in instance_dirs(output_dir):
+        queue_dir = os.path.join(instance_dir, 'queue')
+        if not os.path.isdir(queue_dir):
+            continue
+        for name in os.listdir(queue_dir):
+            path = os.path.join(queue_dir, name)
+            if name.startswith('id:') and os.path.isfile(path):
+                inputs.append((os.stat(path).st_mtime, path))
+    return sorted(inputs)
+
+
+def replay_coverage(coverage_binary, batch, record_dir):
+    """Record the coverage of the inputs |batch| of (digest, path) with
+    persistent replay processes.
+
+    An input that crashes or hangs the process gets an empty record, and
+    the rest of the batch runs in a new process."""
+    while batch:
+        items = ''.join('{}\t{}\n'.format(path, os.path.join(record_dir, digest)) for digest, path in batch)
+        try:
+            subprocess.run([coverage_binary, 'replay'], input=items.encode(), stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=COVERAGE_INPUT_TIMEOUT * len(batch))
+        except subprocess.TimeoutExpired:
+            pass
+        done = 0
+        while done < len(batch) and os.path.exists(os.path.join(record_dir, batch[done][0])):
+            done += 1
+        if done == len(batch):
+            return
+        open(os.path.join(record_dir, batch[done][0]), 'wb').close()
+        batch = batch[done + 1:]
+
+
+def coverage_summary(coverage_binary, profraw_path):
+    """Return the llvm-cov totals of the raw profile |profraw_path|."""
+    profdata_path = profraw_path[:-len('.profraw')] + '.profdata'
+    try:
+        subprocess.check_call(['llvm-profdata', 'merge', '-sparse', '-o', profdata_path, profraw_path])
+        output = subprocess.check_output(['llvm-cov', 'export', '-summary-only', '-instr-profile', profdata_path,
+                                          coverage_binary])
+    finally:
+        for path in (profraw_path, profdata_path):
+            if os.path.exists(path):
+                os.unlink(path)
+    return json.loads(output)['data'][0]['totals']
+
+
+def coverage_series(coverage_binary, inputs, digests, record_dir, start, interval, work_dir):
+    """Return the rows of the coverage series of a campaign.
+
+    The inputs found by each |interval| seconds of fuzzing, and by the end,
+    are added to a snapshot whose coverage is measured; one snapshot process
+    adds the records up in timestamp order."""
+    times = []
+    end = inputs[-1][0] - start if inputs else 0
+    while not times or times[-1] < end:
+        times.append(min(len(times) * interval, end))
+
+    commands = []
+    counts = []
+    added = 0
+    for idx, seconds in enumerate(times):
+        while added < len(inputs) and inputs[added][0] - start <= seconds:
+            commands.append(os.path.join(record_dir, digests[inputs[added][1]]))
+            added += 1
+        counts.append(added)
+        if idx == 0 or counts[-1] != counts[-2]:
+            commands.append('@' + os.path.join(work_dir, '{}.profraw'.format(idx)))
+    subprocess.run([coverage_binary, 'snapshot'], input=''.join(c + '\n' for c in commands).encode(),
+                   stdout=subprocess.DEVNULL, check=True)
+
+    rows = []
+    for idx, (seconds, count) in enumerate(zip(times, counts)):
+        if idx == 0 or count != counts[idx - 1]:
+            totals = coverage_summary(coverage_binary, os.path.join(work_dir, '{}.profraw'.format(idx)))
+            covered = [totals[key][field] for key in COVERAGE_TOTALS for field in ('covered', 'count')]
+        rows.append([int(seconds), count] + covered)
+    return rows
+
+
+def cache_coverage(cache_dir, series_dir, interval, output_dirs):
+    """Measure the coverage over time of the campaigns |output_dirs| into
+    |series_dir|/<n>.csv, one per campaign in order, print the key.
+
+    Queue inputs are replayed against the coverage binary in persistent
+    processes, one per cpu of the container, and the counters each hits are
+    kept in |cache_dir|/<key>/<input sha1>; the key is the digest of the
+    binary, so inputs that other trials or runs replayed are not run again."""
+    coverage_binary = os.path.join(os.environ['OUT'], os.environ['FUZZ_TARGET'])
+    key = file_digest(coverage_binary)
+    record_dir = os.path.join(cache_dir, key)
+    os.makedirs(record_dir, exist_ok=True)
+    jobs = len(os.sched_getaffinity(0))
+
+    campaigns = [queue_inputs(output_dir) for output_dir in output_dirs]
+    digests = {}
+    for inputs in campaigns:
+        for _, path in inputs:
+            digests[path] = file_digest(path)
+
+    # Oldest first: the start of every campaign is measured before its end.
+    pending = {}
+    for _, path in sorted(mtime_path for inputs in campaigns for mtime_path in inputs):
+        if not os.path.exists(os.path.join(record_dir, digests[path])):
+            pending.setdefault(digests[path], path)
+    pending = list(pending.items())
+    batches = [pending[i:i + COVERAGE_BATCH] for i in range(0, len(pending), COVERAGE_BATCH)]
+
+    start = time.time()
+    with ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(lambda batch: replay_coverage(coverage_binary, batch, record_dir), batches))
+    print('[+] Coverage: {} new inputs replayed in {:.1f}s: {}'.format(len(pending), time.time() - start, record_dir))
+
+    def measure(idx):
+        output_dir, inputs = output_dirs[idx], campaigns[idx]
+        try:
+            campaign_start = int(read_fuzzer_stats(os.path.join(output_dir, FUZZER_STATS))['start_time'])
+        except (OSError, KeyError, ValueError):
+            campaign_start = int(inputs[0][0]) if inputs else 0
+        # Queue mtimes are wall clock, plot_data and start_time leave out the
+        # time a resumed campaign was down.
+        history = resume_history(output_dir)
+        inputs = [(campaign_start + fuzzing_time(mtime, campaign_start, history), path) for mtime, path in inputs]
+        work_dir = tempfile.mkdtemp(prefix='.snapshots-', dir=record_dir)
+        try:
+            rows = coverage_series(coverage_binary, inputs, digests, record_dir, campaign_start, interval, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        replace_file(os.path.join(series_dir, '{}.csv'.format(idx)),
+                     COVERAGE_HEADER + ''.join(','.join(str(value) for value in row) + '\n' for row in rows))
+
+    with ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(measure, range(len(output_dirs))))
+    print(key)
+
+
+def prepare_fuzz_environment(input_corpus, seed=True):
+    """Prepare to fuzz with AFL or another AFL-based fuzzer, and the seeds in
+    |input_corpus| unless |seed| is False."""
+    # Tell AFL to not use its terminal UI so we get usable logs.
+    os.environ['AFL_NO_UI'] = '1'
+    # Skip AFL's CPU frequency check (fails on Docker).
+    os.environ['AFL_SKIP_CPUFREQ'] = '1'
+    # No need to bind affinity to one core, Docker enforces 1 core usage.
+    os.environ['AFL_NO_AFFINITY'] = '1'
+    # AFL will abort on startup if the core pattern sends notifications to
+    # external programs. We don't care about this.
+    os.environ['AFL_I_DONT_CARE_ABOUT_MISSING_CRASHES'] = '1'
+    # Don't exit when crashes are found. This can happen when corpus from
+    # OSS-Fuzz is used.
+    os.environ['AFL_SKIP_CRASHES'] = '1'
+    # Shuffle the queue
+    os.environ['AFL_SHUFFLE_QUEUE'] = '1'
+    # Runtime knobs of the variant
+    os.environ.update(get_profile()['run_env'])
+
+    if not seed:
+        return
+
+    if os.environ.get('FUZZ_SEED_CACHE'):
+        # run_fuzz.py mounted the seeds it extracted once for all trials.
+        print('[+] Using the cached seed corpus: {} seeds'.format(len(os.listdir(input_corpus))))
+        return
+
+    # AFL needs at least one non-empty seed to start.
+    prepare_seed(input_corpus)
+
+
+def read_plot_rows(path):
+    """Return the header and the complete rows of a plot_data file."""
+    header, rows = '', []
+    if not os.path.exists(path):
+        return header, rows
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                header = line
+            elif line.endswith('\n'):
+                rows.append(line.rstrip('\n').split(', '))
+    return header, rows
+
+
+def load_resume_state(output_dir):
+    path = os.path.join(output_dir, RESUME_STATE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def replace_file(path, content):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def merge_plot_data(output_dir):
+    """Append the plot_data of the last resumed run to that of the earlier runs.
+
+    The rows of the resumed run are moved back by the time the campaign was
+    not running and carry on the crash and hang counts, which afl-fuzz starts
+    again from zero, so the merged plot_data reads as one uninterrupted run.
+    The start time of that run is put back into fuzzer_stats."""
+    plot_data = os.path.join(output_dir, PLOT_DATA)
+    plot_data_prev = os.path.join(output_dir, PLOT_DATA_PREV)
+    if not os.path.exists(plot_data_prev):
+        return
+    state = load_resume_state(output_dir)
+    header, rows = read_plot_rows(plot_data_prev)
+    new_header, new_rows = read_plot_rows(plot_data)
+    crashes = int(rows[-1][PLOT_UNIQUE_CRASHES]) if rows else 0
+    hangs = int(rows[-1][PLOT_UNIQUE_HANGS]) if rows else 0
+    for row in new_rows:
+        row[PLOT_UNIX_TIME] = str(int(row[PLOT_UNIX_TIME]) - state['offset'])
+        row[PLOT_UNIQUE_CRASHES] = str(int(row[PLOT_UNIQUE_CRASHES]) + crashes)
+        row[PLOT_UNIQUE_HANGS] = str(int(row[PLOT_UNIQUE_HANGS]) + hangs)
+        rows.append(row)
+
+    replace_file(plot_data, (header or new_header) + ''.join(', '.join(row) + '\n' for row in rows))
+    os.unlink(plot_data_prev)
+
+    fuzzer_stats = os.path.join(output_dir, FUZZER_STATS)
+    if os.path.exists(fuzzer_stats):
+        with open(fuzzer_stats, 'r') as f:
+            lines = f.readlines()
+        for i, line in enumerate(lines):
+            key, _, _ = line.partition(':')
+            if key.strip() == 'start_time':
+                lines[i] = '{}: {}\n'.format(key, state['start_time'])
+        replace_file(fuzzer_stats, ''.join(lines))
+
+
+def prepare_resume(output_dir, instance_dir):
+    """Prepare to resume the afl-fuzz run in |output_dir| with `-i -`,
+    return False if |instance_dir|, where the (master) instance ran, has
+    nothing to resume."""
+    if not os.path.isdir(os.path.join(instance_dir, 'queue')):
+        return False
+
+    # A resumed run may have been interrupted before its rows were merged.
+    merge_plot_data(output_dir)
+    state = load_resume_state(output_dir)
+    fuzzer_stats = os.path.join(output_dir, FUZZER_STATS)
+    plot_data = os.path.join(output_dir, PLOT_DATA)
+    if state is None:
+        start_time = None
+        if os.path.exists(fuzzer_stats):
+            with open(fuzzer_stats, 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key.strip() == 'start_time':
+                        start_time = int(value)
+        state = {'start_time': start_time, 'offset': 0, 'resumes': 0}
+
+    now = int(time.time())
+    _, rows = read_plot_rows(plot_data)
+    if rows:
+        if state['start_time'] is None:
+            state['start_time'] = int(rows[0][PLOT_UNIX_TIME])
+        # Rows are already shifted by the earlier offsets, the time since the
+        # last one is the total time the campaign was not running.
+        state['offset'] = now - int(rows[-1][PLOT_UNIX_TIME])
+    state['resumes'] += 1
+    state.setdefault('history', []).append([now, state['offset']])
+    if os.path.exists(plot_data):
+        os.rename(plot_data, os.path.join(output_dir, PLOT_DATA_PREV))
+    replace_file(os.path.join(output_dir, RESUME_STATE), json.dumps(state))
+    print('[+] Resuming afl-fuzz in {} ({} times), {}s not fuzzed'.format(output_dir, state['resumes'], state['offset']))
+    return True
+
+
+def instance_names(count):
+    return [ENSEMBLE_MASTER] + ['secondary{:02d}'.format(i) for i in range(1, count)]
+
+
+def write_ensemble_stats(output_dir, names):
+    """Sum the fuzzer_stats of the instances |names| up into |output_dir|.
+
+    Counters and speeds are added up, progress marks are the latest of all
+    instances, stability is averaged; a row with these figures is appended to
+    the plot_data of |output_dir|."""
+    instances = {}
+    for name in names:
+        try:
+            instances[name] = read_fuzzer_stats(os.path.join(output_dir, name, FUZZER_STATS))
+        except FileNotFoundError:
+            pass
+    if not instances:
+        return
+
+    def values(key, convert=int):
+        return [convert(stats[key].rstrip('%')) for stats in instances.values() if key in stats]
+
+    stats = {
+        'start_time': min(values('start_time')),
+        'fuzzer_pid': os.getpid(),
+        'instances': len(instances),
+    }
+    for key in ENSEMBLE_SUMMED_STATS:
+        total = sum(values(key, float))
+        stats[key] = '{:.2f}'.format(total) if key == 'execs_per_sec' else int(total)
+    for key in ENSEMBLE_LATEST_STATS:
+        stats[key] = max(values(key), default=0)
+    stability = values('stability', float)
+    stats['stability'] = '{:.2f}%'.format(sum(stability) / len(stability) if stability else 0)
+    stats['bitmap_cvg'] = '{:.2f}%'.format(max(values('bitmap_cvg', float), default=0))
+    stats['cur_path'] = instances.get(ENSEMBLE_MASTER, {}).get('cur_path', 0)
+    replace_file(os.path.join(output_dir, FUZZER_STATS),
+                 ''.join('{:<18}: {}\n'.format(key, value) for key, value in stats.items()))
+
+    row = [int(time.time()), stats['cycles_done'], stats['cur_path'], stats['paths_total'], stats['pending_total'],
+           stats['pending_favs'], stats['bitmap_cvg'], stats['unique_crashes'], stats['unique_hangs'],
+           stats['max_depth'], stats['execs_per_sec']]
+    plot_data = os.path.join(output_dir, PLOT_DATA)
+    new = not os.path.exists(plot_data)
+    with open(plot_data, 'a') as f:
+        if new:
+            f.write(PLOT_DATA_HEADER)
+        f.write(', '.join(str(value) for value in row) + '\n')
+
+
+def follow_ensemble(output_dir, names, done):
+    """Write the stats of the ensemble every ENSEMBLE_STATS_INTERVAL seconds
+    until the event |done| is set, then once more."""
+    while not done.wait(ENSEMBLE_STATS_INTERVAL):
+        write_ensemble_stats(output_dir, names)
+    write_ensemble_stats(output_dir, names)
+
+
+def sync_output(src_dir, dst_dir):
+    """Make |dst_dir| a copy of |src_dir|, return the number of files copied.
+
+    Only files whose size or mtime changed are copied, each to a temporary
+    file renamed over the old copy, so readers of |dst_dir| never see a
+    partial file. Files gone from |src_dir|, such as the crashes directory an
+    in-place resume renamed, are removed."""
+    copied = 0
+    kept = set()
+    for root, _, files in os.walk(src_dir):
+        dst_root = os.path.normpath(os.path.join(dst_dir, os.path.relpath(root, src_dir)))
+        os.makedirs(dst_root, exist_ok=True)
+        kept.add(dst_root)
+        for name in files:
+            if name in CHECKPOINT_SKIPPED or name.endswith(CHECKPOINT_SUFFIX):
+                continue
+            src = os.path.join(root, name)
+            dst = os.path.join(dst_root, name)
+            kept.add(dst)
+            try:
+                src_stat = os.lstat(src)
+                dst_stat = os.lstat(dst) if os.path.lexists(dst) else None
+                if dst_stat is not None and dst_stat.st_size == src_stat.st_size and \
+                        dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                    continue
+                tmp = os.path.join(dst_root, '.' + name + CHECKPOINT_SUFFIX)
+                shutil.copy2(src, tmp, follow_symlinks=False)
+                os.replace(tmp, dst)
+                copied += 1
+            except FileNotFoundError:
+                # Removed by afl-fuzz in the meantime.
+                kept.discard(dst)
+
+    for root, _, files in os.walk(dst_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in kept:
+                os.unlink(path)
+        if root not in kept:
+            os.rmdir(root)
+    return copied
+
+
+def follow_checkpoints(work_dir, interval, done):
+    """Copy |work_dir| to OUTPUT_DIR every |interval| seconds until the event
+    |done| is set."""
+    while not done.wait(interval):
+        start = time.time()
+        copied = sync_output(work_dir, OUTPUT_DIR)
+        print('[+] Checkpoint: {} files copied in {:.1f}s'.format(copied, time.time() - start))
+
+
+def get_dictionary_path(target_binary):
+    """Return dictionary path for a target binary."""
+    # if get_env('NO_DICTIONARIES'):
+    #     # Don't use dictionaries if experiment specifies not to.
+    #     return None
+
+    dictionary_path = target_binary + '.dict'
+    if os.path.exists(dictionary_path):
+        return dictionary_path
+
+    options_file_path = target_binary + '.options'
+    if not os.path.exists(options_file_path):
+        return None
+
+    config = configparser.ConfigParser()
+    with open(options_file_path, 'r') as file_handle:
+        try:
+            config.read_file(file_handle)
+        except configparser.Error as error:
+            raise Exception('Failed to parse fuzzer options file: ' +
+                            options_file_path) from error
+
+    for section in config.sections():
+        for key, value in config.items(section):
+            if key == 'dict':
+                dictionary_path = os.path.join(os.path.dirname(target_binary),
+                                               value)
+                if not os.path.exists(dictionary_path):
+                    raise ValueError('Bad dictionary path in options file: ' +
+                                     options_file_path)
+                return dictionary_path
+    return None
+
+
+def afl_fuzz_options(input_dir, output_dir, target_binary):
+    options = [
+        '/afl/afl-fuzz',
+        '-i',
+        input_dir,
+        '-o',
+        output_dir,
+        # Use no memory limit as ASAN doesn't play nicely with one.
+        '-m',
+        'none',
+        '-t',
+        '1000+',  # Use same default 1 sec timeout, but add '+' to skip hangs.
+    ]
+    # Use '-d' to skip deterministic mode, as long as it it compatible with
+    # additional flags.
+    dictionary_path = get_dictionary_path(target_binary)
+    if dictionary_path:
+        options.extend(['-x', dictionary_path])
+    return options
+
+
+def target_command(target_binary):
+    return [
+        '--',
+        target_binary,
+        # Pass INT_MAX to afl the maximize the number of persistent loops it
+        # performs.
+        '2147483647'
+    ]
+
+
+def startup_marks(command, timeout):
+    """Run the afl-fuzz |command| until it enters its first queue cycle and
+    return {mark: seconds since it was started} of BENCH_MARKS.
+
+    afl-fuzz only flushes its output line by line on a terminal, so it writes
+    to a pty; the lines are timed as they arrive."""
+    master, slave = pty.openpty()
+    start = time.monotonic()
+    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=slave, stderr=slave, start_new_session=True)
+    os.close(slave)
+
+    marks = {}
+    lines = []
+    pending = b''
+    timed_out = False
+    try:
+        while len(marks) < len(BENCH_MARKS):
+            remaining = start + timeout - time.monotonic()
+            if remaining <= 0 or not select.select([master], [], [], remaining)[0]:
+                timed_out = True
+                break
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                # EIO: afl-fuzz exited and closed the pty.
+                data = b''
+            if not data:
+                break
+            now = time.monotonic() - start
+            *complete, pending = (pending + data).split(b'\n')
+            for line in complete:
+                line = line.decode(errors='replace').rstrip('\r')
+                lines.append(line)
+                for name, marker in BENCH_MARKS:
+                    if name not in marks and marker in line:
+                        marks[name] = now
+    finally:
+        if proc.poll() is None:
+            os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait()
+        os.close(master)
+
+    if len(marks) < len(BENCH_MARKS):
+        print('\n'.join(lines[-BENCH_LOG_LINES:]))
+        missing = [marker for name, marker in BENCH_MARKS if name not in marks][0]
+        if timed_out:
+            raise RuntimeError('afl-fuzz did not print {!r} within {}s'.format(missing, timeout))
+        raise RuntimeError('afl-fuzz exited with {} before printing {!r}'.format(proc.returncode, missing))
+    return marks
+
+
+def bench_startup():
+    """Start a campaign from scratch up to its first fuzzing exec, and print
+    the seconds each phase took, as JSON last:
+
+      seed_prep   extracting the seed corpus of the image
+      forkserver  from starting afl-fuzz to its fork server being up
+      dry_run     running and calibrating the seeds
+      first_exec  from starting this command to the first queue cycle"""
+    start = time.monotonic()
+    target_binary = os.path.join(os.environ['OUT'], os.environ['FUZZ_TARGET'])
+    work_dir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        input_dir = os.path.join(work_dir, 'input')
+        os.mkdir(input_dir)
+        prepare_fuzz_environment(input_dir)
+        seed_prep = time.monotonic() - start
+        seeds = len(os.listdir(input_dir))
+
+        command = afl_fuzz_options(input_dir, os.path.join(work_dir, 'output'), target_binary)
+        marks = startup_marks(command + target_command(target_binary), BENCH_TIMEOUT)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    timings = {
+        'seed_prep': round(seed_prep, 3),
+        'forkserver': round(marks['forkserver'], 3),
+        'dry_run': round(marks['dry_run'] - marks['forkserver'], 3),
+        'first_exec': round(seed_prep + marks['first_exec'], 3),
+        'seeds': seeds,
+        'binary_bytes': os.path.getsize(target_binary),
+    }
+    print('[+] Startup: seed prep {seed_prep:.2f}s ({seeds} seeds), fork server {forkserver:.2f}s, '
+          'dry run {dry_run:.2f}s, first exec after {first_exec:.2f}s'.format(**timings))
+    print(json.dumps(timings))
+
+
+def run_fuzz():
+    instances = int(os.environ.get('FUZZ_INSTANCES', '1'))
+    names = instance_names(instances) if instances > 1 else None
+    work_dir = os.environ.get('FUZZ_TMPFS_DIR')
+    output_dir = work_dir or OUTPUT_DIR
+    if work_dir and os.environ.get('FUZZ_RESUME'):
+        # Start over from the last checkpoint.
+        sync_output(OUTPUT_DIR, work_dir)
+    # run_fuzz.py asks to resume a campaign an interrupted experiment left.
+    instance_dir = os.path.join(output_dir, ENSEMBLE_MASTER) if names else output_dir
+    resume = bool(os.environ.get('FUZZ_RESUME')) and prepare_resume(output_dir, instance_dir)
+    prepare_fuzz_environment(INPUT_DIR, seed=not resume)
+    target = os.environ['FUZZ_TARGET']
+    target_binary = os.path.join(os.environ['OUT'], target)
+    # In place: afl-fuzz keeps the queue and renames the crashes and hangs
+    # directories to crashes.<date> and hangs.<date>.
+    options = afl_fuzz_options('-' if resume else INPUT_DIR, output_dir, target_binary)
+    if names is None:
+        commands = [options + target_command(target_binary)]
+    else:
+        commands = [options + ['-M' if i == 0 else '-S', name] + target_command(target_binary)
+                    for i, name in enumerate(names)]
+    timeout = float(os.environ.get('FUZZ_TIMEOUT'))
+    if timeout <= 0:
+        timeout = None
+
+    # All instances are in a new process group, led by the first one: a single
+    # killpg stops the whole ensemble. (A group can only be joined from the
+    # same session, hence no new session.)
+    procs = []
+    pgid = 0
+    for command in commands:
+        print('[run_afl_fuzz] Running command: ' + ' '.join(command))
+        procs.append(subprocess.Popen(command, preexec_fn=lambda: os.setpgid(0, pgid)))
+        pgid = procs[0].pid
+
+    def stop(signum, frame):
+        # `docker stop` (early termination): let afl-fuzz write its final stats.
+        # As PID 1 of the container we would otherwise ignore SIGTERM.
+        try:
+            os.killpg(pgid, signal.SIGTERM)
+        except ProcessLookupError:
+            # afl-fuzz exited already, e.g. at FUZZ_TIMEOUT.
+            pass
+
+    signal.signal(signal.SIGTERM, stop)
+    fuzzing_done = threading.Event()
+    if names is not None:
+        stats_thread = threading.Thread(target=follow_ensemble, args=(output_dir, names, fuzzing_done))
+        stats_thread.start()
+    if work_dir:
+        interval = float(os.environ.get('FUZZ_CHECKPOINT_INTERVAL', CHECKPOINT_INTERVAL))
+        checkpoint_thread = threading.Thread(target=follow_checkpoints, args=(work_dir, interval, fuzzing_done))
+        checkpoint_thread.start()
+    deadline = time.time() + timeout if timeout is not None else None
+    try:
+        for p in procs:
+            p.wait(timeout=None if deadline is None else max(deadline - time.time(), 0))
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(pgid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        for p in procs:
+            p.wait()
+    fuzzing_done.set()
+    if names is not None:
+        stats_thread.join()
+    if work_dir:
+        checkpoint_thread.join()
+    merge_plot_data(output_dir)
+    if work_dir:
+        copied = sync_output(work_dir, OUTPUT_DIR)
+        print('[+] Final sync: {} files copied to {}'.format(copied, OUTPUT_DIR))
+
+
+def main(argv):
+    if len(argv) == 2:
+        if argv[1] == 'run':
+            run_fuzz()
+        elif argv[1] == 'build':
+            initialize_env()
+            build()
+        elif argv[1] == 'bench':
+            bench_startup()
+    elif len(argv) == 3 and argv[1] == 'seed':
+        cache_seed(argv[2])
+    elif len(argv) == 4 and argv[1] == 'cmin':
+        cache_cmin(argv[2], argv[3])
+    elif len(argv) >= 3 and argv[1] == 'triage':
+        cache_triage(argv[2], argv[3:])
+    elif len(argv) >= 5 and argv[1] == 'coverage':
+        cache_coverage(argv[2], argv[3], float(argv[4]), argv[5:])
+
+
+if __name__ == '__main__':
+    import sys
+
+    main(sys.argv)
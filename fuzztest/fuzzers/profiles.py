@@ -0,0 +1,87 @@
+#!/bin/python3
+
+# Fuzzer variants run by fuzz.py.
+#
+# Each profile names:
+#   toolchain  directory of the Dockerfile that installs the fuzzer (fuzzers/<toolchain>)
+#   build_env  environment of the target build: compiler and AFLCHURN_* knobs
+#   run_env    environment of afl-fuzz
+#   churn_index  let the pass read the history index of the target image
+#   build      (optional) profile whose instrumented binary is reused; the
+#              profile must then only differ in run_env, and no image is
+#              built for it
+#   coverage   (optional) a source-based coverage build for coverage.py, not
+#              a fuzzer
+#
+# A new ablation that only changes the pass knobs is a new entry here; one
+# that only changes runtime knobs also sets 'build' and costs no build.
+
+AFL_CLANG_FAST = {
+    'CC': '/afl/afl-clang-fast',
+    'CXX': '/afl/afl-clang-fast++',
+}
+
+PROFILES = {
+    'afl': {
+        'toolchain': 'afl',
+        'build_env': {
+            'CC': 'clang',
+            'CXX': 'clang++',
+        },
+    },
+    'aflchurn': {
+        'toolchain': 'aflchurn',
+        'build_env': dict(AFL_CLANG_FAST, AFLCHURN_INST_RATIO='100'),
+    },
+    'aflchurnplus_enable_all': {
+        'toolchain': 'aflchurnplus',
+        'build_env': dict(AFL_CLANG_FAST, AFLCHURN_INST_RATIO='100'),
+        'churn_index': True,
+    },
+    'aflchurnplus_disable_flip': {
+        'toolchain': 'aflchurnplus',
+        'build_env': dict(AFL_CLANG_FAST, AFLCHURN_INST_RATIO='100', AFLCHURN_DISABLE_FLIP='1'),
+        'churn_index': True,
+    },
+    'aflchurnplus_disable_people': {
+        'toolchain': 'aflchurnplus',
+        'build_env': dict(AFL_CLANG_FAST, AFLCHURN_INST_RATIO='100', AFLCHURN_DISABLE_PEOPLE='1'),
+        'churn_index': True,
+    },
+    'coverage': {
+        'toolchain': 'coverage',
+        'build_env': {
+            'CC': 'clang',
+            'CXX': 'clang++',
+        },
+        'coverage': True,
+    },
+}
+
+
+def get_profile(name):
+    """Return the profile of fuzzer |name|, with the defaults filled in."""
+    if name not in PROFILES:
+        raise ValueError('Unknown fuzzer: {}, known: {}'.format(name, ', '.join(sorted(PROFILES))))
+
+    profile = dict(PROFILES[name])
+    build = profile.get('build')
+    if build:
+        if PROFILES[build].get('build'):
+            raise ValueError('Fuzzer {} reuses {}, which reuses another build'.format(name, build))
+        for key in ('toolchain', 'build_env', 'churn_index', 'coverage'):
+            if key in profile and profile[key] != PROFILES[build].get(key):
+                raise ValueError('Fuzzer {} reuses the build of {}, it cannot set {}'.format(name, build, key))
+            profile[key] = PROFILES[build].get(key)
+
+    profile.setdefault('build', name)
+    profile.setdefault('build_env', {})
+    profile.setdefault('run_env', {})
+    profile.setdefault('churn_index', False)
+    profile.setdefault('coverage', False)
+    return profile
+
+
+def build_name(name):
+    """Return the profile whose image fuzzer |name| runs in."""
+    return get_profile(name)['build']
@@ -0,0 +1,65 @@
+#!/bin/python3
+
+import json
+import os
+import time
+
+from telemetry import campaign_key
+
+
+MANIFEST_NAME = 'manifest.json'
+# Bump whenever the layout of the manifest changes.
+MANIFEST_VERSION = 1
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Manifest:
+    """Durable record of the state of every campaign of an experiment.
+
+    Each entry holds the state of a (trial, target, fuzzer) campaign, the
+    seconds it has fuzzed so far and how many times it was started. The file
+    is rewritten atomically on every change, so after a crash or a reboot it
+    shows which campaigns finished and how much of the time budget the others
+    used."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.max_time = None
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                raise ValueError('{}: unsupported manifest version {}'.format(path, data.get('version')))
+            self.entries = data['campaigns']
+            self.max_time = data.get('max_time')
+
+    def get(self, campaign):
+        return self.entries.get(campaign_key(campaign))
+
+    def state(self, campaign):
+        entry = self.get(campaign)
+        return entry['state'] if entry else PENDING
+
+    def elapsed(self, campaign):
+        entry = self.get(campaign)
+        return entry['elapsed'] if entry else 0
+
+    def update(self, campaign, **fields):
+        entry = self.entries.setdefault(campaign_key(campaign), {'state': PENDING, 'elapsed': 0, 'runs': 0})
+        entry.update(fields)
+        entry['updated'] = int(time.time())
+        self.save()
+
+    def save(self):
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'max_time': self.max_time, 'campaigns': self.entries},
+                      f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
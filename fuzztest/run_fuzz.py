@@ -2,9 +2,22 @@
 
 import subprocess
 import os
+import shutil
+import time
 
+from fuzzers.profiles import build_name, get_profile
 
-def build_baseimag(quiet=False):
+
+# Build context of the history index layer, see history/Dockerfile.
+CHURN_INDEX_DIR = os.path.join('..', 'llvm_mode')
+# Toolchains built from this checkout instead of a clone, with the whole
+# repository as build context (see ../.dockerignore); the others build in
+# fuzzers/.
+CHECKOUT_TOOLCHAINS = ['aflchurnplus']
+CHECKOUT_DIR = '..'
+
+
+def build_baseimag(quiet=False, no_cache=False):
     print('[+] Building base image')
     build_base_cmd = [
         'docker',
@@ -17,6 +30,8 @@ def build_baseimag(quiet=False):
         'fuzztest/base',
         '.'
     ]
+    if no_cache:
+        build_base_cmd.insert(2, '--no-cache')
 
     if quiet:
         subprocess.check_call(build_base_cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
@@ -24,9 +39,10 @@ def build_baseimag(quiet=False):
         subprocess.check_call(build_base_cmd)
 
     print('[+] Done: base image')
+    return True
 
 
-def build_target(target, quiet=False):
+def build_target(target, quiet=False, no_cache=False):
     target_tag = os.path.join('fuzztest', 'target', target) 
 
     print('[+] Building target: {}'.format(target_tag))
@@ -48,6 +64,8 @@ def build_target(target, quiet=False):
         os.path.join('targets', target, 'Dockerfile'),
         os.path.join('targets', target)
         ]
+    if no_cache:
+        build_target_cmd.insert(2, '--no-cache')
 
     try:
         if quiet:
@@ -59,12 +77,59 @@ def build_target(target, quiet=False):
         print('[-] Falied to build target: {}'.format(target_tag))
         return False
     
+    return build_history(target, quiet, no_cache)
+
+
+def history_tag(target):
+    """Return the tag of the image the fuzzer images of |target| build on."""
+    return os.path.join('fuzztest', 'target', target, 'history')
+
+
+def build_history(target, quiet=False, no_cache=False):
+    """Add the churn index of the target sources on top of the target image,
+    as a separate image tagged history_tag(target).
+
+    The history is scanned once here instead of once per fuzzer image; the
+    variants only differ in how the pass weights the indexed metrics."""
+    target_tag = os.path.join('fuzztest', 'target', target)
+
+    print('[+] Indexing history: {}'.format(history_tag(target)))
+
+    build_history_cmd = [
+        'docker',
+        'build',
+        '--tag',
+        history_tag(target),
+        '--build-arg',
+        'BUILDKIT_INLINE_CACHE=1',
+        '--build-arg',
+        'parent_image={}'.format(target_tag),
+        '--cache-from',
+        history_tag(target),
+        '--file',
+        os.path.join('history', 'Dockerfile'),
+        CHURN_INDEX_DIR
+    ]
+    if no_cache:
+        build_history_cmd.insert(2, '--no-cache')
+
+    try:
+        if quiet:
+            subprocess.check_call(build_history_cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        else:
+            subprocess.check_call(build_history_cmd)
+        print('[+] Done: history: {}'.format(history_tag(target)))
+    except Exception as e:
+        print('[-] Falied to index history: {}'.format(history_tag(target)))
+        return False
+
     return True
     
 
-def build_fuzzer(fuzzer, target, build_log_path=None, quiet=False):
+def build_fuzzer(fuzzer, target, build_log_path=None, quiet=False, no_cache=False):
     target_tag = os.path.join('fuzztest', 'target', target) 
     fuzzer_tag = os.path.join(target_tag, fuzzer)
+    toolchain = get_profile(fuzzer)['toolchain']
 
     print('[+] Building fuzzer: {}'.format(fuzzer_tag))
     
@@ -76,13 +141,17 @@ def build_fuzzer(fuzzer, target, build_log_path=None, quiet=False):
         '--build-arg', 
         'BUILDKIT_INLINE_CACHE=1',
         '--build-arg',
-        'parent_image={}'.format(target_tag),
+        'parent_image={}'.format(history_tag(target)),
+        '--build-arg',
+        'profile={}'.format(fuzzer),
         '--cache-from',
         fuzzer_tag,
         '--file',
-        os.path.join('fuzzers', fuzzer, 'Dockerfile'),
-        os.path.join('fuzzers', fuzzer)
+        os.path.join('fuzzers', toolchain, 'Dockerfile'),
+        CHECKOUT_DIR if toolchain in CHECKOUT_TOOLCHAINS else 'fuzzers'
     ]
+    if no_cache:
+        build_fuzzer_cmd.insert(2, '--no-cache')
 
     try:
         if quiet:
@@ -99,30 +168,181 @@ def build_fuzzer(fuzzer, target, build_log_path=None, quiet=False):
     return True
 
 
-def run_fuzzer(fuzzer, target, trial_id, timeout, fuzz_dir, quiet=False, cpu=0):
-    target_tag = os.path.join('fuzztest', 'target', target) 
-    fuzzer_tag = os.path.join(target_tag, fuzzer)
+def image_id(tag):
+    """Return the id of image |tag|, or None if it does not exist."""
+    try:
+        return subprocess.check_output(['docker', 'image', 'inspect', '--format', '{{.Id}}', tag],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def timed_build(kind, tag, build, *args):
+    """Run |build| and record its wall time and whether the image came from cache."""
+    before = image_id(tag)
+    start = time.time()
+    ok = build(*args)
+    seconds = time.time() - start
+    if not ok:
+        cache = 'failed'
+    else:
+        cache = 'hit' if before is not None and before == image_id(tag) else 'miss'
+    return ok, {'kind': kind, 'image': tag, 'ok': ok, 'seconds': round(seconds, 3), 'cache': cache}
 
-    name = '{}_{}_{}_{}'.format(os.urandom(4).hex(), target, fuzzer, trial_id)
 
+def build_images(targets, fuzzers, parallel, log_dir, quiet=False, no_cache=False):
+    """Build the image graph base -> target -> fuzzer.
 
-    os.makedirs(os.path.join(fuzz_dir, 'input'), exist_ok=True)
-    os.makedirs(os.path.join(fuzz_dir, 'output'), exist_ok=True)
-    run_fuzzer_cmd = 'docker run -e FUZZ_TIMEOUT={} --rm --cpus=1 --cpuset-cpus={} -v {}:/data --name {} {} 2>&1 | tee {}/fuzz.log'.format(timeout, cpu, fuzz_dir, name, fuzzer_tag, fuzz_dir)
-    
-    print('[+] Running fuzzer: {}'.format(run_fuzzer_cmd))
+    Up to |parallel| images are built at once and the fuzzer images of a target
+    start as soon as that target is built. Fuzzers that reuse the build of
+    another profile share its image. With |no_cache| every layer is built
+    again. Return the timing record of every image, images whose parent failed
+    are recorded as skipped."""
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    builds = []
+    for fuzzer in fuzzers:
+        if build_name(fuzzer) not in builds:
+            builds.append(build_name(fuzzer))
+
+    ok, record = timed_build('base', 'fuzztest/base', build_baseimag, quiet, no_cache)
+    records = [record]
+
+    executor = ThreadPoolExecutor(parallel)
     try:
-        if quiet:
-            subprocess.check_call(run_fuzzer_cmd, shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-        else:
-            subprocess.check_call(run_fuzzer_cmd, shell=True)
-        print('[+] Done: target: {}, fuzzer: {}, trial: {}'.format(target, fuzzer, trial_id))
-    except Exception as e:
-        print('[-] Falied to run fuzzing: target: {}, fuzzer: {}, trial: {}'.format(target, fuzzer, trial_id))
-        return False
-    
-    return True
-    
+        pending = {}
+        for target in targets:
+            target_tag = os.path.join('fuzztest', 'target', target)
+            future = executor.submit(timed_build, 'target', target_tag, build_target, target, quiet, no_cache)
+            pending[future] = target
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = pending.pop(future)
+                ok, record = future.result()
+                records.append(record)
+                if record['kind'] != 'target':
+                    continue
+
+                for fuzzer in builds:
+                    fuzzer_tag = os.path.join(record['image'], fuzzer)
+                    if not ok:
+                        records.append({'kind': 'fuzzer', 'image': fuzzer_tag, 'ok': False, 'seconds': 0, 'cache': 'skipped'})
+                        continue
+                    build_log_path = os.path.join(log_dir, '{}_{}.log'.format(target, fuzzer))
+                    future = executor.submit(timed_build, 'fuzzer', fuzzer_tag, build_fuzzer, fuzzer, target, build_log_path, quiet, no_cache)
+                    pending[future] = target
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    return records
+
+
+def run_cache_step(target, fuzzer, volumes, command):
+    """Run a driver command in the image of |fuzzer|, e.g. one that fills a
+    host cache.
+
+    The driver prints its result, such as the cache key, last; return it, or
+    None on failure."""
+    from supervisor import fuzzer_image
+
+    cache_cmd = [
+        'docker',
+        'run',
+        '--rm',
+        '-e',
+        'FUZZ_PROFILE={}'.format(fuzzer),
+    ]
+    for host_dir, container_dir in volumes:
+        cache_cmd += ['-v', '{}:{}'.format(host_dir, container_dir)]
+    cache_cmd += [fuzzer_image(target, fuzzer), 'python3', 'fuzz.py'] + command
+
+    try:
+        output = subprocess.check_output(cache_cmd).decode()
+    except subprocess.CalledProcessError:
+        return None
+
+    lines = output.strip().splitlines()
+    print('\n'.join(lines[:-1]))
+    return lines[-1] if lines else None
+
+
+def cache_seed_corpus(target, fuzzer, cache_dir):
+    """Extract the seed corpus of |target| once into |cache_dir|/<target>/<key>.
+
+    The key only depends on the seeds, so every fuzzer and trial of the target
+    shares the extracted directory. Return its path, or None on failure."""
+    target_cache_dir = os.path.join(cache_dir, target)
+    os.makedirs(target_cache_dir, exist_ok=True)
+
+    key = run_cache_step(target, fuzzer, [(target_cache_dir, '/seeds')], ['seed', '/seeds'])
+    if key is None:
+        print('[-] Failed to cache the seed corpus of {}'.format(target))
+        return None
+    return os.path.join(target_cache_dir, key)
+
+
+def cache_cmin_corpus(target, fuzzer, seed_dir, cache_dir):
+    """Minimize the cached seeds of |target| for the binary of |fuzzer| into
+    |cache_dir|/<target>/<binary hash>-<corpus hash>.
+
+    The container is not limited to one cpu, afl-showmap runs on all of them.
+    Return the minimized corpus, or None on failure."""
+    target_cache_dir = os.path.join(cache_dir, target)
+    os.makedirs(target_cache_dir, exist_ok=True)
+
+    key = run_cache_step(target, fuzzer, [(seed_dir, '/seeds:ro'), (target_cache_dir, '/cmin')], ['cmin', '/cmin', '/seeds'])
+    if key is None:
+        print('[-] Failed to minimize the seed corpus of {} for {}'.format(target, fuzzer))
+        return None
+    return os.path.join(target_cache_dir, key)
+
+
+def fuzzed_time(output_dir):
+    """Estimate how long the afl-fuzz run in |output_dir| fuzzed, for
+    campaigns that predate the experiment manifest."""
+    from time2bug import read_fuzzer_stats
+    try:
+        stats = read_fuzzer_stats(os.path.join(output_dir, 'fuzzer_stats'))
+        return max(int(stats['last_update']) - int(stats['start_time']), 0)
+    except (OSError, KeyError, ValueError):
+        return 0
+
+
+def plan_campaign(manifest, campaign, max_time):
+    """Return |campaign| as it should run now, or None if it is done.
+
+    A campaign that fuzzed in an earlier, interrupted run of the experiment is
+    resumed in place for what is left of |max_time|; any other starts over
+    from an empty output directory."""
+    from archive import is_archived
+    from manifest import DONE
+    # archive.py packs campaigns once they are done.
+    if manifest.state(campaign) == DONE or is_archived(campaign.fuzz_dir):
+        return None
+
+    output_dir = os.path.join(campaign.fuzz_dir, 'output')
+    # The queue of a single afl-fuzz, or of the master of an ensemble.
+    if any(os.path.isdir(os.path.join(output_dir, instance, 'queue')) for instance in ('', 'master')):
+        elapsed = manifest.elapsed(campaign) if manifest.get(campaign) else fuzzed_time(output_dir)
+        budget = None
+        if max_time > 0:
+            if elapsed >= max_time:
+                manifest.update(campaign, state=DONE, elapsed=elapsed)
+                return None
+            budget = max_time - elapsed
+        manifest.update(campaign, elapsed=elapsed)
+        return campaign._replace(budget=budget, resume=True)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return campaign
+
+
+def print_build_times(records):
+    print('[+] Build times:')
+    for record in sorted(records, key=lambda r: -r['seconds']):
+        print('  {:>10.1f}s  {:<7}  {:<6}  {}'.format(record['seconds'], record['cache'], record['kind'], record['image']))
 
 
 if __name__ == '__main__':
@@ -136,95 +356,189 @@ if __name__ == '__main__':
     parser.add_argument('-mt', '--max_time', type=float, help='max time for each trial', default=10 * 60)
     parser.add_argument('-pr', '--parallel-run', type=int, help='parallel count of runners', default=0)
     parser.add_argument('-pb', '--parallel-build', type=int, help='parallel count of builders', default=0)
+    parser.add_argument('-i', '--instances', type=int, help='cpus of each campaign, with one afl-fuzz -M/-S instance per cpu', default=1)
+    parser.add_argument('--placement', choices=['flat', 'topology'], help='how to pick cpus: in affinity order, or one per physical core with node-local memory', default='flat')
+    parser.add_argument('--hosts', type=str, help='inventory of the hosts to run on over ssh, `<host> <cores> [<data dir>]` per line; images must be built on every host', default=None)
+    parser.add_argument('--ssh', type=str, help='command running a command on a host, e.g. ./ssh-local to try --hosts on this one', default='ssh -o BatchMode=yes')
     parser.add_argument('--data-dir', type=str, help='directory to store results', default='./results')
+    parser.add_argument('--status-interval', type=float, help='seconds between writes of <data-dir>/status.json, 0 to disable live telemetry', default=10)
+    parser.add_argument('--telemetry-poll', action='store_true', help='poll campaign outputs instead of using inotify')
+    parser.add_argument('--rebalance', choices=['off', 'flag', 'migrate', 'restart'], help='what to do with campaigns far slower than the median of their target and fuzzer (needs live telemetry)', default='off')
+    parser.add_argument('--slow-ratio', type=float, help='slow means below this fraction of the median execs/sec', default=0.5)
+    parser.add_argument('--stop-after-crash', type=float, help='stop a campaign this many minutes after its first crash (needs live telemetry)', default=None)
+    parser.add_argument('--stop-without-paths', type=float, help='stop a campaign after this many hours without a new path (needs live telemetry)', default=None)
+    parser.add_argument('--spare-slots', type=int, help='cpus kept free to move slow campaigns to', default=0)
+    parser.add_argument('--seed-cache-dir', type=str, help='directory to extract seed corpora to, once per target', default='./seed_cache')
+    parser.add_argument('--no-seed-cache', action='store_true', help='let every trial extract its own seed corpus')
+    parser.add_argument('--cmin', action='store_true', help='minimize the seed corpus of each target and build before fuzzing')
+    parser.add_argument('--cmin-cache-dir', type=str, help='directory to store minimized corpora', default='./cmin_cache')
+    parser.add_argument('--tmpfs-output', type=str, help='let afl-fuzz write to a tmpfs of this size (e.g. 2g) instead of --data-dir, which gets checkpoints of it', default=None)
+    parser.add_argument('--checkpoint-interval', type=float, help='seconds between two copies of the tmpfs output to --data-dir', default=5 * 60)
+    parser.add_argument('--fresh', action='store_true', help='discard the results and manifest of an earlier run in --data-dir instead of resuming it')
+    parser.add_argument('--no-cache', action='store_true', help='build every image from scratch instead of using the docker build cache')
     parser.add_argument('--fuzzer-build-log-dir', type=str, help='directory to store fuzzer build logs', default='./fuzzer_build_logs')
 
     args = parser.parse_args()
     args.data_dir = os.path.abspath(args.data_dir)
     args.fuzzer_build_log_dir = os.path.abspath(args.fuzzer_build_log_dir)
+    args.seed_cache_dir = os.path.abspath(args.seed_cache_dir)
+    args.cmin_cache_dir = os.path.abspath(args.cmin_cache_dir)
+    if args.instances < 1:
+        parser.error('--instances must be at least 1')
+    if args.cmin and args.no_seed_cache:
+        parser.error('--cmin minimizes the seed cache, it cannot be used with --no-seed-cache')
 
     fuzzers = args.fuzzers
     targets = args.targets
 
+    for fuzzer in fuzzers:
+        try:
+            profile = get_profile(fuzzer)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.run and profile['coverage']:
+            parser.error('{} is a coverage build, measure campaigns with coverage.py'.format(fuzzer))
+
     if args.build:
         os.makedirs(args.fuzzer_build_log_dir, exist_ok=True)
-        build_baseimag()
+        import json
 
-        if args.parallel_build > 0:
-            from multiprocessing import Pool
+        parallel = max(args.parallel_build, 1)
+        try:
+            records = build_images(targets, fuzzers, parallel, args.fuzzer_build_log_dir, quiet=args.parallel_build > 0,
+                                   no_cache=args.no_cache)
+        except KeyboardInterrupt:
+            exit()
 
-            pool = Pool(args.parallel_build)
-            try:
-                results = pool.starmap(build_target, [(target, True) for target in targets])
-
-                if results.count(True) != len(results):
-                    print('[-] Failed!')
-                    exit(-1)
-            except KeyboardInterrupt:
-                pool.terminate()
-                pool.join()
-                exit()
-            finally:
-                pool.close()
-
-            pool = Pool(args.parallel_build)
-            try:
-                results = pool.starmap(build_fuzzer, [(fuzzer, target, os.path.join(args.fuzzer_build_log_dir, '{}_{}.log'.format(target, fuzzer)), True) for target in targets for fuzzer in fuzzers])
-                if results.count(True) != len(results):
-                    print('[-] Failed!')
-                    exit(-1)
-            except KeyboardInterrupt:
-                pool.terminate()
-                pool.join()
-                exit()
-            finally:
-                pool.close()
-        else:
-            for target in targets:
-                build_target(target)
-            for target in targets:
-                for fuzzer in fuzzers:
-                    build_fuzzer(fuzzer, target)
+        print_build_times(records)
+        with open(os.path.join(args.fuzzer_build_log_dir, 'build_times.json'), 'w') as f:
+            json.dump(records, f, indent=2)
+
+        if not all(record['ok'] for record in records):
+            print('[-] Failed!')
+            exit(-1)
 
 
     if args.run:
+        import asyncio
         import psutil
-        # get all core id
-        cpu_ids = psutil.Process(1).cpu_affinity()
+        import topology
+        from archive import ARCHIVE_NAME
+        from coverage import COVERAGE_NAME
+        from manifest import MANIFEST_NAME, Manifest
+        from supervisor import Campaign, EVENTS_NAME, OutputTmpfs, RebalancePolicy, StopPolicy, Supervisor
+        from triage import TRIAGE_NAME
         os.makedirs(args.data_dir, exist_ok=True)
-        if args.parallel_run > 0:
-            from multiprocessing import Pool, cpu_count
-
-            if args.parallel_run > cpu_count():
-                raise ValueError('Parallel count must less than the number of total cpu cores ')
-
-            pool = Pool(args.parallel_run)
-            idx = 0
-
 
+        slot_count = (max(args.parallel_run, 1) + (args.spare_slots if args.rebalance != 'off' else 0)) * args.instances
+        cluster = None
+        if args.hosts:
+            from cluster import Cluster, plan_slots, read_inventory
+            if args.placement == 'topology':
+                parser.error('--placement topology reads the cpus of this host, it cannot be used with --hosts')
             try:
-                for trial_id in range(args.count):
-                    trial_dir = os.path.join(args.data_dir, 'trial_{}'.format(trial_id))
-                    for target in targets:
-                        for fuzzer in fuzzers:
-                            fuzz_dir = os.path.join(trial_dir, target, fuzzer)
-                            os.makedirs(fuzz_dir, exist_ok=True)
-                            pool.apply_async(run_fuzzer, args=(fuzzer, target, trial_id, args.max_time, fuzz_dir), kwds={'quiet': True, 'cpu': cpu_ids[idx]})
-                            idx = (idx + 1) % args.parallel_run
-                pool.close()
-                pool.join()
-            except KeyboardInterrupt:
-                pool.terminate()
-                pool.join()
-
+                hosts = read_inventory(args.hosts, args.data_dir)
+            except ValueError as e:
+                parser.error(str(e))
+            cluster = Cluster(hosts, args.data_dir, args.ssh)
+            slots = plan_slots(hosts)
+            print('[+] Hosts: {}'.format(', '.join('{} ({} cores, {})'.format(*host) for host in hosts)))
         else:
-            try:
-                for trial_id in range(args.count):
-                    trial_dir = os.path.join(args.data_dir, 'trial_{}'.format(trial_id))
-                    for target in targets:
-                        for fuzzer in fuzzers:
-                            fuzz_dir = os.path.join(trial_dir, target, fuzzer)
-                            os.makedirs(fuzz_dir, exist_ok=True)
-                            run_fuzzer(fuzzer, target, trial_id, args.max_time, fuzz_dir, cpu=cpu_ids[0])
-            except KeyboardInterrupt:
-                pass
\ No newline at end of file
+            # get all core id
+            cpu_ids = psutil.Process(1).cpu_affinity()
+            if args.placement == 'topology':
+                cpu_topology = topology.read_topology(cpu_ids)
+                slots = topology.plan_placement(cpu_topology, slot_count)
+                print('[+] CPU layout:\n{}'.format(topology.format_layout(slots, cpu_topology)))
+            else:
+                slots = topology.flat_placement(cpu_ids, slot_count)
+
+        if args.instances > 1:
+            slots = topology.group_slots(slots, args.instances)
+            if not slots:
+                parser.error('no host or NUMA node has {} cpus for --instances'.format(args.instances))
+            print('[+] Ensemble slots: {}'.format(', '.join(
+                '{}{}'.format(slot.cpu, '' if slot.host is None else '@' + slot.host) for slot in slots)))
+        spare = args.spare_slots if args.rebalance != 'off' else 0
+        if len(slots) <= spare:
+            parser.error('{} slots leave none beside the {} --spare-slots to run campaigns'.format(len(slots), spare))
+
+        seed_dirs = {}
+        if not args.no_seed_cache:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(slot_count) as executor:
+                futures = {target: executor.submit(cache_seed_corpus, target, fuzzers[0], args.seed_cache_dir) for target in targets}
+            seed_dirs = {target: future.result() for target, future in futures.items()}
+
+        # (target, build) -> minimized corpus; variants sharing a build share it
+        cmin_dirs = {}
+        if args.cmin:
+            for target in targets:
+                for fuzzer in fuzzers:
+                    key = (target, build_name(fuzzer))
+                    if key not in cmin_dirs and seed_dirs.get(target):
+                        cmin_dirs[key] = cache_cmin_corpus(target, fuzzer, seed_dirs[target], args.cmin_cache_dir)
+
+        manifest_path = os.path.join(args.data_dir, MANIFEST_NAME)
+        if args.fresh and os.path.exists(manifest_path):
+            os.unlink(manifest_path)
+        manifest = Manifest(manifest_path)
+        if manifest.max_time is not None and manifest.max_time != args.max_time:
+            print('[!] The experiment ran with --max_time {}, campaigns are resumed for --max_time {}'.format(
+                manifest.max_time, args.max_time))
+        manifest.max_time = args.max_time
+
+        campaigns = []
+        done = 0
+        for trial_id in range(args.count):
+            trial_dir = os.path.join(args.data_dir, 'trial_{}'.format(trial_id))
+            for target in targets:
+                for fuzzer in fuzzers:
+                    fuzz_dir = os.path.join(trial_dir, target, fuzzer)
+                    if args.fresh:
+                        shutil.rmtree(os.path.join(fuzz_dir, 'output'), ignore_errors=True)
+                        for name in (EVENTS_NAME, ARCHIVE_NAME, TRIAGE_NAME, COVERAGE_NAME):
+                            if os.path.exists(os.path.join(fuzz_dir, name)):
+                                os.unlink(os.path.join(fuzz_dir, name))
+                    os.makedirs(fuzz_dir, exist_ok=True)
+                    seed_dir = cmin_dirs.get((target, build_name(fuzzer))) or seed_dirs.get(target)
+                    campaign = plan_campaign(manifest, Campaign(trial_id, target, fuzzer, fuzz_dir, seed_dir), args.max_time)
+                    if campaign is None:
+                        done += 1
+                    else:
+                        campaigns.append(campaign)
+        manifest.save()
+        print('[+] Manifest: {}: {} campaigns done, {} to resume, {} to start'.format(
+            manifest_path, done, sum(c.resume for c in campaigns), sum(not c.resume for c in campaigns)))
+
+        telemetry = None
+        if args.status_interval > 0:
+            from telemetry import Telemetry
+            telemetry = Telemetry(os.path.join(args.data_dir, 'status.json'), args.status_interval,
+                                  use_inotify=not args.telemetry_poll)
+            print('[+] Live status: {}'.format(telemetry.status_path))
+
+        rebalance = None
+        if args.rebalance != 'off':
+            if telemetry is None:
+                parser.error('--rebalance needs live telemetry, --status-interval must not be 0')
+            rebalance = RebalancePolicy(args.rebalance, args.slow_ratio, min_group=3, warmup=5 * 60, interval=60, max_actions=2)
+
+        stop = None
+        if args.stop_after_crash is not None or args.stop_without_paths is not None:
+            if telemetry is None:
+                parser.error('--stop-after-crash and --stop-without-paths need live telemetry, --status-interval must not be 0')
+            stop = StopPolicy(None if args.stop_after_crash is None else args.stop_after_crash * 60,
+                              None if args.stop_without_paths is None else args.stop_without_paths * 3600)
+
+        tmpfs = None
+        if args.tmpfs_output:
+            tmpfs = OutputTmpfs(args.tmpfs_output, args.checkpoint_interval)
+
+        supervisor = Supervisor(slots, args.max_time, quiet=args.parallel_run > 0, telemetry=telemetry,
+                                rebalance=rebalance, spare=args.spare_slots, stop=stop, manifest=manifest, cluster=cluster,
+                                tmpfs=tmpfs)
+        try:
+            asyncio.run(supervisor.run(campaigns))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,180 @@
+#!/bin/python3
+
+import collections
+import os
+import sys
+import warnings
+
+import numpy as np
+
+from time2bug import iter_campaigns, load_fuzzer_stats, load_plot_data
+
+
+# Metric name -> (plot_data column, cumulative): cumulative counters keep
+# their last value after a campaign ends, rates do not.
+SERIES_METRICS = {
+    'paths': ('paths_total', True),
+    'execs': ('execs_per_sec', False),
+    'crashes': ('unique_crashes', True),
+}
+
+SERIES_NAME = 'series.csv'
+SERIES_HEADER = 'target,fuzzer,metric,time,campaigns,mean,median,low,high'
+
+
+def campaign_span(fuzzer_dir):
+    """Return (start_time, seconds fuzzed) of a campaign from its
+    fuzzer_stats, or None if it has none."""
+    try:
+        stats = load_fuzzer_stats(fuzzer_dir)
+        start = int(stats['start_time'])
+        return start, max(int(stats['last_update']) - start, 0)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def time_grid(horizon, step):
+    """Return the seconds 0, |step|, ... up to |horizon| included."""
+    return np.arange(0, horizon + step, step, dtype=np.int64)
+
+
+def step_interpolate(times, values, grid, out, hold=True):
+    """Write into |out| the value of the step function (|times|, |values|) at
+    each point of |grid|: the latest value at or before it.
+
+    Points before the first sample are NaN, and so are points after the last
+    one unless |hold|."""
+    if not len(times):
+        out[:] = np.nan
+        return
+    idx = np.searchsorted(times, grid, side='right') - 1
+    out[:] = values[np.maximum(idx, 0)]
+    out[idx < 0] = np.nan
+    if not hold:
+        out[grid > times[-1]] = np.nan
+
+
+def load_series(fuzzer_dirs, grid, metrics=tuple(SERIES_METRICS)):
+    """Return {metric: array of (campaign, grid point)} of the plot_data of
+    |fuzzer_dirs| on the common time |grid|, seconds since start_time.
+
+    The arrays are allocated once and filled one file at a time, so only a
+    single plot_data is parsed in memory at once; campaigns without
+    plot_data are rows of NaN. Archived campaigns are read in place."""
+    arrays = {metric: np.full((len(fuzzer_dirs), len(grid)), np.nan, dtype=np.float32) for metric in metrics}
+    columns = ['unix_time'] + [SERIES_METRICS[metric][0] for metric in metrics]
+    for row, fuzzer_dir in enumerate(fuzzer_dirs):
+        plot_data = load_plot_data(fuzzer_dir, columns)
+        if plot_data is None:
+            print('[-] plot_data missing: {}'.format(fuzzer_dir), file=sys.stderr)
+            continue
+        if len(plot_data) == 0:
+            continue
+
+        span = campaign_span(fuzzer_dir)
+        start = span[0] if span else int(plot_data['unix_time'].iat[0])
+        times = plot_data['unix_time'].to_numpy() - start
+        for metric in metrics:
+            column, cumulative = SERIES_METRICS[metric]
+            step_interpolate(times, plot_data[column].to_numpy(dtype=np.float64), grid, arrays[metric][row],
+                             hold=cumulative)
+    return arrays
+
+
+def bands(array, percentiles=(25, 75)):
+    """Return (campaigns, mean, median, low, high) per grid point of |array|,
+    over the campaigns that have a value there; low and high are the
+    |percentiles|."""
+    count = np.count_nonzero(~np.isnan(array), axis=0)
+    with warnings.catch_warnings():
+        # All-NaN columns give NaN, which is what they are.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(array, axis=0)
+        low, median, high = np.nanpercentile(array, [percentiles[0], 50, percentiles[1]], axis=0)
+    return count, mean, median, low, high
+
+
+def group_campaigns(results_dir):
+    """Return {target: {fuzzer: [fuzzer_dir]}} of |results_dir|, and the
+    longest time any campaign fuzzed."""
+    groups = collections.defaultdict(lambda: collections.defaultdict(list))
+    horizon = 0
+    for _, target, fuzzer, fuzzer_dir in iter_campaigns(results_dir):
+        groups[target][fuzzer].append(fuzzer_dir)
+        span = campaign_span(fuzzer_dir)
+        if span:
+            horizon = max(horizon, span[1])
+    return groups, horizon
+
+
+def render(path, target, metric, grid, fuzzer_bands, percentiles):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    hours = grid / 3600
+    for fuzzer, (_, _, median, low, high) in fuzzer_bands.items():
+        line, = ax.step(hours, median, where='post', label=fuzzer)
+        ax.fill_between(hours, low, high, step='post', alpha=0.2, color=line.get_color())
+    ax.set_title('{}: {} (median, p{}-p{})'.format(target, metric, *percentiles))
+    ax.set_xlabel('hours')
+    ax.set_ylabel(SERIES_METRICS[metric][0])
+    ax.legend()
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_results(results_dir, out_dir, step, percentiles, metrics, plot=True):
+    """Aggregate the plot_data of all campaigns of |results_dir| per target
+    and fuzzer into |out_dir|/SERIES_NAME, and with |plot| render one
+    <target>_<metric>.png per target and metric."""
+    groups, horizon = group_campaigns(results_dir)
+    grid = time_grid(horizon, step)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with open(os.path.join(out_dir, SERIES_NAME), 'w') as f:
+        f.write(SERIES_HEADER + '\n')
+        for target, fuzzers in sorted(groups.items()):
+            target_bands = {metric: {} for metric in metrics}
+            for fuzzer, fuzzer_dirs in sorted(fuzzers.items()):
+                arrays = load_series(fuzzer_dirs, grid, metrics)
+                for metric in metrics:
+                    target_bands[metric][fuzzer] = bands(arrays[metric], percentiles)
+                    rows = np.column_stack((grid,) + target_bands[metric][fuzzer])
+                    # Grid points no campaign reached have no statistics.
+                    np.savetxt(f, rows[rows[:, 1] > 0], delimiter=',',
+                               fmt=['{},{},{},%d'.format(target, fuzzer, metric), '%d', '%.4f', '%.4f', '%.4f', '%.4f'])
+                print('[+] {}/{}: {} campaigns'.format(target, fuzzer, len(fuzzer_dirs)), file=sys.stderr)
+
+            if plot:
+                for metric in metrics:
+                    render(os.path.join(out_dir, '{}_{}.png'.format(target, metric)), target, metric, grid,
+                           target_bands[metric], percentiles)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Aggregate plot_data across trials and plot it')
+    parser.add_argument('results_dir', type=str, help='results directory of run_fuzz.py')
+    parser.add_argument('-o', '--out-dir', type=str, help='directory to write series.csv and plots to, default <results_dir>/plots', default=None)
+    parser.add_argument('--step', type=int, help='seconds between two points of the common time grid', default=60)
+    parser.add_argument('--band', type=float, nargs=2, help='percentiles of the band around the median', default=(25, 75))
+    parser.add_argument('--metrics', nargs='+', choices=list(SERIES_METRICS), help='metrics to aggregate', default=list(SERIES_METRICS))
+    parser.add_argument('--no-plot', action='store_true', help='only write series.csv, without matplotlib')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print('Error: {} is not a directory'.format(args.results_dir), file=sys.stderr)
+        sys.exit(1)
+    if args.step <= 0:
+        parser.error('--step must be positive')
+    if not args.no_plot:
+        try:
+            import matplotlib
+        except ImportError:
+            parser.error('plotting needs matplotlib, install it or pass --no-plot')
+
+    out_dir = args.out_dir or os.path.join(args.results_dir, 'plots')
+    plot_results(args.results_dir, out_dir, args.step, tuple(args.band), args.metrics, plot=not args.no_plot)
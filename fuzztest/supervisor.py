@@ -0,0 +1,480 @@
+#!/bin/python3
+
+import asyncio
+import collections
+import json
+import os
+import shlex
+import shutil
+import sys
+import time
+
+from fuzzers.profiles import build_name
+from manifest import DONE, FAILED, RUNNING
+from topology import slot_cpus
+
+
+# Time a container may run past FUZZ_TIMEOUT (seed preparation, shutdown)
+# before it is killed.
+CONTAINER_GRACE_TIME = 10 * 60
+
+LOG_CHUNK_SIZE = 64 * 1024
+
+# Per-campaign log of what the supervisor did to it, next to fuzz.log.
+EVENTS_NAME = 'events.jsonl'
+
+# When to stop a campaign before its time budget, in seconds, None to never:
+# after_crash: that long after its first crash; without_paths: after that long
+# without a new path.
+StopPolicy = collections.namedtuple('StopPolicy', ['after_crash', 'without_paths'])
+STOP_CHECK_INTERVAL = 30
+# Seconds `docker stop` waits for afl-fuzz to exit before killing it.
+STOP_TIMEOUT = 30
+
+# What to do with a campaign much slower than its siblings (same target and
+# fuzzer): flag it, move its container to a spare cpu, or restart it there.
+# ratio: slow below ratio * median execs/sec; min_group: siblings needed for a
+# median; warmup: seconds a campaign runs on a cpu before it is judged;
+# interval: seconds between checks; max_actions: events per campaign.
+RebalancePolicy = collections.namedtuple('RebalancePolicy',
+                                         ['action', 'ratio', 'min_group', 'warmup', 'interval', 'max_actions'])
+
+# take_spare_slot: a slot on any host.
+ANY_HOST = object()
+
+# Let afl-fuzz write to a tmpfs of |size| (docker --tmpfs syntax, e.g. 2g)
+# copied to the output directory every |interval| seconds.
+OutputTmpfs = collections.namedtuple('OutputTmpfs', ['size', 'interval'])
+TMPFS_MOUNT = '/tmpfs'
+
+# Seconds between two updates of the fuzzing time of running campaigns in the
+# experiment manifest.
+MANIFEST_INTERVAL = 60
+
+# seed_dir: host directory of the extracted seed corpus, mounted read-only as
+# the input directory; None to let the container extract the seeds itself.
+# budget: seconds left to fuzz, None for the full time budget; resume: resume
+# the afl-fuzz run found in the output directory.
+Campaign = collections.namedtuple('Campaign',
+                                  ['trial_id', 'target', 'fuzzer', 'fuzz_dir', 'seed_dir', 'budget', 'resume'],
+                                  defaults=(None, None, False))
+
+
+def fuzzer_image(target, fuzzer):
+    # Variants that only differ at runtime share the image of their build.
+    return os.path.join('fuzztest', 'target', target, build_name(fuzzer))
+
+
+def container_name(campaign):
+    return '{}_{}_{}_{}'.format(os.urandom(4).hex(), campaign.target, campaign.fuzzer, campaign.trial_id)
+
+
+def docker_run_command(campaign, name, timeout, slot, tmpfs=None):
+    """Return the argv running |campaign| in a container pinned to |slot|.
+
+    A slot of several cpus runs an ensemble of one afl-fuzz per cpu."""
+    cpus = len(slot_cpus(slot))
+    command = [
+        'docker',
+        'run',
+        '-e',
+        'FUZZ_TIMEOUT={}'.format(timeout),
+        '-e',
+        'FUZZ_PROFILE={}'.format(campaign.fuzzer),
+        '-e',
+        'FUZZ_INSTANCES={}'.format(cpus),
+        '--rm',
+        '--cpus={}'.format(cpus),
+        '--cpuset-cpus={}'.format(slot.cpu),
+    ]
+    if slot.node is not None:
+        command.append('--cpuset-mems={}'.format(slot.node))
+    command += [
+        '-v',
+        '{}:/data'.format(campaign.fuzz_dir),
+    ]
+    if campaign.resume:
+        command += [
+            '-e',
+            'FUZZ_RESUME=1',
+        ]
+    if tmpfs is not None:
+        command += [
+            '--tmpfs',
+            '{}:rw,size={}'.format(TMPFS_MOUNT, tmpfs.size),
+            '-e',
+            'FUZZ_TMPFS_DIR={}'.format(os.path.join(TMPFS_MOUNT, 'output')),
+            '-e',
+            'FUZZ_CHECKPOINT_INTERVAL={}'.format(tmpfs.interval),
+        ]
+    if campaign.seed_dir is not None:
+        command += [
+            '-v',
+            '{}:/data/input:ro'.format(campaign.seed_dir),
+            '-e',
+            'FUZZ_SEED_CACHE=1',
+        ]
+    command += [
+        '--name',
+        name,
+        fuzzer_image(campaign.target, campaign.fuzzer),
+    ]
+    return command
+
+
+def record_event(campaign, event):
+    """Append |event| to the events of |campaign| in its results directory."""
+    event = dict(event, time=int(time.time()))
+    with open(os.path.join(campaign.fuzz_dir, EVENTS_NAME), 'a') as f:
+        f.write(json.dumps(event) + '\n')
+
+
+class Placement:
+    """The container of a running campaign and the slot it holds."""
+
+    def __init__(self, name, slot, elapsed=0):
+        self.name = name
+        self.slot = slot
+        self.since = time.time()
+        self.started = self.since
+        # Seconds fuzzed by earlier runs of the campaign.
+        self.elapsed = elapsed
+        self.restart = False
+        self.stopping = False
+
+    def fuzzing_time(self, now):
+        return int(self.elapsed + now - self.started)
+
+
+class Supervisor:
+    """Run fuzzing campaigns as containers from a single asyncio event loop.
+
+    Every campaign waits for a free slot, runs `docker run` directly (no shell
+    or tee), has its output streamed to fuzz.log and is killed if it outlives
+    its time budget. A slot is given back as soon as its container exits.
+
+    With a |manifest|, the state and fuzzing time of every campaign is recorded
+    as it starts, runs and exits, so that an interrupted experiment can pick up
+    where it stopped. With |tmpfs|, afl-fuzz writes to memory and its output
+    directory is a checkpoint, see OutputTmpfs.
+
+    Slots with a host run their campaign on that node of the |cluster|, whose
+    output directory is pulled back while it runs.
+
+    With |telemetry|, the figures of running campaigns are collected live; with
+    a |rebalance| policy as well, campaigns far slower than their siblings are
+    moved to one of the last |spare| slots, which are kept out of the pool for
+    that purpose, or to a free slot. The cpu they leave is not used again. With
+    a |stop| policy, campaigns that reached their objective are stopped early
+    and their slot goes to the next queued campaign."""
+
+    def __init__(self, slots, timeout, quiet=False, grace=CONTAINER_GRACE_TIME, telemetry=None,
+                 rebalance=None, spare=0, stop=None, manifest=None, cluster=None, tmpfs=None):
+        self.slots = list(slots)
+        self.timeout = timeout
+        self.quiet = quiet
+        self.grace = grace
+        self.telemetry = telemetry
+        self.rebalance = rebalance
+        self.stop = stop
+        self.manifest = manifest
+        self.cluster = cluster
+        self.tmpfs = tmpfs
+        self.spare = spare if rebalance is not None else 0
+        if self.spare >= len(self.slots):
+            raise ValueError('{} spare slots leave none of the {} slots to run campaigns'.format(spare, len(self.slots)))
+        self.free_slots = None
+        self.spare_slots = []
+        self.quarantined = []
+        self.placements = {}
+        self.actions = collections.Counter()
+
+    async def run(self, campaigns):
+        """Run all |campaigns|, return a list of success flags in the same order."""
+        self.free_slots = asyncio.Queue()
+        split = len(self.slots) - self.spare
+        for slot in self.slots[:split]:
+            self.free_slots.put_nowait(slot)
+        self.spare_slots = self.slots[split:]
+
+        helpers = []
+        if self.manifest is not None:
+            helpers.append(asyncio.ensure_future(self.checkpoint_manifest()))
+        if self.telemetry is not None:
+            helpers.append(asyncio.ensure_future(self.telemetry.run()))
+            if self.rebalance is not None:
+                helpers.append(asyncio.ensure_future(self.monitor()))
+            if self.stop is not None:
+                helpers.append(asyncio.ensure_future(self.enforce_stop_policy()))
+        try:
+            return await asyncio.gather(*(self.run_campaign(c) for c in campaigns))
+        finally:
+            for helper in helpers:
+                helper.cancel()
+            await asyncio.gather(*helpers, return_exceptions=True)
+
+    async def run_campaign(self, campaign):
+        slot = await self.free_slots.get()
+        try:
+            while True:
+                ok = await self.run_container(campaign, slot)
+                placement = self.placements.pop(campaign)
+                slot = placement.slot
+                if not placement.restart:
+                    return ok
+                # Start over on the slot it was moved to, with the full budget.
+                output_dir = os.path.join(campaign.fuzz_dir, 'output')
+                shutil.rmtree(output_dir, ignore_errors=True)
+                campaign = campaign._replace(budget=None, resume=False)
+        finally:
+            placement = self.placements.pop(campaign, None)
+            if placement is not None:
+                slot = placement.slot
+            self.free_slots.put_nowait(slot)
+
+    async def checkpoint_manifest(self):
+        while True:
+            await asyncio.sleep(MANIFEST_INTERVAL)
+            now = time.time()
+            for campaign, placement in list(self.placements.items()):
+                self.manifest.update(campaign, elapsed=placement.fuzzing_time(now))
+
+    def remote(self, slot):
+        """Return the argv prefix running commands on the host of |slot|, None
+        for this host."""
+        return self.cluster.remote(slot.host) if slot.host is not None else None
+
+    def take_spare_slot(self, host=ANY_HOST):
+        """Return a spare slot, or else a free one, on |host|, and whether it
+        was a spare; (None, False) if there is none."""
+        for i, slot in enumerate(self.spare_slots):
+            if host is ANY_HOST or slot.host == host:
+                return self.spare_slots.pop(i), True
+        try:
+            slot = self.free_slots.get_nowait()
+        except asyncio.QueueEmpty:
+            return None, False
+        if host is not ANY_HOST and slot.host != host:
+            self.free_slots.put_nowait(slot)
+            return None, False
+        return slot, False
+
+    def return_slot(self, slot, spare):
+        """Give back a slot of take_spare_slot to the pool it came from."""
+        if spare:
+            self.spare_slots.append(slot)
+        else:
+            self.free_slots.put_nowait(slot)
+
+    async def monitor(self):
+        """Check the throughput of running campaigns every policy interval."""
+        policy = self.rebalance
+        while True:
+            await asyncio.sleep(policy.interval)
+            for telemetry, rate, median in self.telemetry.slow_campaigns(policy.ratio, policy.min_group, policy.warmup):
+                await self.handle_slow(telemetry.campaign, rate, median)
+
+    def stop_reason(self, campaign, now):
+        """Return why |campaign| should stop now, or None."""
+        telemetry = self.telemetry.get(campaign)
+        if telemetry is None or telemetry.state != 'running':
+            return None
+
+        values = telemetry.values
+        first_crash = values['first_crash_time']
+        if self.stop.after_crash is not None and first_crash is not None and \
+                now - first_crash >= self.stop.after_crash:
+            return 'crash found {:.0f}s ago'.format(now - first_crash)
+
+        last_path = values['last_path_time'] or values['start_time']
+        if self.stop.without_paths is not None and last_path is not None and \
+                now - last_path >= self.stop.without_paths:
+            return 'no new path for {:.0f}s'.format(now - last_path)
+
+        return None
+
+    async def enforce_stop_policy(self):
+        while True:
+            await asyncio.sleep(STOP_CHECK_INTERVAL)
+            now = time.time()
+            for campaign, placement in list(self.placements.items()):
+                if placement.stopping or placement.restart:
+                    continue
+                reason = self.stop_reason(campaign, now)
+                if reason is None:
+                    continue
+
+                placement.stopping = True
+                print('[+] Stopping early: target: {}, fuzzer: {}, trial: {}: {}'.format(
+                    campaign.target, campaign.fuzzer, campaign.trial_id, reason))
+                record_event(campaign, {'event': 'stopped', 'reason': reason, 'cpu': placement.slot.cpu})
+                asyncio.ensure_future(stop_container(placement.name, self.remote(placement.slot)))
+
+    async def handle_slow(self, campaign, rate, median):
+        policy = self.rebalance
+        placement = self.placements.get(campaign)
+        if placement is None or placement.restart or placement.stopping:
+            return
+        if self.actions[campaign] >= policy.max_actions or time.time() - placement.since < policy.warmup:
+            return
+        self.actions[campaign] += 1
+
+        event = {
+            'event': 'slow',
+            'execs_per_sec': round(rate, 2),
+            'median_execs_per_sec': round(median, 2),
+            'cpu': placement.slot.cpu,
+            'action': 'flagged',
+        }
+        new_slot, spare = None, False
+        if policy.action != 'flag':
+            # docker update cannot move a container to another host.
+            new_slot, spare = self.take_spare_slot(placement.slot.host if policy.action == 'migrate' else ANY_HOST)
+            if new_slot is None:
+                event['reason'] = 'no free slot'
+
+        if new_slot is not None and policy.action == 'migrate':
+            if not await update_container(placement.name, new_slot, self.remote(new_slot)):
+                event['reason'] = 'docker update failed'
+                self.return_slot(new_slot, spare)
+                new_slot = None
+
+        if new_slot is not None:
+            # Before the kill below: the restart must see the new slot.
+            event['action'] = 'migrated' if policy.action == 'migrate' else 'restarted'
+            event['to_cpu'] = new_slot.cpu
+            old_slot = placement.slot
+            self.quarantined.append(old_slot)
+            placement.slot = new_slot
+            placement.since = time.time()
+            if policy.action == 'restart':
+                placement.restart = True
+                await kill_container(placement.name, self.remote(old_slot))
+
+        print('[!] Slow campaign: target: {}, fuzzer: {}, trial: {}: {:.1f} execs/s, median {:.1f}: {}'.format(
+            campaign.target, campaign.fuzzer, campaign.trial_id, rate, median, event['action']))
+        record_event(campaign, event)
+
+    async def run_container(self, campaign, slot):
+        os.makedirs(os.path.join(campaign.fuzz_dir, 'input'), exist_ok=True)
+        os.makedirs(os.path.join(campaign.fuzz_dir, 'output'), exist_ok=True)
+
+        name = container_name(campaign)
+        elapsed = 0
+        if self.manifest is not None:
+            entry = self.manifest.get(campaign) or {'elapsed': 0, 'runs': 0}
+            elapsed = entry['elapsed'] if campaign.resume else 0
+            self.manifest.update(campaign, state=RUNNING, elapsed=elapsed, runs=entry['runs'] + 1)
+        self.placements[campaign] = Placement(name, slot, elapsed)
+        timeout = campaign.budget if campaign.budget is not None else self.timeout
+        remote = self.remote(slot)
+        if remote is None:
+            command = docker_run_command(campaign, name, timeout, slot, self.tmpfs)
+        else:
+            # The container sees the directories of the campaign on its host.
+            remote_campaign = await self.cluster.prepare(campaign, slot.host)
+            if remote_campaign is None:
+                print('[-] Failed to set up the campaign on {}: target: {}, fuzzer: {}, trial: {}'.format(
+                    slot.host, campaign.target, campaign.fuzzer, campaign.trial_id))
+                if self.manifest is not None:
+                    self.manifest.update(campaign, state=FAILED)
+                return False
+            command = remote + [shlex.join(docker_run_command(remote_campaign, name, timeout, slot, self.tmpfs))]
+        print('[+] Running fuzzer: {}'.format(' '.join(command)))
+        if self.telemetry is not None:
+            self.telemetry.add(campaign)
+
+        deadline = timeout + self.grace if timeout > 0 else None
+        # A resumed campaign keeps the log of its earlier runs.
+        with open(os.path.join(campaign.fuzz_dir, 'fuzz.log'), 'ab' if campaign.resume else 'wb') as log:
+            proc = await asyncio.create_subprocess_exec(*command,
+                                                        stdin=asyncio.subprocess.DEVNULL,
+                                                        stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.STDOUT)
+            pump = asyncio.ensure_future(self.pump_output(proc.stdout, log))
+            exited = asyncio.Event()
+            follower = None
+            if remote is not None:
+                follower = asyncio.ensure_future(self.cluster.follow(slot.host, campaign, exited))
+            interrupted = False
+            try:
+                await asyncio.wait_for(proc.wait(), deadline)
+            except asyncio.TimeoutError:
+                print('[-] Container {} exceeded its time budget, killing it'.format(name))
+                await kill_container(name, remote)
+                await proc.wait()
+            except asyncio.CancelledError:
+                interrupted = True
+                await kill_container(name, remote)
+                await proc.wait()
+                raise
+            finally:
+                await pump
+                # The last pull, before the results are looked at.
+                exited.set()
+                if follower is not None:
+                    await follower
+                restart = self.placements[campaign].restart
+                # Stopped early on purpose, even if `docker stop` had to kill it.
+                ok = proc.returncode == 0 or self.placements[campaign].stopping
+                if self.telemetry is not None:
+                    self.telemetry.remove(campaign, 'restarting' if restart else 'done' if ok else 'failed')
+                if self.manifest is not None and not restart:
+                    # An interrupted campaign stays running in the manifest,
+                    # to be resumed by the next run.
+                    elapsed = self.placements[campaign].fuzzing_time(time.time())
+                    if interrupted:
+                        self.manifest.update(campaign, elapsed=elapsed)
+                    else:
+                        self.manifest.update(campaign, state=DONE if ok else FAILED, elapsed=elapsed)
+
+        if restart:
+            print('[*] Restarting: target: {}, fuzzer: {}, trial: {}'.format(campaign.target, campaign.fuzzer, campaign.trial_id))
+            return False
+
+        if not ok:
+            print('[-] Falied to run fuzzing: target: {}, fuzzer: {}, trial: {}'.format(campaign.target, campaign.fuzzer, campaign.trial_id))
+            return False
+
+        print('[+] Done: target: {}, fuzzer: {}, trial: {}'.format(campaign.target, campaign.fuzzer, campaign.trial_id))
+        return True
+
+    async def pump_output(self, stream, log):
+        """Copy the container output to |log|, and to stdout unless quiet."""
+        while True:
+            chunk = await stream.read(LOG_CHUNK_SIZE)
+            if not chunk:
+                break
+            log.write(chunk)
+            if not self.quiet:
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+
+
+async def docker(args, remote=None):
+    """Run `docker |args|`, on another host through the argv prefix |remote|;
+    return True on success."""
+    command = ['docker'] + args
+    if remote is not None:
+        command = remote + [shlex.join(command)]
+    proc = await asyncio.create_subprocess_exec(*command,
+                                                stdout=asyncio.subprocess.DEVNULL,
+                                                stderr=asyncio.subprocess.DEVNULL)
+    return await proc.wait() == 0
+
+
+async def update_container(name, slot, remote=None):
+    """Move the running container |name| to |slot|, return True on success."""
+    args = ['update', '--cpuset-cpus={}'.format(slot.cpu)]
+    if slot.node is not None:
+        args.append('--cpuset-mems={}'.format(slot.node))
+    return await docker(args + [name], remote)
+
+
+async def stop_container(name, remote=None):
+    """Ask the container to exit, it is killed after STOP_TIMEOUT seconds."""
+    await docker(['stop', '--time', str(STOP_TIMEOUT), name], remote)
+
+
+async def kill_container(name, remote=None):
+    await docker(['kill', name], remote)
@@ -0,0 +1,374 @@
+#!/bin/python3
+
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import os
+import struct
+import time
+
+from time2bug import PLOT_DATA_COLUMNS, read_fuzzer_stats
+
+
+# How often the status file is written, and how often files are checked when
+# inotify is unavailable (e.g. on Docker Desktop mounts).
+STATUS_INTERVAL = 10
+POLL_INTERVAL = 5
+
+# Weight of the newest plot_data sample in the smoothed execs/sec.
+EXECS_EWMA_ALPHA = 0.2
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+INOTIFY_READ_SIZE = 64 * 1024
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+class Inotify:
+    """Minimal non-blocking inotify binding."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Return the pending (wd, mask, name) events."""
+        try:
+            data = os.read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileTail:
+    """Return the complete lines appended to a file since the last read."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = b''
+
+    def read_lines(self):
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # Truncated or replaced, start over.
+                    self.offset = 0
+                    self.partial = b''
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode(errors='replace') for line in lines]
+
+
+class CampaignTelemetry:
+    """Latest figures of one campaign, from its output directory."""
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self.output_dir = os.path.join(campaign.fuzz_dir, 'output')
+        self.plot_data = FileTail(os.path.join(self.output_dir, 'plot_data'))
+        self.stats_mtime = None
+        self.state = 'running'
+        self.values = {
+            'start_time': None,
+            'last_update': None,
+            'execs_per_sec': None,
+            'execs_per_sec_ewma': None,
+            'execs_done': None,
+            'paths_total': None,
+            'unique_crashes': None,
+            'unique_hangs': None,
+            'cycles_done': None,
+            'stability': None,
+            'first_crash_time': None,
+            'last_path_time': None,
+        }
+
+    def read_plot_data(self):
+        """plot_data is appended every few seconds: execs/sec, paths, crashes."""
+        for line in self.plot_data.read_lines():
+            if not line or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in line.split(',')]
+            if len(fields) != len(PLOT_DATA_COLUMNS):
+                continue
+            row = dict(zip(PLOT_DATA_COLUMNS, fields))
+            try:
+                unix_time = int(row['unix_time'])
+                paths_total = int(row['paths_total'])
+                unique_crashes = int(row['unique_crashes'])
+                execs_per_sec = float(row['execs_per_sec'])
+                self.values['cycles_done'] = int(row['cycles_done'])
+                self.values['unique_hangs'] = int(row['unique_hangs'])
+            except ValueError:
+                continue
+
+            ewma = self.values['execs_per_sec_ewma']
+            self.values['execs_per_sec'] = execs_per_sec
+            self.values['execs_per_sec_ewma'] = execs_per_sec if ewma is None else \
+                EXECS_EWMA_ALPHA * execs_per_sec + (1 - EXECS_EWMA_ALPHA) * ewma
+            if self.values['start_time'] is None:
+                self.values['start_time'] = unix_time
+            if unique_crashes > 0 and self.values['first_crash_time'] is None:
+                self.values['first_crash_time'] = unix_time
+            if self.values['paths_total'] is None or paths_total > self.values['paths_total']:
+                self.values['last_path_time'] = unix_time
+            self.values['paths_total'] = paths_total
+            self.values['unique_crashes'] = unique_crashes
+            self.values['last_update'] = unix_time
+
+    def read_fuzzer_stats(self):
+        """fuzzer_stats is rewritten about once a minute; it is the only source
+        of the stability and of the total execs."""
+        path = os.path.join(self.output_dir, 'fuzzer_stats')
+        try:
+            stats = read_fuzzer_stats(path)
+        except FileNotFoundError:
+            return
+
+        def number(key, convert):
+            try:
+                return convert(stats[key].rstrip('%'))
+            except (KeyError, ValueError):
+                return None
+
+        for key, convert in (('execs_done', int), ('stability', float), ('start_time', int)):
+            value = number(key, convert)
+            if value is not None:
+                self.values[key] = value
+        # Before the first plot_data line, fall back to fuzzer_stats.
+        for key, convert in (('execs_per_sec', float), ('paths_total', int), ('unique_crashes', int), ('last_update', int)):
+            if self.values[key] is None:
+                self.values[key] = number(key, convert)
+
+    def poll(self):
+        """Read whatever changed, for when there are no inotify events."""
+        self.read_plot_data()
+        try:
+            mtime = os.stat(os.path.join(self.output_dir, 'fuzzer_stats')).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self.stats_mtime:
+            self.stats_mtime = mtime
+            self.read_fuzzer_stats()
+
+    def handle_event(self, mask, name):
+        if name == 'plot_data' and mask & (IN_MODIFY | IN_CREATE | IN_MOVED_TO):
+            self.read_plot_data()
+        elif name == 'fuzzer_stats' and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            # Only read once afl-fuzz closed it, it is written in place.
+            self.read_fuzzer_stats()
+
+    def to_dict(self):
+        return dict(trial=self.campaign.trial_id,
+                    target=self.campaign.target,
+                    fuzzer=self.campaign.fuzzer,
+                    state=self.state,
+                    **self.values)
+
+
+def find_slow_campaigns(telemetries, ratio, min_group=3, warmup=0, now=None):
+    """Return (telemetry, execs_per_sec, median) of the running campaigns whose
+    smoothed execs/sec is below |ratio| times the median of their target and
+    fuzzer.
+
+    Medians are taken over every campaign of the group that reported, finished
+    ones included, once the group has |min_group| of them. Campaigns younger
+    than |warmup| seconds are neither judged nor counted."""
+    if now is None:
+        now = time.time()
+
+    groups = {}
+    for telemetry in telemetries:
+        values = telemetry.values
+        if values['execs_per_sec_ewma'] is None or values['start_time'] is None:
+            continue
+        if now - values['start_time'] < warmup:
+            continue
+        key = (telemetry.campaign.target, telemetry.campaign.fuzzer)
+        groups.setdefault(key, []).append(telemetry)
+
+    slow = []
+    for members in groups.values():
+        if len(members) < min_group:
+            continue
+        rates = sorted(t.values['execs_per_sec_ewma'] for t in members)
+        middle = len(rates) // 2
+        median = rates[middle] if len(rates) % 2 else (rates[middle - 1] + rates[middle]) / 2
+        for telemetry in members:
+            rate = telemetry.values['execs_per_sec_ewma']
+            if telemetry.state == 'running' and rate < ratio * median:
+                slow.append((telemetry, rate, median))
+    return slow
+
+
+def campaign_key(campaign):
+    return 'trial_{}/{}/{}'.format(campaign.trial_id, campaign.target, campaign.fuzzer)
+
+
+class Telemetry:
+    """Follow the output of running campaigns and publish their figures.
+
+    Campaign output directories are watched with inotify so that only the
+    appended part of plot_data and the rewritten fuzzer_stats are read; where
+    inotify is unavailable the files are polled instead. The latest figures of
+    every campaign are kept in memory and written to |status_path| as JSON
+    every |interval| seconds."""
+
+    def __init__(self, status_path=None, interval=STATUS_INTERVAL, poll_interval=POLL_INTERVAL, use_inotify=True):
+        self.status_path = status_path
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.campaigns = {}
+        self.watches = {}
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                print('[-] inotify is unavailable ({}), polling campaign outputs'.format(e))
+
+    def add(self, campaign):
+        """Start following |campaign|, its output directory must exist."""
+        telemetry = CampaignTelemetry(campaign)
+        self.campaigns[campaign_key(campaign)] = telemetry
+        if self.inotify is not None:
+            try:
+                wd = self.inotify.add_watch(telemetry.output_dir, WATCH_MASK)
+                self.watches[wd] = telemetry
+            except OSError as e:
+                # e.g. fs.inotify.max_user_watches reached, poll this one
+                print('[-] Cannot watch {} ({}), polling it'.format(telemetry.output_dir, e))
+        telemetry.poll()
+
+    def remove(self, campaign, state='done'):
+        """Stop following |campaign|, keeping its final figures."""
+        telemetry = self.campaigns.get(campaign_key(campaign))
+        if telemetry is None:
+            return
+        for wd, watched in list(self.watches.items()):
+            if watched is telemetry:
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+        telemetry.poll()
+        telemetry.state = state
+
+    def get(self, campaign):
+        return self.campaigns.get(campaign_key(campaign))
+
+    def slow_campaigns(self, ratio, min_group=3, warmup=0):
+        """See find_slow_campaigns()."""
+        return find_slow_campaigns(self.campaigns.values(), ratio, min_group, warmup)
+
+    def snapshot(self):
+        return {'time': int(time.time()),
+                'campaigns': {key: telemetry.to_dict() for key, telemetry in self.campaigns.items()}}
+
+    def write_status(self):
+        if self.status_path is None:
+            return
+        tmp_path = '{}.tmp'.format(self.status_path)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.status_path)), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.status_path)
+        except OSError as e:
+            # Keep collecting, the next write may succeed.
+            print('[-] Failed to write {}: {}'.format(self.status_path, e))
+
+    def on_inotify(self):
+        for wd, mask, name in self.inotify.read_events():
+            telemetry = self.watches.get(wd)
+            if telemetry is not None:
+                telemetry.handle_event(mask, name)
+
+    def poll(self):
+        watched = set(map(id, self.watches.values()))
+        for telemetry in self.campaigns.values():
+            if telemetry.state == 'running' and id(telemetry) not in watched:
+                telemetry.poll()
+
+    async def run(self):
+        """Follow the campaigns until cancelled, writing the status file."""
+        loop = asyncio.get_running_loop()
+        if self.inotify is not None:
+            loop.add_reader(self.inotify.fd, self.on_inotify)
+        try:
+            last_write = 0
+            while True:
+                self.poll()
+                if time.monotonic() - last_write >= self.interval:
+                    self.write_status()
+                    last_write = time.monotonic()
+                await asyncio.sleep(min(self.poll_interval, self.interval))
+        finally:
+            if self.inotify is not None:
+                loop.remove_reader(self.inotify.fd)
+            self.write_status()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Show the status file written by run_fuzz.py')
+    parser.add_argument('status', type=str, help='status.json in the results directory')
+
+    args = parser.parse_args()
+
+    with open(args.status, 'r') as f:
+        status = json.load(f)
+
+    print('{:<40} {:>8} {:>10} {:>8} {:>8} {:>9}'.format('campaign', 'state', 'execs/s', 'paths', 'crashes', 'stability'))
+    for key, values in sorted(status['campaigns'].items()):
+        def show(value, fmt='{}'):
+            return '-' if value is None else fmt.format(value)
+        print('{:<40} {:>8} {:>10} {:>8} {:>8} {:>9}'.format(
+            key, values['state'], show(values['execs_per_sec'], '{:.1f}'), show(values['paths_total']),
+            show(values['unique_crashes']), show(values['stability'], '{:.2f}%')))
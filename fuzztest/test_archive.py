@@ -0,0 +1,73 @@
+#!/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from archive import ARCHIVE_NAME, is_archived, pack_campaign, unpack_campaign
+from test_time2bug import write_plot_data
+from time2bug import index_results, load_fuzzer_stats, load_plot_data
+
+
+def read_tree(top):
+    """Return {path: (content or link, mtime_ns)} of the files under |top|."""
+    tree = {}
+    for root, _, names in os.walk(top):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                tree[os.path.relpath(path, top)] = ('-> ' + os.readlink(path), None)
+                continue
+            with open(path, 'rb') as f:
+                tree[os.path.relpath(path, top)] = (f.read(), os.lstat(path).st_mtime_ns)
+    return tree
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.results_dir)
+        self.fuzzer_dir = os.path.join(self.results_dir, 'trial_0', 't', 'afl')
+        output_dir = os.path.join(self.fuzzer_dir, 'output')
+        write_plot_data(os.path.join(output_dir, 'plot_data'), [(1000, 0), (1060, 2), (1120, 2)])
+        with open(os.path.join(output_dir, 'fuzzer_stats'), 'w') as f:
+            f.write('start_time        : 1000\nlast_update       : 1120\nexecs_done        : 10\n')
+        os.makedirs(os.path.join(output_dir, 'queue'))
+        os.makedirs(os.path.join(output_dir, 'crashes'))
+        # The same content twice, stored once.
+        for name in ('queue/id:000000', 'queue/id:000001', 'crashes/id:000000'):
+            with open(os.path.join(output_dir, name), 'w') as f:
+                f.write('seed' if name.startswith('queue') else 'crash')
+            os.utime(os.path.join(output_dir, name), ns=(1050 * 10 ** 9, 1050 * 10 ** 9))
+        os.symlink('queue/id:000000', os.path.join(output_dir, '.cur_input'))
+        os.makedirs(os.path.join(output_dir, 'hangs'))
+
+    def test_round_trip(self):
+        tree = read_tree(self.fuzzer_dir)
+        rows = index_results(self.results_dir, jobs=1, use_cache=False)
+        plot_data = load_plot_data(self.fuzzer_dir)
+        stats = load_fuzzer_stats(self.fuzzer_dir)
+
+        self.assertEqual(pack_campaign(self.fuzzer_dir), (4, 2))
+        self.assertEqual(os.listdir(self.fuzzer_dir), [ARCHIVE_NAME])
+        # time2bug reads the archive in place.
+        self.assertEqual(index_results(self.results_dir, jobs=1, use_cache=False), rows)
+        self.assertTrue(load_plot_data(self.fuzzer_dir).equals(plot_data))
+        self.assertEqual(load_fuzzer_stats(self.fuzzer_dir), stats)
+
+        unpack_campaign(self.fuzzer_dir)
+        self.assertFalse(is_archived(self.fuzzer_dir))
+        unpacked = read_tree(self.fuzzer_dir)
+        # plot_data and fuzzer_stats are written anew, in afl-fuzz's format.
+        for name in ('plot_data', 'fuzzer_stats'):
+            path = os.path.join('output', name)
+            self.assertEqual(unpacked.pop(path)[0], tree.pop(path)[0])
+        self.assertEqual(unpacked, tree)
+        self.assertTrue(os.path.isdir(os.path.join(self.fuzzer_dir, 'output', 'hangs')))
+        self.assertEqual(index_results(self.results_dir, jobs=1, use_cache=False), rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/bin/python3
+
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from calc_avg import bootstrap_mean_ci, mann_whitney_a12, summarize
+
+
+class MannWhitneyTest(unittest.TestCase):
+
+    # p-values of scipy.stats.mannwhitneyu(x, y, method='asymptotic').
+
+    def test_separated(self):
+        u, p, a12 = mann_whitney_a12(np.array([1.0, 2.0, 3.0]), np.array([4.0, 5.0, 6.0]))
+        self.assertEqual((u, a12), (0, 1))
+        self.assertAlmostEqual(p, 0.0808555983700523)
+        # Lower is better: the other way round, x is always worse.
+        u, p_reversed, a12 = mann_whitney_a12(np.array([4.0, 5.0, 6.0]), np.array([1.0, 2.0, 3.0]))
+        self.assertEqual((u, a12), (9, 0))
+        self.assertAlmostEqual(p_reversed, p)
+
+    def test_ties(self):
+        u, p, a12 = mann_whitney_a12(np.array([1.0, 1.0, 2.0]), np.array([1.0, 2.0, 2.0]))
+        self.assertEqual(u, 3)
+        self.assertAlmostEqual(a12, 2 / 3)
+        self.assertAlmostEqual(p, 0.6192567541768621)
+
+    def test_all_tied(self):
+        self.assertEqual(mann_whitney_a12(np.array([5.0, 5.0]), np.array([5.0, 5.0])), (2, 1.0, 0.5))
+
+    def test_empty(self):
+        self.assertTrue(all(math.isnan(value) for value in mann_whitney_a12(np.array([]), np.array([1.0]))))
+
+
+class BootstrapTest(unittest.TestCase):
+
+    def test_interval(self):
+        values = np.arange(100, dtype=float)
+        low, high = bootstrap_mean_ci(values, 2000, 0.95, np.random.default_rng(0))
+        # The standard error of the mean is about 2.9.
+        self.assertLess(low, 49.5)
+        self.assertGreater(high, 49.5)
+        self.assertAlmostEqual(high - low, 2 * 1.96 * values.std() / math.sqrt(len(values)), delta=1.5)
+
+    def test_constant_and_empty(self):
+        self.assertEqual(bootstrap_mean_ci(np.array([3.0, 3.0]), 100, 0.95, np.random.default_rng(0)), (3, 3))
+        self.assertTrue(all(math.isnan(value) for value in bootstrap_mean_ci(np.array([]), 100, 0.95, None)))
+
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_baseline(self):
+        results = pd.DataFrame(
+            [(trial, 't', fuzzer, tte, 1 if tte != -1 else 0, -1, '')
+             for fuzzer, ttes in (('afl', [100, 200, -1]), ('aflchurn', [10, 20, 30])) for trial, tte in enumerate(ttes)],
+            columns=['trial', 'target', 'fuzzer', 'tte', 'total_crashes', 'distinct_bugs', 'bug_ttes'])
+        summary = summarize(results, baseline='afl', n_boot=100).set_index('fuzzer')
+        self.assertEqual(summary.loc['afl', 'valuable_count'], 2)
+        self.assertEqual(summary.loc['afl', 'tte_avg'], 150)
+        self.assertTrue(math.isnan(summary.loc['afl', 'a12']))
+        # A trial without a crash ranks after every one with a crash.
+        self.assertEqual((summary.loc['aflchurn', 'mwu_u'], summary.loc['aflchurn', 'a12']), (0, 1))
+        churn = summary.loc['aflchurn']
+        self.assertTrue(10 <= churn['tte_ci_low'] <= 20 <= churn['tte_ci_high'] <= 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
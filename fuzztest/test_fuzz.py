@@ -0,0 +1,185 @@
+#!/bin/python3
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fuzzers'))
+
+import fuzz
+
+
+class MainTest(unittest.TestCase):
+
+    def test_bench_command(self):
+        with mock.patch.object(fuzz, 'bench_startup') as bench_startup, \
+                mock.patch.object(fuzz, 'run_fuzz') as run_fuzz:
+            fuzz.main(['fuzz.py', 'bench'])
+        bench_startup.assert_called_once_with()
+        run_fuzz.assert_not_called()
+
+
+
+class SeedExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+
+    def test_extract(self):
+        zip_path = os.path.join(self.work_dir, 'seeds.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            zip_file.writestr('dir/', '')
+            zip_file.writestr('a', b'seed')
+            zip_file.writestr('dir/b', b'seed')
+            zip_file.writestr('c', b'other')
+        seed_dir = os.path.join(self.work_dir, 'seeds')
+        os.makedirs(seed_dir)
+
+        extractor = fuzz.SeedExtractor(zip_path, seed_dir)
+        counts = extractor.run()
+        self.assertEqual(counts, {'extracted': 2, 'deduped': 1, 'skipped': 0})
+        self.assertEqual(sorted(os.listdir(seed_dir)),
+                         sorted(hashlib.sha1(content).hexdigest() for content in (b'seed', b'other')))
+        self.assertTrue(extractor.zip_files)
+        # The handle of every thread is closed once the pool is done.
+        self.assertTrue(all(zip_file.fp is None for zip_file in extractor.zip_files))
+
+
+
+def write_plot_rows(path, rows):
+    with open(path, 'w') as f:
+        f.write(fuzz.PLOT_DATA_HEADER)
+        for unix_time, unique_crashes in rows:
+            f.write('{}, 0, 0, 1, 1, 0, 1.00%, {}, 0, 1, 10.00\n'.format(unix_time, unique_crashes))
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def write_run(self, start_time, rows):
+        with open(os.path.join(self.output_dir, fuzz.FUZZER_STATS), 'w') as f:
+            f.write('start_time        : {}\nexecs_done        : 10\n'.format(start_time))
+        write_plot_rows(os.path.join(self.output_dir, fuzz.PLOT_DATA), rows)
+
+    def test_nothing_to_resume(self):
+        self.assertFalse(fuzz.prepare_resume(self.output_dir, self.output_dir))
+        self.assertIsNone(fuzz.load_resume_state(self.output_dir))
+
+    def test_resume(self):
+        os.makedirs(os.path.join(self.output_dir, 'queue'))
+        self.write_run(1000, [(1000, 0), (1060, 2)])
+
+        with mock.patch.object(fuzz.time, 'time', return_value=2000.5):
+            self.assertTrue(fuzz.prepare_resume(self.output_dir, self.output_dir))
+        with open(os.path.join(self.output_dir, fuzz.RESUME_STATE), 'r') as f:
+            state = json.load(f)
+        self.assertEqual(state, {'start_time': 1000, 'offset': 940, 'resumes': 1, 'history': [[2000, 940]]})
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, fuzz.PLOT_DATA)))
+        self.assertEqual(fuzz.fuzzing_time(2010, 1000, fuzz.resume_history(self.output_dir)), 70)
+
+        # afl-fuzz starts over: its own start time, crashes counted from zero.
+        self.write_run(2000, [(2000, 0), (2010, 1)])
+        fuzz.merge_plot_data(self.output_dir)
+        _, rows = fuzz.read_plot_rows(os.path.join(self.output_dir, fuzz.PLOT_DATA))
+        self.assertEqual([(int(row[fuzz.PLOT_UNIX_TIME]), int(row[fuzz.PLOT_UNIQUE_CRASHES])) for row in rows],
+                         [(1000, 0), (1060, 2), (1060, 2), (1070, 3)])
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, fuzz.PLOT_DATA_PREV)))
+        stats = fuzz.read_fuzzer_stats(os.path.join(self.output_dir, fuzz.FUZZER_STATS))
+        self.assertEqual(stats, {'start_time': '1000', 'execs_done': '10'})
+
+
+
+class SyncOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        self.src_dir = os.path.join(work_dir, 'tmpfs')
+        self.dst_dir = os.path.join(work_dir, 'output')
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.src_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def dst_files(self):
+        files = {}
+        for root, _, names in os.walk(self.dst_dir):
+            for name in names:
+                with open(os.path.join(root, name), 'r') as f:
+                    files[os.path.relpath(os.path.join(root, name), self.dst_dir)] = f.read()
+        return files
+
+    def test_sync(self):
+        self.write('fuzzer_stats', 'a')
+        self.write(os.path.join('queue', 'id:000000'), 'seed')
+        self.write('.cur_input', 'skipped')
+        self.assertEqual(fuzz.sync_output(self.src_dir, self.dst_dir), 2)
+        self.assertEqual(self.dst_files(), {'fuzzer_stats': 'a', os.path.join('queue', 'id:000000'): 'seed'})
+
+        # Unchanged files are not copied again.
+        self.assertEqual(fuzz.sync_output(self.src_dir, self.dst_dir), 0)
+
+        # An in-place resume renames crashes/; the old copy goes away.
+        self.write(os.path.join('crashes', 'id:000000'), 'crash')
+        fuzz.sync_output(self.src_dir, self.dst_dir)
+        os.rename(os.path.join(self.src_dir, 'crashes'), os.path.join(self.src_dir, 'crashes.2020-01-01'))
+        self.write('fuzzer_stats', 'bc')
+        self.assertEqual(fuzz.sync_output(self.src_dir, self.dst_dir), 2)
+        self.assertEqual(self.dst_files(), {'fuzzer_stats': 'bc', os.path.join('queue', 'id:000000'): 'seed',
+                                            os.path.join('crashes.2020-01-01', 'id:000000'): 'crash'})
+        self.assertFalse(os.path.exists(os.path.join(self.dst_dir, 'crashes')))
+
+
+
+ASAN_REPORT = '''INFO: Seed: 1
+=================================================================
+==42==ERROR: AddressSanitizer: heap-buffer-overflow on address 0x602000000011 at pc 0x4f2a1b bp 0x7ffd sp 0x7ffd
+READ of size 1 at 0x602000000011 thread T0
+    #0 0x4f2a1b in parse_header(char const*, unsigned long) /src/lib/parse.c:42:7
+    #1 0x4f1000 in __interceptor_memcpy /src/llvm/compiler-rt/asan_interceptors.cpp:10
+    #2 0x4f3b2c in LLVMFuzzerTestOneInput /src/fuzz/target.cc:12:3
+    #3 0x4f4000 in main /src/afl_driver.cpp:300:5
+
+0x602000000011 is located 0 bytes to the right of 1-byte region
+allocated by thread T0 here:
+    #0 0x4a0000 in malloc
+'''
+
+
+class ParseSanitizerReportTest(unittest.TestCase):
+
+    def test_asan(self):
+        # Runtime frames are dropped, frames stop at the fuzzer entry point.
+        self.assertEqual(fuzz.parse_sanitizer_report(ASAN_REPORT),
+                         ('heap-buffer-overflow READ', ['parse_header parse.c', 'LLVMFuzzerTestOneInput target.cc']))
+
+    def test_ubsan(self):
+        report = ('/src/lib/parse.c:10:5: runtime error: signed integer overflow\n'
+                  '    #0 0x4f2a1b in parse_header /src/lib/parse.c:10:5\n'
+                  '    #1 0x4f2a2b (/out/target+0x4f2a2b)\n')
+        self.assertEqual(fuzz.parse_sanitizer_report(report),
+                         ('undefined-behavior', ['parse_header parse.c', '/out/target+0x4f2a2b']))
+
+    def test_no_report(self):
+        self.assertEqual(fuzz.parse_sanitizer_report('INFO: Seed: 1\nSegmentation fault\n'), (None, []))
+
+    def test_frame_limit(self):
+        frames = ''.join('    #{0} 0x{0:x} in f{0} /src/f.c:{0}\n'.format(i) for i in range(20))
+        _, parsed = fuzz.parse_sanitizer_report('==1==ERROR: AddressSanitizer: SEGV on unknown address\n' + frames)
+        self.assertEqual(parsed, ['f{} f.c'.format(i) for i in range(fuzz.TRIAGE_STACK_FRAMES)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from series import bands, load_series, step_interpolate, time_grid
+from test_time2bug import write_plot_data
+
+
+def assert_steps(actual, expected):
+    # NaN marks the points without a value, and equals NaN here.
+    np.testing.assert_array_equal(np.array(actual), np.array(expected, dtype=np.float64))
+
+
+class StepInterpolateTest(unittest.TestCase):
+
+    def interpolate(self, times, values, grid, hold=True):
+        out = np.zeros(len(grid))
+        step_interpolate(np.array(times), np.array(values, dtype=np.float64), np.array(grid), out, hold=hold)
+        return out.tolist()
+
+    def test_latest_value(self):
+        # A sample counts from its own time on.
+        assert_steps(self.interpolate([10, 20, 30], [1, 2, 3], [10, 15, 20, 29, 30]), [1, 1, 2, 2, 3])
+
+    def test_before_first_sample(self):
+        assert_steps(self.interpolate([10, 20], [1, 2], [0, 9, 10]), [np.nan, np.nan, 1])
+
+    def test_after_last_sample(self):
+        assert_steps(self.interpolate([10, 20], [1, 2], [20, 100]), [2, 2])
+        assert_steps(self.interpolate([10, 20], [1, 2], [20, 100], hold=False), [2, np.nan])
+
+    def test_no_samples(self):
+        assert_steps(self.interpolate([], [], [0, 10]), [np.nan, np.nan])
+
+
+class LoadSeriesTest(unittest.TestCase):
+
+    def test_load_series(self):
+        results_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, results_dir)
+        fuzzer_dirs = [os.path.join(results_dir, 'trial_{}'.format(trial), 't', 'afl') for trial in range(3)]
+        write_plot_data(os.path.join(fuzzer_dirs[0], 'output', 'plot_data'), [(1000, 0), (1060, 2)])
+        write_plot_data(os.path.join(fuzzer_dirs[1], 'output', 'plot_data'), [(5000, 1)])
+        # The third campaign has no plot_data.
+
+        arrays = load_series(fuzzer_dirs, time_grid(120, 60), metrics=('crashes', 'execs'))
+        assert_steps(arrays['crashes'], [[0, 2, 2], [1, 1, 1], [np.nan] * 3])
+        assert_steps(arrays['execs'], [[10, 10, np.nan], [10, np.nan, np.nan], [np.nan] * 3])
+
+        count, mean, _, _, _ = bands(arrays['crashes'])
+        self.assertEqual(count.tolist(), [2, 2, 2])
+        assert_steps(mean, [0.5, 1.5, 1.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/bin/python3
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import supervisor
+from supervisor import Campaign, Placement, RebalancePolicy, Supervisor
+from topology import Slot
+
+
+class HandleSlowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fuzz_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fuzz_dir)
+        self.campaign = Campaign(0, 't', 'afl', self.fuzz_dir)
+
+    def handle_slow(self, migrated):
+        """Flag the campaign of slot 0 as slow with 2 free and 1 spare slot,
+        return the supervisor."""
+        policy = RebalancePolicy('migrate', 0.5, min_group=3, warmup=0, interval=60, max_actions=2)
+        slots = [Slot(cpu, None) for cpu in range(4)]
+        sup = Supervisor(slots, 60, rebalance=policy, spare=1)
+
+        async def run():
+            sup.free_slots = asyncio.Queue()
+            for slot in slots[1:3]:
+                sup.free_slots.put_nowait(slot)
+            sup.spare_slots = slots[3:]
+            sup.placements[self.campaign] = Placement('c', slots[0])
+            with mock.patch.object(supervisor, 'update_container', mock.AsyncMock(return_value=migrated)):
+                await sup.handle_slow(self.campaign, 10.0, 100.0)
+
+        asyncio.run(run())
+        return sup
+
+    def test_migrate_to_spare(self):
+        sup = self.handle_slow(True)
+        self.assertEqual(sup.placements[self.campaign].slot, Slot(3, None))
+        self.assertEqual(sup.quarantined, [Slot(0, None)])
+        self.assertEqual(sup.spare_slots, [])
+
+    def test_failed_migration(self):
+        sup = self.handle_slow(False)
+        self.assertEqual(sup.placements[self.campaign].slot, Slot(0, None))
+        # The spare goes back to the spares, not to the free slots.
+        self.assertEqual(sup.spare_slots, [Slot(3, None)])
+        self.assertEqual(sup.free_slots.qsize(), 2)
+        self.assertEqual(sup.quarantined, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/bin/python3
+
+import unittest
+
+from supervisor import Campaign
+from telemetry import CampaignTelemetry, find_slow_campaigns
+
+
+def telemetry(trial_id, rate, start_time=0, fuzzer='afl', state='running'):
+    campaign_telemetry = CampaignTelemetry(Campaign(trial_id, 't', fuzzer, '/nonexistent'))
+    campaign_telemetry.values.update(execs_per_sec_ewma=rate, start_time=start_time)
+    campaign_telemetry.state = state
+    return campaign_telemetry
+
+
+class FindSlowCampaignsTest(unittest.TestCase):
+
+    def test_below_median(self):
+        slow = telemetry(0, 10.0)
+        telemetries = [slow, telemetry(1, 100.0), telemetry(2, 90.0), telemetry(3, 110.0)]
+        self.assertEqual(find_slow_campaigns(telemetries, 0.5, now=1000), [(slow, 10.0, 95.0)])
+        self.assertEqual(find_slow_campaigns(telemetries, 0.05, now=1000), [])
+
+    def test_groups(self):
+        # Each target and fuzzer has its own median, once it has min_group members.
+        telemetries = [telemetry(0, 10.0), telemetry(1, 100.0), telemetry(2, 100.0),
+                       telemetry(0, 1.0, fuzzer='aflchurn'), telemetry(1, 100.0, fuzzer='aflchurn')]
+        self.assertEqual([t.campaign.fuzzer for t, _, _ in find_slow_campaigns(telemetries, 0.5, now=1000)], ['afl'])
+        self.assertEqual(find_slow_campaigns(telemetries, 0.5, min_group=4, now=1000), [])
+
+    def test_finished_campaigns_count(self):
+        done = telemetry(0, 10.0, state='done')
+        slow = telemetry(1, 10.0)
+        telemetries = [done, slow, telemetry(2, 100.0), telemetry(3, 100.0)]
+        # Only running campaigns are flagged, but all of them make the median.
+        self.assertEqual(find_slow_campaigns(telemetries, 0.5, now=1000), [(slow, 10.0, 55.0)])
+
+    def test_warmup(self):
+        telemetries = [telemetry(0, 10.0, start_time=950), telemetry(1, 100.0), telemetry(2, 100.0),
+                       telemetry(3, None)]
+        self.assertEqual(find_slow_campaigns(telemetries, 0.5, warmup=100, now=1000), [])
+        self.assertEqual(len(find_slow_campaigns(telemetries, 0.5, warmup=10, now=1000)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from time2bug import INDEX_NAME, PLOT_DATA_COLUMNS, index_results
+
+
+def write_plot_data(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('# {}\n'.format(', '.join(PLOT_DATA_COLUMNS)))
+        for unix_time, unique_crashes in rows:
+            f.write('{}, 0, 0, 1, 1, 0, 1.00%, {}, 0, 1, 10.00\n'.format(unix_time, unique_crashes))
+
+
+class IndexResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.results_dir)
+
+    def test_empty_output_dir(self):
+        # What run_container leaves for a campaign that never started.
+        write_plot_data(os.path.join(self.results_dir, 'trial_0', 't', 'afl', 'output', 'plot_data'),
+                        [(1000, 0), (1060, 2)])
+        os.makedirs(os.path.join(self.results_dir, 'trial_0', 't', 'aflchurn', 'output'))
+
+        # Untriaged campaigns have -1 distinct bugs.
+        uncached = index_results(self.results_dir, jobs=1, use_cache=False)
+        self.assertEqual(uncached, [('trial_0', 't', 'afl', 60, 2, -1, ''),
+                                    ('trial_0', 't', 'aflchurn', -1, 0, -1, '')])
+        # Parsed once into the index, then read back from it.
+        self.assertEqual(index_results(self.results_dir, jobs=1), uncached)
+        self.assertTrue(os.path.exists(os.path.join(self.results_dir, INDEX_NAME)))
+        self.assertEqual(index_results(self.results_dir, jobs=1), uncached)
+
+
+if __name__ == '__main__':
+    unittest.main()
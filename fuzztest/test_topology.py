@@ -0,0 +1,78 @@
+#!/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from topology import (CpuInfo, Slot, flat_placement, group_slots, parse_cpu_list, plan_placement, read_topology,
+                      slot_cpus)
+
+
+def two_sockets():
+    """2 NUMA nodes of 2 cores with 2 hyperthreads each: cpu n and n + 4 are
+    siblings, cpus 0, 1, 4, 5 are on node 0."""
+    return [CpuInfo(cpu, cpu // 2 % 2, cpu % 2, cpu // 2 % 2) for cpu in range(8)]
+
+
+class PlacementTest(unittest.TestCase):
+
+    def test_parse_cpu_list(self):
+        self.assertEqual(parse_cpu_list('0-3,8,10-11\n'), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(parse_cpu_list(''), [])
+
+    def test_read_topology(self):
+        sysfs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, sysfs_dir)
+        for cpu, package, core in [(0, 0, 0), (1, 0, 0)]:
+            topo_dir = os.path.join(sysfs_dir, 'cpu', 'cpu{}'.format(cpu), 'topology')
+            os.makedirs(topo_dir)
+            for name, value in [('physical_package_id', package), ('core_id', core)]:
+                with open(os.path.join(topo_dir, name), 'w') as f:
+                    f.write('{}\n'.format(value))
+        os.makedirs(os.path.join(sysfs_dir, 'node', 'node0'))
+        with open(os.path.join(sysfs_dir, 'node', 'node0', 'cpulist'), 'w') as f:
+            f.write('0-1\n')
+
+        # cpu 2 has no topology: its own core on socket 0, no node.
+        self.assertEqual(read_topology([0, 1, 2], os.path.join(sysfs_dir, 'cpu'), os.path.join(sysfs_dir, 'node')),
+                         [CpuInfo(0, 0, 0, 0), CpuInfo(1, 0, 0, 0), CpuInfo(2, 0, 2, None)])
+
+    def test_physical_cores_first(self):
+        # One cpu per physical core, alternating between the nodes.
+        self.assertEqual(plan_placement(two_sockets(), 4), [Slot(0, 0), Slot(2, 1), Slot(1, 0), Slot(3, 1)])
+        # Then the hyperthread siblings, in the same order.
+        self.assertEqual(plan_placement(two_sockets(), 6)[4:], [Slot(4, 0), Slot(6, 1)])
+
+    def test_too_many(self):
+        with self.assertRaises(ValueError):
+            plan_placement(two_sockets(), 9)
+        with self.assertRaises(ValueError):
+            flat_placement([0, 1], 3)
+
+    def test_flat_placement(self):
+        self.assertEqual(flat_placement([3, 1, 2], 2), [Slot(3, None), Slot(1, None)])
+
+
+class GroupSlotsTest(unittest.TestCase):
+
+    def test_groups_per_node(self):
+        groups = group_slots(plan_placement(two_sockets(), 8), 2)
+        self.assertEqual(groups, [Slot('0,1', 0), Slot('2,3', 1), Slot('4,5', 0), Slot('6,7', 1)])
+        self.assertEqual(slot_cpus(groups[0]), [0, 1])
+
+    def test_groups_per_host(self):
+        slots = [Slot(0, None, 'a'), Slot(0, None, 'b'), Slot(1, None, 'a'), Slot(2, None, 'a')]
+        # The cpu left over on a, and the only one of b, are not used.
+        self.assertEqual(group_slots(slots, 2), [Slot('0,1', None, 'a')])
+
+    def test_too_few_cpus(self):
+        self.assertEqual(group_slots(plan_placement(two_sockets(), 8), 5), [])
+
+    def test_single(self):
+        slots = plan_placement(two_sockets(), 3)
+        self.assertEqual(group_slots(slots, 1), slots)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/bin/python3
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fuzzers.afl_output import RESUME_STATE, crash_inputs, file_digest
+from triage import TRIAGE_VERSION, stack_hash, triage_campaign
+
+
+class StackHashTest(unittest.TestCase):
+
+    def test_top_frames(self):
+        record = {'kind': 'heap-buffer-overflow READ', 'frames': ['a x.c', 'b x.c', 'c x.c', 'd x.c']}
+        # Frames below the top STACK_HASH_FRAMES do not matter.
+        self.assertEqual(stack_hash(record), stack_hash(dict(record, frames=record['frames'][:3] + ['e y.c'])))
+        self.assertNotEqual(stack_hash(record), stack_hash(dict(record, frames=['b x.c', 'a x.c', 'c x.c'])))
+        self.assertNotEqual(stack_hash(record), stack_hash(dict(record, kind='heap-buffer-overflow WRITE')))
+        self.assertEqual(len(stack_hash(record)), 16)
+
+
+class TriageCampaignTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        self.fuzzer_dir = os.path.join(work_dir, 'fuzzer')
+        self.output_dir = os.path.join(self.fuzzer_dir, 'output')
+        self.triage_dir = os.path.join(work_dir, 'triage')
+        os.makedirs(self.triage_dir)
+        os.makedirs(self.output_dir)
+        with open(os.path.join(self.output_dir, 'fuzzer_stats'), 'w') as f:
+            f.write('start_time        : 1000\n')
+
+    def crash(self, rel_dir, name, mtime, record):
+        """Write a crash found at |mtime| whose replay gave |record|."""
+        crash_dir = os.path.join(self.output_dir, rel_dir)
+        os.makedirs(crash_dir, exist_ok=True)
+        path = os.path.join(crash_dir, name)
+        with open(path, 'w') as f:
+            f.write(name + rel_dir)
+        os.utime(path, (mtime, mtime))
+        if record is not None:
+            with open(os.path.join(self.triage_dir, file_digest(path) + '.json'), 'w') as f:
+                json.dump(record, f)
+
+    def test_buckets(self):
+        overflow = {'reproduced': True, 'kind': 'heap-buffer-overflow READ', 'frames': ['a x.c', 'b x.c']}
+        null = {'reproduced': True, 'kind': 'SEGV', 'frames': ['c x.c']}
+        # Resumed at 2000 after 500s down: crashes of the resumed run are
+        # 500s earlier in fuzzing time.
+        with open(os.path.join(self.output_dir, RESUME_STATE), 'w') as f:
+            json.dump({'start_time': 1000, 'offset': 500, 'resumes': 1, 'history': [[2000, 500]]}, f)
+        self.crash('crashes.2020-01-01-00:00:00', 'id:000000', 1300.7, overflow)
+        self.crash('crashes', 'id:000000', 2100, null)
+        self.crash('crashes', 'id:000001', 2200, overflow)
+        self.crash(os.path.join('secondary01', 'crashes'), 'id:000000', 1900, null)
+        self.crash('crashes', 'id:000002', 2300, {'reproduced': False, 'kind': None, 'frames': []})
+        self.crash('crashes', 'id:000003', 2400, None)
+        with open(os.path.join(self.output_dir, 'secondary01', 'fuzzer_stats'), 'w') as f:
+            f.write('start_time        : 1000\n')
+
+        paths = list(crash_inputs(self.output_dir))
+        self.assertEqual(len(paths), 6)
+        triage = triage_campaign(self.fuzzer_dir, paths, self.triage_dir)
+        self.assertEqual((triage['version'], triage['crashes'], triage['replayed'], triage['reproduced']),
+                         (TRIAGE_VERSION, 6, 5, 4))
+        self.assertEqual([(bug['kind'], bug['tte'], bug['crashes'], bug['input']) for bug in triage['bugs']], [
+            ('heap-buffer-overflow READ', 300, 2, os.path.join('output', 'crashes.2020-01-01-00:00:00', 'id:000000')),
+            ('SEGV', 600, 2, os.path.join('output', 'crashes', 'id:000000')),
+        ])
+        self.assertEqual(triage['bugs'][0]['stack_hash'], stack_hash(overflow))
+
+
+if __name__ == '__main__':
+    unittest.main()
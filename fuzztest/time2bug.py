@@ -0,0 +1,259 @@
+#!/bin/python3
+
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from archive import ARCHIVE_NAME, CampaignArchive, archive_path, is_archived
+from fuzzers.afl_output import read_fuzzer_stats
+from triage import TRIAGE_NAME, read_bugs
+
+
+# Columns of afl-fuzz's plot_data, see maybe_update_plot_file() in afl-fuzz.c
+PLOT_DATA_COLUMNS = [
+    'unix_time',
+    'cycles_done',
+    'cur_path',
+    'paths_total',
+    'pending_total',
+    'pending_favs',
+    'map_size',
+    'unique_crashes',
+    'unique_hangs',
+    'max_depth',
+    'execs_per_sec',
+]
+
+PLOT_DATA_DTYPES = {
+    'unix_time': np.int64,
+    'cycles_done': np.int64,
+    'cur_path': np.int64,
+    'paths_total': np.int64,
+    'pending_total': np.int64,
+    'pending_favs': np.int64,
+    'map_size': str,  # e.g. '1.23%'
+    'unique_crashes': np.int64,
+    'unique_hangs': np.int64,
+    'max_depth': np.int64,
+    'execs_per_sec': np.float64,
+}
+
+RESULTS_HEADER = 'trial,target,fuzzer,tte,total_crashes,distinct_bugs,bug_ttes'
+
+INDEX_NAME = 'index.sqlite3'
+# Bump whenever the layout of the campaigns table changes.
+INDEX_VERSION = 3
+# Stat signature columns of a campaign, see campaign_key().
+KEY_COLUMNS = 12
+
+
+def read_plot_data(path, columns=('unix_time', 'unique_crashes')):
+    """Read the selected |columns| of a plot_data file in one pass."""
+    kwargs = dict(comment='#',
+                  header=None,
+                  names=PLOT_DATA_COLUMNS,
+                  usecols=list(columns),
+                  skipinitialspace=True,
+                  engine='c')
+    dtypes = {c: PLOT_DATA_DTYPES[c] for c in columns}
+    try:
+        return pd.read_csv(path, dtype=dtypes, **kwargs)
+    except ValueError:
+        # The last line of a running campaign may be partially written.
+        return pd.read_csv(path, **kwargs).dropna().astype(dtypes)
+
+
+def iter_campaigns(results_dir):
+    """Yield (trial, target, fuzzer, fuzzer_dir) in the same order as time2bug.sh."""
+    for trial in sorted(os.listdir(results_dir)):
+        trial_dir = os.path.join(results_dir, trial)
+        if not os.path.isdir(trial_dir):
+            continue
+        for target in sorted(os.listdir(trial_dir)):
+            target_dir = os.path.join(trial_dir, target)
+            if not os.path.isdir(target_dir):
+                continue
+            for fuzzer in sorted(os.listdir(target_dir)):
+                fuzzer_dir = os.path.join(target_dir, fuzzer)
+                if os.path.isdir(fuzzer_dir):
+                    yield trial, target, fuzzer, fuzzer_dir
+
+
+def load_plot_data(fuzzer_dir, columns=('unix_time', 'unique_crashes')):
+    """Return the selected |columns| of the plot_data of a campaign, from its
+    output directory or its archive, or None if it has none."""
+    if is_archived(fuzzer_dir):
+        with CampaignArchive(archive_path(fuzzer_dir)) as archive:
+            plot_data = archive.plot_data(columns)
+        return None if plot_data is None else pd.DataFrame(plot_data)
+
+    try:
+        return read_plot_data(os.path.join(fuzzer_dir, 'output', 'plot_data'), columns)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return None
+
+
+def load_fuzzer_stats(fuzzer_dir):
+    """Return the fuzzer_stats of a campaign, from its output directory or
+    its archive, {} if it has none."""
+    if is_archived(fuzzer_dir):
+        with CampaignArchive(archive_path(fuzzer_dir)) as archive:
+            return archive.fuzzer_stats()
+
+    fuzzer_stats_path = os.path.join(fuzzer_dir, 'output', 'fuzzer_stats')
+    if not os.path.exists(fuzzer_stats_path):
+        return {}
+    return read_fuzzer_stats(fuzzer_stats_path)
+
+
+def time_to_bug(fuzzer_dir):
+    """Return (tte, total_crashes) of a campaign, tte is -1 if nothing crashed."""
+    plot_data = load_plot_data(fuzzer_dir)
+    if plot_data is None:
+        print('      [-] plot_data missing: {}'.format(fuzzer_dir), file=sys.stderr)
+        return -1, 0
+
+    start_time = load_fuzzer_stats(fuzzer_dir).get('start_time')
+    if start_time:
+        start_time = int(start_time)
+    else:
+        print('      [-] fuzzer_stats empty!', file=sys.stderr)
+        start_time = int(plot_data['unix_time'].iat[0]) if len(plot_data) else 0
+
+    if len(plot_data) == 0:
+        return -1, 0
+
+    crashes = plot_data['unique_crashes'].to_numpy()
+    crashed = np.flatnonzero(crashes > 0)
+    tte = -1
+    if len(crashed):
+        tte = int(plot_data['unix_time'].iat[crashed[0]]) - start_time
+
+    return tte, int(crashes[-1])
+
+
+def _index_campaign(campaign):
+    trial, target, fuzzer, fuzzer_dir = campaign
+    tte, total_crashes = time_to_bug(fuzzer_dir)
+    distinct_bugs, bug_ttes = read_bugs(fuzzer_dir)
+    return trial, target, fuzzer, tte, total_crashes, distinct_bugs, bug_ttes
+
+
+def _stat_key(path):
+    """Return (mtime_ns, size, inode) of |path|, or Nones if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None, None, None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def campaign_key(fuzzer_dir):
+    """Return the stat signature deciding whether a campaign must be re-parsed."""
+    output_dir = os.path.join(fuzzer_dir, 'output')
+    return _stat_key(os.path.join(output_dir, 'plot_data')) + \
+        _stat_key(os.path.join(output_dir, 'fuzzer_stats')) + \
+        _stat_key(os.path.join(fuzzer_dir, TRIAGE_NAME)) + \
+        _stat_key(os.path.join(fuzzer_dir, ARCHIVE_NAME))
+
+
+def open_index(path):
+    """Open (and create if needed) the campaign index database at |path|."""
+    db = sqlite3.connect(path)
+    if db.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+        db.execute('DROP TABLE IF EXISTS campaigns')
+        db.execute('PRAGMA user_version = {}'.format(INDEX_VERSION))
+    db.execute('''CREATE TABLE IF NOT EXISTS campaigns (
+        trial TEXT NOT NULL,
+        target TEXT NOT NULL,
+        fuzzer TEXT NOT NULL,
+        plot_mtime_ns INTEGER,
+        plot_size INTEGER,
+        plot_ino INTEGER,
+        stats_mtime_ns INTEGER,
+        stats_size INTEGER,
+        stats_ino INTEGER,
+        triage_mtime_ns INTEGER,
+        triage_size INTEGER,
+        triage_ino INTEGER,
+        archive_mtime_ns INTEGER,
+        archive_size INTEGER,
+        archive_ino INTEGER,
+        tte INTEGER NOT NULL,
+        total_crashes INTEGER NOT NULL,
+        distinct_bugs INTEGER NOT NULL,
+        bug_ttes TEXT NOT NULL,
+        PRIMARY KEY (trial, target, fuzzer))''')
+    return db
+
+
+def _parse_campaigns(campaigns, jobs):
+    if jobs == 1 or len(campaigns) <= 1:
+        return [_index_campaign(c) for c in campaigns]
+
+    from multiprocessing import Pool
+
+    with Pool(jobs) as pool:
+        return pool.map(_index_campaign, campaigns, chunksize=8)
+
+
+def index_results(results_dir, jobs=None, use_cache=True):
+    """Return a list of (trial, target, fuzzer, tte, total_crashes,
+    distinct_bugs, bug_ttes) rows; see triage.py for the last two.
+
+    With |use_cache|, results are kept in |INDEX_NAME| under |results_dir| and
+    only campaigns whose plot_data, fuzzer_stats, triage or archive changed
+    are parsed again."""
+    campaigns = list(iter_campaigns(results_dir))
+    if not use_cache:
+        return _parse_campaigns(campaigns, jobs)
+
+    db = open_index(os.path.join(results_dir, INDEX_NAME))
+    try:
+        cached = {}
+        for row in db.execute('SELECT * FROM campaigns'):
+            cached[row[:3]] = row[3:]
+
+        keys = [campaign_key(c[3]) for c in campaigns]
+        # A campaign without any of the files has a key of Nones, so it is
+        # only fresh if it is in the index with that key.
+        stale = [(c, k) for c, k in zip(campaigns, keys)
+                 if c[:3] not in cached or cached[c[:3]][:KEY_COLUMNS] != k]
+        print('[+] {} of {} campaigns changed'.format(len(stale), len(campaigns)), file=sys.stderr)
+
+        parsed = _parse_campaigns([c for c, _ in stale], jobs)
+        with db:
+            db.executemany('INSERT OR REPLACE INTO campaigns VALUES ({})'.format(','.join('?' * (KEY_COLUMNS + 7))),
+                           [row[:3] + k + row[3:] for row, (_, k) in zip(parsed, stale)])
+            gone = set(cached) - set(c[:3] for c in campaigns)
+            db.executemany('DELETE FROM campaigns WHERE trial=? AND target=? AND fuzzer=?', gone)
+
+        for row in parsed:
+            cached[row[:3]] = (None,) * KEY_COLUMNS + row[3:]
+        return [c[:3] + cached[c[:3]][KEY_COLUMNS:] for c in campaigns]
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Calculate time to first bug of all campaigns')
+    parser.add_argument('results_dir', type=str, help='results directory of run_fuzz.py')
+    parser.add_argument('-j', '--jobs', type=int, help='parallel count of parsers', default=None)
+    parser.add_argument('--no-cache', action='store_true', help='ignore and do not update the index in results_dir')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print('Error: {} is not a directory'.format(args.results_dir), file=sys.stderr)
+        sys.exit(1)
+
+    rows = index_results(args.results_dir, args.jobs, use_cache=not args.no_cache)
+    print('[+] Indexed {} campaigns'.format(len(rows)), file=sys.stderr)
+
+    print(RESULTS_HEADER)
+    for row in rows:
+        print(','.join(str(value) for value in row))
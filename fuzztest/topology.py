@@ -0,0 +1,152 @@
+#!/bin/python3
+
+import collections
+import os
+
+
+SYSFS_CPU_DIR = '/sys/devices/system/cpu'
+SYSFS_NODE_DIR = '/sys/devices/system/node'
+
+# A cpu a container is pinned to, the NUMA node its memory is bound to (None
+# to leave memory placement to the kernel), and the host it runs on (None for
+# this one, see cluster.py).
+Slot = collections.namedtuple('Slot', ['cpu', 'node', 'host'], defaults=(None,))
+
+CpuInfo = collections.namedtuple('CpuInfo', ['cpu', 'package', 'core', 'node'])
+
+
+def parse_cpu_list(text):
+    """Parse a kernel cpu list such as '0-3,8,10-11'."""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _read(path, default=None):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except (FileNotFoundError, PermissionError):
+        return default
+
+
+def cpu_nodes(node_dir=SYSFS_NODE_DIR):
+    """Return a dict mapping cpu id to its NUMA node."""
+    nodes = {}
+    if not os.path.isdir(node_dir):
+        return nodes
+    for name in os.listdir(node_dir):
+        if not name.startswith('node') or not name[4:].isdigit():
+            continue
+        cpulist = _read(os.path.join(node_dir, name, 'cpulist'), '')
+        for cpu in parse_cpu_list(cpulist):
+            nodes[cpu] = int(name[4:])
+    return nodes
+
+
+def read_topology(cpus, cpu_dir=SYSFS_CPU_DIR, node_dir=SYSFS_NODE_DIR):
+    """Return the CpuInfo of every cpu in |cpus|."""
+    nodes = cpu_nodes(node_dir)
+    topology = []
+    for cpu in cpus:
+        topo_dir = os.path.join(cpu_dir, 'cpu{}'.format(cpu), 'topology')
+        package = int(_read(os.path.join(topo_dir, 'physical_package_id'), '0'))
+        core = int(_read(os.path.join(topo_dir, 'core_id'), str(cpu)))
+        topology.append(CpuInfo(cpu, package, core, nodes.get(cpu)))
+    return topology
+
+
+def plan_placement(topology, count):
+    """Pick |count| slots, preferring one cpu per physical core.
+
+    Physical cores are taken alternately from each NUMA node so that load and
+    memory traffic are spread over the sockets; hyperthread siblings are only
+    used once every physical core has an instance."""
+    cores = collections.OrderedDict()
+    for info in sorted(topology, key=lambda i: (i.node if i.node is not None else -1, i.package, i.core, i.cpu)):
+        cores.setdefault((info.node, info.package, info.core), []).append(info)
+
+    # rounds[i] holds the i-th hyperthread of every physical core, per node
+    rounds = []
+    for threads in cores.values():
+        for i, info in enumerate(threads):
+            if len(rounds) <= i:
+                rounds.append(collections.OrderedDict())
+            rounds[i].setdefault(info.node, []).append(info)
+
+    order = []
+    for by_node in rounds:
+        queues = list(by_node.values())
+        while any(queues):
+            for queue in queues:
+                if queue:
+                    order.append(queue.pop(0))
+
+    if count > len(order):
+        raise ValueError('Only {} cpus are available, {} requested'.format(len(order), count))
+
+    return [Slot(info.cpu, info.node) for info in order[:count]]
+
+
+def flat_placement(cpus, count):
+    """Pick the first |count| cpus without looking at the topology."""
+    if count > len(cpus):
+        raise ValueError('Only {} cpus are available, {} requested'.format(len(cpus), count))
+    return [Slot(cpu, None) for cpu in cpus[:count]]
+
+
+def group_slots(slots, size):
+    """Merge |slots| into slots of |size| cpus each, for ensemble campaigns.
+
+    The cpus of a group come from the same host and NUMA node, in the order of
+    |slots|; cpus left over are not used."""
+    if size == 1:
+        return list(slots)
+    groups = []
+    pending = collections.OrderedDict()
+    for slot in slots:
+        cpus = pending.setdefault((slot.host, slot.node), [])
+        cpus.append(slot.cpu)
+        if len(cpus) == size:
+            groups.append(Slot(','.join(str(cpu) for cpu in cpus), slot.node, slot.host))
+            del pending[(slot.host, slot.node)]
+    return groups
+
+
+def slot_cpus(slot):
+    """Return the cpu ids of |slot|."""
+    return parse_cpu_list(str(slot.cpu))
+
+
+def format_layout(slots, topology):
+    """Describe the chosen slots, one line per cpu."""
+    infos = {info.cpu: info for info in topology}
+    siblings = collections.Counter((infos[s.cpu].package, infos[s.cpu].core) for s in slots if s.cpu in infos)
+    lines = []
+    for idx, slot in enumerate(slots):
+        info = infos.get(slot.cpu)
+        if info is None:
+            lines.append('  slot {}: cpu {}'.format(idx, slot.cpu))
+            continue
+        shared = siblings[(info.package, info.core)] > 1
+        lines.append('  slot {}: cpu {} (socket {}, core {}, node {}{})'.format(
+            idx, slot.cpu, info.package, info.core,
+            'any' if slot.node is None else slot.node,
+            ', shares core with a sibling' if shared else ''))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Show the cpu placement of fuzzing containers')
+    parser.add_argument('count', type=int, help='number of containers')
+
+    args = parser.parse_args()
+
+    cpus = sorted(os.sched_getaffinity(0))
+    topology = read_topology(cpus)
+    print(format_layout(plan_placement(topology, args.count), topology))
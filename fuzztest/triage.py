@@ -0,0 +1,185 @@
+#!/bin/python3
+
+import collections
+import hashlib
+import json
+import os
+import sys
+
+from fuzzers.afl_output import crash_inputs, file_digest, fuzzing_time, read_fuzzer_stats, resume_history
+
+
+TRIAGE_NAME = 'triage.json'
+# Bump whenever the layout of triage.json changes.
+TRIAGE_VERSION = 2
+# Two crashes are the same bug when their sanitizer reports the same kind of
+# error with the same top frames.
+STACK_HASH_FRAMES = 3
+
+
+def stack_hash(record):
+    """Return the bucket of a replayed crash."""
+    key = '\n'.join([record['kind']] + record['frames'][:STACK_HASH_FRAMES])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def crash_signature(paths):
+    """Return what tells whether the crashes of a campaign changed since its
+    last triage."""
+    return [len(paths), max((os.stat(path).st_mtime_ns for path in paths), default=0)]
+
+
+def campaign_start(output_dir):
+    from time2bug import read_plot_data
+    try:
+        return int(read_fuzzer_stats(os.path.join(output_dir, 'fuzzer_stats'))['start_time'])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        return int(read_plot_data(os.path.join(output_dir, 'plot_data'))['unix_time'].iat[0])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def load_triage(fuzzer_dir):
+    """Return the triage of a campaign, also an archived one, or None if it
+    was not triaged."""
+    from archive import CampaignArchive, archive_path, is_archived
+    try:
+        if is_archived(fuzzer_dir):
+            with CampaignArchive(archive_path(fuzzer_dir)) as archive:
+                triage = json.loads(archive.read(TRIAGE_NAME))
+        else:
+            with open(os.path.join(fuzzer_dir, TRIAGE_NAME), 'r') as f:
+                triage = json.load(f)
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    return triage if triage.get('version') == TRIAGE_VERSION else None
+
+
+def read_bugs(fuzzer_dir):
+    """Return (distinct_bugs, bug_ttes) of a campaign for the results CSV.
+
+    bug_ttes lists `<stack hash>:<seconds>` of each distinct bug in the order
+    they were found, separated by ';'. distinct_bugs is -1 if the campaign was
+    not triaged."""
+    triage = load_triage(fuzzer_dir)
+    if triage is None:
+        return -1, ''
+    return len(triage['bugs']), ';'.join('{}:{}'.format(bug['stack_hash'], bug['tte']) for bug in triage['bugs'])
+
+
+def triage_campaign(fuzzer_dir, paths, triage_dir):
+    """Bucket the crashes |paths| of a campaign with the records the driver
+    left in |triage_dir|; return the triage of the campaign.
+
+    A bug was found when the oldest of its crashes was written, the time to
+    it is the fuzzing time since the start of the campaign, like the time to
+    the first crash in time2bug.py; -1 if that is unknown."""
+    start = campaign_start(os.path.join(fuzzer_dir, 'output'))
+    history = resume_history(os.path.join(fuzzer_dir, 'output'))
+    bugs = {}
+    replayed = reproduced = 0
+    for path in paths:
+        try:
+            with open(os.path.join(triage_dir, file_digest(path) + '.json'), 'r') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            continue
+        replayed += 1
+        if not record['reproduced']:
+            continue
+        reproduced += 1
+
+        tte = -1 if start is None else int(fuzzing_time(os.stat(path).st_mtime, start, history))
+        digest = stack_hash(record)
+        bug = bugs.get(digest)
+        if bug is None:
+            bug = bugs[digest] = {'stack_hash': digest, 'kind': record['kind'],
+                                  'frames': record['frames'][:STACK_HASH_FRAMES],
+                                  'tte': tte, 'crashes': 0, 'input': os.path.relpath(path, fuzzer_dir)}
+        elif tte < bug['tte']:
+            bug.update(tte=tte, input=os.path.relpath(path, fuzzer_dir))
+        bug['crashes'] += 1
+
+    return {
+        'version': TRIAGE_VERSION,
+        'signature': crash_signature(paths),
+        'crashes': len(paths),
+        'replayed': replayed,
+        'reproduced': reproduced,
+        'bugs': sorted(bugs.values(), key=lambda bug: (bug['tte'], bug['stack_hash'])),
+    }
+
+
+def save_triage(fuzzer_dir, triage):
+    path = os.path.join(fuzzer_dir, TRIAGE_NAME)
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(triage, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def triage_results(results_dir, cache_dir, force=False):
+    """Triage every campaign of |results_dir| whose crashes changed since its
+    last triage, or all of them with |force|. Archived campaigns keep the
+    triage they were packed with.
+
+    The crashes of all campaigns of a (target, fuzzer) are replayed by one
+    container of its image, against the ASan build of the target that
+    fuzzed them; replays are cached by input under |cache_dir|/<target>."""
+    from archive import is_archived
+    from run_fuzz import run_cache_step
+    from time2bug import iter_campaigns
+
+    groups = collections.defaultdict(list)
+    for trial, target, fuzzer, fuzzer_dir in iter_campaigns(results_dir):
+        if not is_archived(fuzzer_dir):
+            groups[(target, fuzzer)].append((trial, fuzzer_dir))
+
+    for (target, fuzzer), campaigns in groups.items():
+        stale = []
+        for trial, fuzzer_dir in campaigns:
+            output_dir = os.path.join(fuzzer_dir, 'output')
+            paths = list(crash_inputs(output_dir)) if os.path.isdir(output_dir) else []
+            triage = load_triage(fuzzer_dir)
+            if force or triage is None or triage['signature'] != crash_signature(paths):
+                stale.append((trial, fuzzer_dir, paths))
+        if not stale:
+            continue
+
+        triage_dir = None
+        crashing = [fuzzer_dir for _, fuzzer_dir, paths in stale if paths]
+        if crashing:
+            target_cache_dir = os.path.join(cache_dir, target)
+            os.makedirs(target_cache_dir, exist_ok=True)
+            output_dirs = [os.path.join('/results', os.path.relpath(fuzzer_dir, results_dir), 'output')
+                           for fuzzer_dir in crashing]
+            key = run_cache_step(target, fuzzer, [(results_dir, '/results:ro'), (target_cache_dir, '/triage')],
+                                 ['triage', '/triage'] + output_dirs)
+            if key is None:
+                print('[-] Failed to replay the crashes of {} for {}'.format(target, fuzzer), file=sys.stderr)
+                continue
+            triage_dir = os.path.join(target_cache_dir, key)
+
+        for trial, fuzzer_dir, paths in stale:
+            triage = triage_campaign(fuzzer_dir, paths, triage_dir)
+            save_triage(fuzzer_dir, triage)
+            print('[+] {}/{}/{}: {} crashes, {} reproduced, {} distinct bugs'.format(
+                trial, target, fuzzer, triage['crashes'], triage['reproduced'], len(triage['bugs'])), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay and deduplicate the crashes of all campaigns')
+    parser.add_argument('results_dir', type=str, help='results directory of run_fuzz.py')
+    parser.add_argument('--cache-dir', type=str, help='directory to store replay results, by input', default='./triage_cache')
+    parser.add_argument('-f', '--force', action='store_true', help='triage campaigns again even if their crashes did not change')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print('Error: {} is not a directory'.format(args.results_dir), file=sys.stderr)
+        sys.exit(1)
+
+    triage_results(os.path.abspath(args.results_dir), os.path.abspath(args.cache_dir), args.force)
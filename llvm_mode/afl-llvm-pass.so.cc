@@ -33,6 +33,7 @@
 
 #include "../config.h"
 #include "../debug.h"
+#include "churn-index.h"
 
 //#include <string.h>
 #include <set>
@@ -52,6 +53,8 @@
 #include <sys/types.h>
 #include <sys/stat.h>
 #include <fcntl.h>
+#include <time.h>
+#include <algorithm>
 
 #include "llvm/ADT/Statistic.h"
 #include "llvm/IR/IRBuilder.h"
@@ -762,6 +765,185 @@ unsigned int cal_func_flip(std::string relative_file_path, std::string git_direc
 
 
 
+/* Unix time since which changes, people and flips are counted when
+   AFLCHURN_SINCE_MONTHS is set, like git log --since=N.months; 0 otherwise. */
+u64 get_since_time(){
+
+  char* ch_month = getenv("AFLCHURN_SINCE_MONTHS");
+  if (!ch_month) return 0;
+
+  std::string since_month(ch_month);
+  if (since_month.empty() || since_month.find_first_not_of("0123456789") != std::string::npos)
+    return 0;
+
+  time_t now = time(NULL);
+  struct tm since_tm;
+  localtime_r(&now, &since_tm);
+  since_tm.tm_mon -= atoi(ch_month);
+
+  return mktime(&since_tm);
+
+}
+
+/* The functions below compute the same scores as their git command
+   counterparts above, from a history index built by churn-index.py. */
+
+/* get age of lines from the index; the first commit of a lineage is the one
+  git blame reports */
+bool index_line_age(ChurnIndex *index, std::string relative_file_path,
+                    std::map<std::string, std::map<unsigned int, double>> &file2line2age_map,
+                    unsigned long head_commit_days, unsigned long init_commit_days){
+
+  std::map<unsigned int, double> line_age_days;
+  const churn_index_file *file;
+  const u32 *ids;
+  u32 num_ids;
+  int days_since_last_change;
+
+  if (head_commit_days==WRONG_VALUE || init_commit_days==WRONG_VALUE) return false;
+
+  int max_days = head_commit_days - init_commit_days;
+
+  file = index->find_file(relative_file_path);
+  if (!file) return false;
+
+  for (u32 line = 1; line <= file->num_lines; line++){
+    if (!index->lineage(file, line, &ids, &num_ids)) continue;
+    days_since_last_change = head_commit_days - index->commit(ids[0]).author_time / 86400; //days
+    line_age_days[line] = inst_norm_age(max_days, days_since_last_change);
+  }
+
+  if (!line_age_days.empty())
+      file2line2age_map[relative_file_path] = line_age_days;
+
+  return true;
+
+}
+
+/* get rank of line ages from the index */
+bool index_line_rank(ChurnIndex *index, std::string relative_file_path,
+                std::map<std::string, std::map<unsigned int, double>> &file2line2rank_map,
+                unsigned int head_num_parents){
+
+  std::map<unsigned int, double> line_rank;
+  const churn_index_file *file;
+  const u32 *ids;
+  u32 num_ids;
+
+  if (head_num_parents == WRONG_VALUE) return false;
+
+  file = index->find_file(relative_file_path);
+  if (!file) return false;
+
+  for (u32 line = 1; line <= file->num_lines; line++){
+    if (!index->lineage(file, line, &ids, &num_ids)) continue;
+    int rank4line = head_num_parents - index->commit(ids[0]).num_parents;
+    line_rank[line] = inst_norm_rank(head_num_parents, rank4line);
+  }
+
+  if (!line_rank.empty()) file2line2rank_map[relative_file_path] = line_rank;
+  return true;
+
+}
+
+/* get line changes from the index: the commits of a line's lineage */
+void index_line_change(ChurnIndex *index, std::string relative_file_path,
+                    std::map<std::string, std::map<unsigned int, double>> &file2line2change_map,
+                    unsigned short change_sig, u64 since_time){
+
+  std::map <unsigned int, double> tmp_line2changes;
+  const churn_index_file *file;
+  const u32 *ids;
+  u32 num_ids;
+
+  file = index->find_file(relative_file_path);
+  if (!file) return;
+
+  for (u32 line = 1; line <= file->num_lines; line++){
+    if (!index->lineage(file, line, &ids, &num_ids)) continue;
+    unsigned int num_changes = 0;
+    for (u32 i = 0; i < num_ids; i++)
+      if (index->commit(ids[i]).commit_time >= since_time) num_changes++;
+    if (num_changes) tmp_line2changes[line] = inst_norm_change(num_changes, change_sig);
+  }
+
+  if (!tmp_line2changes.empty())
+    file2line2change_map[relative_file_path] = tmp_line2changes;
+
+}
+
+/* commits that changed lines [start_line, end_line] of a file since since_time,
+  newest first like git log */
+std::vector<u32> index_range_commits(ChurnIndex *index, std::string relative_file_path,
+                unsigned int start_line, unsigned int end_line, u64 since_time){
+
+  std::set<u32> commit_set;
+  std::vector<u32> commits;
+  const churn_index_file *file;
+  const u32 *ids;
+  u32 num_ids;
+
+  file = index->find_file(relative_file_path);
+  if (!file) return commits;
+
+  for (u32 line = start_line; line <= end_line; line++){
+    if (!index->lineage(file, line, &ids, &num_ids)) continue;
+    for (u32 i = 0; i < num_ids; i++)
+      if (index->commit(ids[i]).commit_time >= since_time) commit_set.insert(ids[i]);
+  }
+
+  commits.assign(commit_set.begin(), commit_set.end());
+  std::sort(commits.begin(), commits.end(), [index](u32 a, u32 b){
+    u64 ta = index->commit(a).commit_time, tb = index->commit(b).commit_time;
+    return ta != tb ? ta > tb : a > b;
+  });
+
+  return commits;
+
+}
+
+/* get number of people who changed a function from the index */
+unsigned int index_func_people(ChurnIndex *index, std::string relative_file_path,
+                std::string func_name, unsigned int start_line, unsigned int end_line,
+                u64 since_time) {
+
+  std::set<u32> authors;
+
+  for (u32 id : index_range_commits(index, relative_file_path, start_line, end_line, since_time))
+    authors.insert(index->commit(id).author);
+
+  if (authors.empty())
+    WARNF("num_people is 0! filepath: %s, func_name: %s, start_line: %u, end_line: %u",
+          relative_file_path.c_str(), func_name.c_str(), start_line, end_line);
+  return authors.size();
+}
+
+/* get the number of changing flip of a function from the index */
+unsigned int index_func_flip(ChurnIndex *index, std::string relative_file_path,
+                std::string func_name, unsigned int start_line, unsigned int end_line,
+                u64 since_time) {
+
+  unsigned int num_flip = 0;
+  bool first = true;
+  u32 last_author = 0;
+
+  for (u32 id : index_range_commits(index, relative_file_path, start_line, end_line, since_time)) {
+    u32 author = index->commit(id).author;
+    if (first || author != last_author) {
+      num_flip++;
+      last_author = author;
+      first = false;
+    }
+  }
+
+  if (num_flip == 0)
+    WARNF("num_flip is 0! filepath: %s, func_name: %s, start_line: %u, end_line: %u",
+          relative_file_path.c_str(), func_name.c_str(), start_line, end_line);
+
+  return num_flip;
+}
+
+
 /* Check if file exists in HEAD using command mode.
 return:
     exist: 1; not exist: 0 */
@@ -972,6 +1154,16 @@ bool AFLCoverage::runOnModule(Module &M) {
 
   }
 
+  /* History indexes of churn-index.py, used instead of git commands for
+     the repositories they cover. */
+
+  std::vector<ChurnIndex*> churn_indexes;
+  ChurnIndex *churn_index = NULL;
+  char *churn_index_str = getenv("AFLCHURN_INDEX");
+  u64 since_time = get_since_time();
+
+  if (churn_index_str) churn_indexes = load_churn_indexes(churn_index_str);
+
   /* Get globals for the SHM region and the previous location. Note that
      __afl_prev_loc is thread-local. */
 
@@ -1046,19 +1238,29 @@ bool AFLCoverage::runOnModule(Module &M) {
               if (!git_no_found){
                 /* Directory of the file. */
                 func_abs_path = func_abs_path.substr(0, func_abs_path.find_last_of("\\/")); //remove filename in string
-                //git rev-parse --show-toplevel: show the root folder of a repository
-                // result: /home/usr/repo_name
-                std::string cmd_repo ("git rev-parse --show-toplevel 2>&1");
-                
-                git_path = execute_git_cmd(func_abs_path, cmd_repo);
+                churn_index = find_churn_index(churn_indexes, func_abs_path);
+                if (churn_index){
+                  git_path = churn_index->root();
+                } else {
+                  //git rev-parse --show-toplevel: show the root folder of a repository
+                  // result: /home/usr/repo_name
+                  std::string cmd_repo ("git rev-parse --show-toplevel 2>&1");
+                  
+                  git_path = execute_git_cmd(func_abs_path, cmd_repo);
+                }
                 if (git_path.empty()) git_no_found = 1;
                 else git_path.append("/"); // result: /home/usr/repo_name/
                 
                 /* Check shallow git repository */
                 // git rev-list HEAD --count: count the number of commits
                 if (!git_no_found){
-                  std::string cmd_count ("git rev-list HEAD --count 2>&1");
-                  std::string commit_cnt = execute_git_cmd(git_path, cmd_count);
+                  std::string commit_cnt;
+                  if (churn_index){
+                    commit_cnt = std::to_string(churn_index->head_num_parents());
+                  } else {
+                    std::string cmd_count ("git rev-list HEAD --count 2>&1");
+                    commit_cnt = execute_git_cmd(git_path, cmd_count);
+                  }
                   
                   if (commit_cnt.compare("1") == 0){ //only one commit
                     git_no_found = 1;
@@ -1069,12 +1271,18 @@ bool AFLCoverage::runOnModule(Module &M) {
                   // #change threshold
                   // changes_inst_threshold = get_threshold_changes(git_path);
                   //get commit time
-                  std::string head_cmd("git show -s --format=%ct HEAD");
-                  head_commit_days = get_commit_time_days(git_path, head_cmd);
-                  std::string init_cmd("git log --reverse --date=unix --oneline --format=%cd | head -n1");
-                  init_commit_days = get_commit_time_days(git_path, init_cmd);
-                  /* Get the number of commits before HEAD */
-                  head_num_parents = get_max_ranks(git_path);
+                  if (churn_index){
+                    head_commit_days = churn_index->head_time() / 86400;
+                    init_commit_days = churn_index->init_time() / 86400;
+                    head_num_parents = churn_index->head_num_parents();
+                  } else {
+                    std::string head_cmd("git show -s --format=%ct HEAD");
+                    head_commit_days = get_commit_time_days(git_path, head_cmd);
+                    std::string init_cmd("git log --reverse --date=unix --oneline --format=%cd | head -n1");
+                    init_commit_days = get_commit_time_days(git_path, init_cmd);
+                    /* Get the number of commits before HEAD */
+                    head_num_parents = get_max_ranks(git_path);
+                  }
                   /* thresholds */
                   norm_change_thd = inst_norm_change(THRESHOLD_CHANGES, change_sig);
                   norm_age_thd = inst_norm_age(head_commit_days - init_commit_days, THRESHOLD_DAYS);
@@ -1096,11 +1304,17 @@ bool AFLCoverage::runOnModule(Module &M) {
 
                   std::string funcfile_clean_relative_path = get_file_path_relative_to_git_dir(funcfile, funcdir, git_path);
                   if (use_cmd_people) {
-                    func_people_num = cal_func_people(funcfile_clean_relative_path, git_path, func_name, func_start_line, func_end_line);
+                    if (churn_index)
+                      func_people_num = index_func_people(churn_index, funcfile_clean_relative_path, func_name, func_start_line, func_end_line, since_time);
+                    else
+                      func_people_num = cal_func_people(funcfile_clean_relative_path, git_path, func_name, func_start_line, func_end_line);
                   }
 
                   if (use_cmd_flip) {
-                    func_flip_num = cal_func_flip(funcfile_clean_relative_path, git_path, func_name, func_start_line, func_end_line);
+                    if (churn_index)
+                      func_flip_num = index_func_flip(churn_index, funcfile_clean_relative_path, func_name, func_start_line, func_end_line, since_time);
+                    else
+                      func_flip_num = cal_func_flip(funcfile_clean_relative_path, git_path, func_name, func_start_line, func_end_line);
                   }
 
                   break;
@@ -1175,24 +1389,42 @@ bool AFLCoverage::runOnModule(Module &M) {
                 if (!processed_files.count(clean_relative_path)){
                   processed_files.insert(clean_relative_path);
 
-                  /* Check if file exists in HEAD using command mode */
-                  if (!is_file_exist(clean_relative_path, git_path)){
-                    unexist_files.insert(clean_relative_path);
-                    break;
+                  if (churn_index){
+                    /* Only files in HEAD are indexed */
+                    if (!churn_index->find_file(clean_relative_path)){
+                      unexist_files.insert(clean_relative_path);
+                      break;
+                    }
+
+                    if (use_cmd_age)
+                      index_line_age(churn_index, clean_relative_path, map_age_scores,
+                                      head_commit_days, init_commit_days);
+                    if (use_cmd_age_rank)
+                      index_line_rank(churn_index, clean_relative_path, map_rank_age,
+                                      head_num_parents);
+                    if (use_cmd_change)
+                      index_line_change(churn_index, clean_relative_path,
+                                        map_bursts_scores, change_sig, since_time);
+                  } else {
+                    /* Check if file exists in HEAD using command mode */
+                    if (!is_file_exist(clean_relative_path, git_path)){
+                      unexist_files.insert(clean_relative_path);
+                      break;
+                    }
+                    
+                    /* the ages for lines */
+                    if (use_cmd_age) 
+                      calculate_line_age_git_cmd(clean_relative_path, git_path, map_age_scores,
+                                                  head_commit_days, init_commit_days);
+                    if (use_cmd_age_rank)
+                      cal_line_age_rank(clean_relative_path, git_path, map_rank_age, 
+                                              commit_rank, head_num_parents);
+                    /* the number of changes for lines */
+                    if (use_cmd_change)
+                      calculate_line_change_git_cmd(clean_relative_path, git_path, 
+                                                        map_bursts_scores, change_sig);
                   }
                   
-                  /* the ages for lines */
-                  if (use_cmd_age) 
-                    calculate_line_age_git_cmd(clean_relative_path, git_path, map_age_scores,
-                                                head_commit_days, init_commit_days);
-                  if (use_cmd_age_rank)
-                    cal_line_age_rank(clean_relative_path, git_path, map_rank_age, 
-                                            commit_rank, head_num_parents);
-                  /* the number of changes for lines */
-                  if (use_cmd_change)
-                    calculate_line_change_git_cmd(clean_relative_path, git_path, 
-                                                      map_bursts_scores, change_sig);
-                  
                 }
                 
                 if (use_cmd_age){
@@ -1399,6 +1631,8 @@ bool AFLCoverage::runOnModule(Module &M) {
   OKF("BB Churn Raw Fitness. Instrumented %u BBs with average raw fitness of %.6f",
                   inst_fitness, module_ave_fitness);
 
+  for (auto index : churn_indexes) delete index;
+
 
   return true;
 
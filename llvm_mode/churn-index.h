@@ -0,0 +1,230 @@
+/*
+   aflchurn - churn index reader
+   -----------------------------
+
+   Read-only, memory-mapped view of the history index written by
+   churn-index.py. The layout below must be kept in sync with the struct
+   formats at the top of that script; all values are little-endian.
+
+     header
+     commits[num_commits]   in topological order, parents first
+     files[num_files]       sorted by path, relative to the repository root
+     lines[num_lines]       lines of file i start at files[i].first_line
+     refs[num_refs]         lineages: commit ids, the last change first
+     strings                repository root and file paths
+
+*/
+
+#ifndef _HAVE_CHURN_INDEX_H
+#define _HAVE_CHURN_INDEX_H
+
+#include <string>
+#include <vector>
+
+#include <string.h>
+#include <unistd.h>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+
+#include "../types.h"
+#include "../debug.h"
+
+#define CHURN_INDEX_MAGIC   "AFLCHIDX"
+#define CHURN_INDEX_VERSION 1
+
+struct churn_index_header {
+  char magic[8];
+  u32  version;
+  u32  num_commits;
+  u32  num_files;
+  u32  num_lines;
+  u32  num_refs;
+  u32  head_num_parents;     /* git rev-list --count HEAD            */
+  u64  head_time;            /* committer time of HEAD               */
+  u64  init_time;            /* committer time of the oldest commit  */
+  u64  commits_off;
+  u64  files_off;
+  u64  lines_off;
+  u64  refs_off;
+  u64  strings_off;
+  u32  root_off;
+  u32  root_len;
+};
+
+struct churn_index_commit {
+  u64 author_time;
+  u64 commit_time;
+  u32 author;                /* author id, same id for the same name/email */
+  u32 num_parents;           /* git rev-list --count of the commit         */
+};
+
+struct churn_index_file {
+  u32 path_off;
+  u32 path_len;
+  u32 first_line;
+  u32 num_lines;
+};
+
+struct churn_index_line {
+  u32 ref_off;
+  u32 ref_len;
+};
+
+static_assert(sizeof(struct churn_index_header) == 96, "churn index header layout");
+static_assert(sizeof(struct churn_index_commit) == 24, "churn index commit layout");
+static_assert(sizeof(struct churn_index_file) == 16, "churn index file layout");
+static_assert(sizeof(struct churn_index_line) == 8, "churn index line layout");
+
+
+class ChurnIndex {
+
+  public:
+
+    ChurnIndex() : base(NULL), size(0) { }
+
+    ~ChurnIndex() {
+      if (base) munmap(base, size);
+    }
+
+    /* Map the index at |path|, return false if it is missing or invalid. */
+    bool load(const char *path) {
+
+      struct stat st;
+      int fd = open(path, O_RDONLY);
+      if (fd < 0) return false;
+
+      if (fstat(fd, &st) || (size_t)st.st_size < sizeof(churn_index_header)) {
+        close(fd);
+        return false;
+      }
+
+      size = st.st_size;
+      base = (u8*)mmap(NULL, size, PROT_READ, MAP_PRIVATE, fd, 0);
+      close(fd);
+      if (base == MAP_FAILED) {
+        base = NULL;
+        return false;
+      }
+
+      hdr = (const churn_index_header*)base;
+      if (memcmp(hdr->magic, CHURN_INDEX_MAGIC, 8) || hdr->version != CHURN_INDEX_VERSION ||
+          hdr->commits_off + (u64)hdr->num_commits * sizeof(churn_index_commit) > size ||
+          hdr->files_off + (u64)hdr->num_files * sizeof(churn_index_file) > size ||
+          hdr->lines_off + (u64)hdr->num_lines * sizeof(churn_index_line) > size ||
+          hdr->refs_off + (u64)hdr->num_refs * sizeof(u32) > size ||
+          hdr->strings_off + hdr->root_off + hdr->root_len > size)
+        return false;
+
+      commits = (const churn_index_commit*)(base + hdr->commits_off);
+      files = (const churn_index_file*)(base + hdr->files_off);
+      lines = (const churn_index_line*)(base + hdr->lines_off);
+      refs = (const u32*)(base + hdr->refs_off);
+      strings = (const char*)(base + hdr->strings_off);
+      root_path.assign(strings + hdr->root_off, hdr->root_len);
+
+      return true;
+
+    }
+
+    /* Absolute path of the repository root, without a trailing slash. */
+    const std::string &root() const { return root_path; }
+
+    /* True if |abs_path| is inside this repository. */
+    bool contains(const std::string &abs_path) const {
+      return abs_path.compare(0, root_path.length(), root_path) == 0 &&
+             (abs_path.length() == root_path.length() ||
+              abs_path[root_path.length()] == '/');
+    }
+
+    u32 head_num_parents() const { return hdr->head_num_parents; }
+    u64 head_time() const { return hdr->head_time; }
+    u64 init_time() const { return hdr->init_time; }
+
+    const churn_index_commit &commit(u32 id) const { return commits[id]; }
+
+    /* File entry of |relative_path| in HEAD, NULL if it is not indexed. */
+    const churn_index_file *find_file(const std::string &relative_path) const {
+
+      u32 lo = 0, hi = hdr->num_files;
+
+      while (lo < hi) {
+        u32 mid = lo + (hi - lo) / 2;
+        int cmp = relative_path.compare(0, std::string::npos,
+                                        strings + files[mid].path_off, files[mid].path_len);
+        if (!cmp) return &files[mid];
+        if (cmp < 0) hi = mid;
+        else lo = mid + 1;
+      }
+
+      return NULL;
+
+    }
+
+    /* Lineage of 1-based |line| in |file|: the commit that last changed it
+       first, followed by the older commits it descends from. */
+    bool lineage(const churn_index_file *file, u32 line,
+                 const u32 **ids, u32 *num_ids) const {
+
+      if (!line || line > file->num_lines) return false;
+      const churn_index_line &l = lines[file->first_line + line - 1];
+      *ids = refs + l.ref_off;
+      *num_ids = l.ref_len;
+      return l.ref_len > 0;
+
+    }
+
+  private:
+
+    u8 *base;
+    size_t size;
+    const churn_index_header *hdr;
+    const churn_index_commit *commits;
+    const churn_index_file *files;
+    const churn_index_line *lines;
+    const u32 *refs;
+    const char *strings;
+    std::string root_path;
+
+};
+
+
+/* Load the colon-separated list of indexes in |paths| (AFLCHURN_INDEX). */
+static inline std::vector<ChurnIndex*> load_churn_indexes(const char *paths) {
+
+  std::vector<ChurnIndex*> indexes;
+  std::string list(paths);
+  size_t start = 0;
+
+  while (start <= list.length()) {
+    size_t end = list.find(':', start);
+    if (end == std::string::npos) end = list.length();
+    std::string path = list.substr(start, end - start);
+    if (!path.empty()) {
+      ChurnIndex *index = new ChurnIndex();
+      if (index->load(path.c_str())) indexes.push_back(index);
+      else {
+        WARNF("Unable to load churn index '%s', falling back to git.", path.c_str());
+        delete index;
+      }
+    }
+    start = end + 1;
+  }
+
+  return indexes;
+
+}
+
+
+/* Index of the repository containing |abs_path|, NULL if there is none. */
+static inline ChurnIndex *find_churn_index(const std::vector<ChurnIndex*> &indexes,
+                                           const std::string &abs_path) {
+
+  for (auto index : indexes)
+    if (index->contains(abs_path)) return index;
+
+  return NULL;
+
+}
+
+#endif /* !_HAVE_CHURN_INDEX_H */
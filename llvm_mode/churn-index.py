@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+#
+# aflchurn - churn index builder
+# ------------------------------
+#
+# Walks the history of a git repository once and writes a compact,
+# memory-mappable index that afl-llvm-pass.so loads (see AFLCHURN_INDEX and
+# churn-index.h) instead of running git log/show/diff/blame/rev-list through
+# popen() for every source file of every translation unit.
+#
+# For every line of every source file in HEAD the index stores its lineage:
+# the commits that changed the line or the lines it replaced, the commit that
+# last changed it first. Age, rank, #changes, #people and #flips are all
+# derived from the lineage by the pass, so the same index serves every
+# AFLCHURN_* configuration.
+#
+# The history is replayed along the first-parent chain, which reconstructs
+# HEAD exactly. Lines changed by a merge are attributed to the commits of the
+# merged branch that touched the file.
+#
+
+import argparse
+import array
+import os
+import re
+import struct
+import subprocess
+import sys
+
+
+INDEX_MAGIC = b'AFLCHIDX'
+INDEX_VERSION = 1
+
+# Keep in sync with churn-index.h
+HEADER = struct.Struct('<8s6I2Q5Q2I')
+COMMIT = struct.Struct('<QQII')
+FILE = struct.Struct('<IIII')
+LINE = struct.Struct('<II')
+
+INDEX_NAME = 'aflchurn.idx'
+
+SOURCE_EXTENSIONS = ['c', 'h', 'cc', 'cpp', 'cxx', 'c++', 'hh', 'hpp', 'hxx', 'h++', 'inc', 'inl', 'def', 'S']
+
+HUNK_RE = re.compile(rb'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def git(repo, *args):
+    return subprocess.check_output(['git', '-C', repo] + list(args))
+
+
+def git_stream(repo, *args):
+    return subprocess.Popen(['git', '-C', repo, '-c', 'core.quotePath=false'] + list(args),
+                            stdout=subprocess.PIPE, bufsize=1 << 20)
+
+
+def pathspecs(extensions):
+    return ['--'] + ['*.{}'.format(ext) for ext in extensions]
+
+
+def read_commits(repo):
+    """Return commits in topological order (parents first).
+
+    Each commit is [sha, parent shas, author time, commit time, author]."""
+    out = git(repo, 'log', '--topo-order', '--reverse',
+              '--format=%H%x00%P%x00%at%x00%ct%x00%an <%ae>')
+    commits = []
+    for line in out.split(b'\n'):
+        if not line:
+            continue
+        sha, parents, author_time, commit_time, author = line.split(b'\0', 4)
+        commits.append([sha, parents.split(), int(author_time), int(commit_time), author])
+    return commits
+
+
+def ancestry(commits, index):
+    """Return (counts, sides).
+
+    counts[i] is `git rev-list --count` of commit i; sides maps the index of a
+    merge commit to the bitset of commits it brings in from its other parents.
+    Ancestor sets are Python ints used as bitsets and dropped as soon as the
+    last child of a commit has been visited."""
+    children = [0] * len(commits)
+    for _, parents, _, _, _ in commits:
+        for parent in parents:
+            if parent in index:
+                children[index[parent]] += 1
+
+    counts = [0] * len(commits)
+    sides = {}
+    bits = {}
+    for i, (_, parents, _, _, _) in enumerate(commits):
+        parents = [index[p] for p in parents if p in index]
+        mine = 1 << i
+        for parent in parents:
+            mine |= bits[parent]
+        if len(parents) > 1:
+            others = 0
+            for parent in parents[1:]:
+                others |= bits[parent]
+            sides[i] = others & ~bits[parents[0]]
+        for parent in parents:
+            children[parent] -= 1
+            if children[parent] == 0:
+                del bits[parent]
+        counts[i] = bin(mine).count('1')
+        if children[i]:
+            bits[i] = mine
+    return counts, sides
+
+
+def touched_files(repo, extensions):
+    """Return a dict mapping commit sha to the set of source paths it touches."""
+    proc = git_stream(repo, 'log', '--no-renames', '--name-only', '--format=%x01%H', *pathspecs(extensions))
+    touched = {}
+    files = None
+    for line in proc.stdout:
+        line = line.rstrip(b'\n')
+        if line.startswith(b'\x01'):
+            files = touched.setdefault(line[1:], set())
+        elif line and files is not None:
+            files.add(line)
+    if proc.wait():
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return touched
+
+
+def bits_to_indices(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class Lineages:
+    """Line lineages of every file while the history is replayed."""
+
+    def __init__(self, commits, sides, touched):
+        self.commits = commits
+        self.sides = sides
+        self.touched = touched
+        self.files = {}
+
+    def introducers(self, commit, path):
+        """Commits a change of |commit| to |path| is attributed to."""
+        side = self.sides.get(commit)
+        if side is None:
+            return [commit]
+        found = [c for c in bits_to_indices(side) if path in self.touched.get(self.commits[c][0], ())]
+        return found or [commit]
+
+    def apply(self, commit, path, hunks):
+        """Apply the -U0 |hunks| of |commit| on |path|, bottom-up so that
+        the old line numbers of earlier hunks stay valid."""
+        lines = self.files.setdefault(path, [])
+        introducers = None
+        for old_start, old_count, new_count in reversed(hunks):
+            start = old_start if old_count == 0 else old_start - 1
+            replaced = lines[start:start + old_count]
+            if new_count:
+                if introducers is None:
+                    introducers = self.introducers(commit, path)
+                # the most recent introducer is the commit git blame reports
+                last = max(introducers, key=lambda c: (self.commits[c][2], c))
+                history = set(introducers)
+                for lineage in set(replaced):
+                    history.update(lineage)
+                history.discard(last)
+                lineage = (last,) + tuple(sorted(history, reverse=True))
+                lines[start:start + old_count] = [lineage] * new_count
+            else:
+                del lines[start:start + old_count]
+
+    def rename(self, old_path, new_path):
+        if old_path in self.files:
+            self.files[new_path] = self.files.pop(old_path)
+
+    def delete(self, path):
+        self.files.pop(path, None)
+
+
+def strip_path(raw, prefix):
+    path = raw.rstrip(b'\t')
+    if path == b'/dev/null':
+        return None
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+
+def replay_history(repo, commits, index, lineages, extensions):
+    """Replay the first-parent history of |repo| into |lineages|."""
+    proc = git_stream(repo, 'log', '--first-parent', '-m', '--reverse', '-p', '-U0', '-M',
+                      '--no-color', '--no-ext-diff', '--format=%x01%H', *pathspecs(extensions))
+
+    commit = None
+    old_path = new_path = None
+    hunks = []
+    pending = 0  # '-' and '+' lines left in the current hunk
+
+    def flush():
+        if hunks and new_path is not None:
+            lineages.apply(commit, new_path, hunks)
+        elif new_path is None and old_path is not None:
+            lineages.delete(old_path)
+        hunks.clear()
+
+    for line in proc.stdout:
+        if pending:
+            if line[:1] in (b'-', b'+'):
+                pending -= 1
+            continue
+
+        line = line.rstrip(b'\n')
+        if line.startswith(b'\x01'):
+            flush()
+            commit = index[line[1:]]
+            old_path = new_path = None
+        elif line.startswith(b'diff --git '):
+            flush()
+            old_path = new_path = None
+        elif line.startswith(b'rename from '):
+            old_path = line[len(b'rename from '):]
+        elif line.startswith(b'rename to '):
+            new_path = line[len(b'rename to '):]
+            lineages.rename(old_path, new_path)
+        elif line.startswith(b'--- '):
+            old_path = strip_path(line[4:], b'a/')
+        elif line.startswith(b'+++ '):
+            new_path = strip_path(line[4:], b'b/')
+            if new_path is None:
+                lineages.delete(old_path)
+        elif line.startswith(b'@@ '):
+            match = HUNK_RE.match(line)
+            old_start, old_count, _, new_count = match.groups()
+            old_count = 1 if old_count is None else int(old_count)
+            new_count = 1 if new_count is None else int(new_count)
+            hunks.append((int(old_start), old_count, new_count))
+            pending = old_count + new_count
+    flush()
+
+    if proc.wait():
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+def write_index(path, root, commits, counts, files):
+    """Serialize the index, see churn-index.h for the layout."""
+    authors = {}
+    commit_table = bytearray()
+    for (_, _, author_time, commit_time, author), count in zip(commits, counts):
+        author_id = authors.setdefault(author, len(authors))
+        commit_table += COMMIT.pack(author_time, commit_time, author_id, count)
+
+    strings = bytearray(root)
+    file_table = bytearray()
+    line_table = array.array('I')
+    refs = array.array('I')
+    ref_offsets = {}
+    num_lines = 0
+    for name in sorted(files):
+        lines = files[name]
+        file_table += FILE.pack(len(strings), len(name), num_lines, len(lines))
+        strings += name
+        for lineage in lines:
+            offset = ref_offsets.get(lineage)
+            if offset is None:
+                offset = ref_offsets[lineage] = len(refs)
+                refs.extend(lineage)
+            line_table.extend((offset, len(lineage)))
+        num_lines += len(lines)
+
+    head_count = counts[-1] if counts else 0
+    head_time = commits[-1][3] if commits else 0
+    init_time = min(c[3] for c in commits) if commits else 0
+
+    def align(offset):
+        return (offset + 7) & ~7
+
+    commits_off = HEADER.size
+    files_off = align(commits_off + len(commit_table))
+    lines_off = align(files_off + len(file_table))
+    refs_off = align(lines_off + line_table.itemsize * len(line_table))
+    strings_off = align(refs_off + refs.itemsize * len(refs))
+
+    header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(commits), len(files), num_lines, len(refs),
+                         head_count, head_time, init_time,
+                         commits_off, files_off, lines_off, refs_off, strings_off,
+                         0, len(root))
+
+    if sys.byteorder != 'little':
+        line_table.byteswap()
+        refs.byteswap()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for offset, blob in ((0, header), (commits_off, commit_table), (files_off, file_table),
+                             (lines_off, line_table.tobytes()), (refs_off, refs.tobytes()),
+                             (strings_off, strings)):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(blob)
+    os.rename(tmp_path, path)
+
+
+def find_repositories(src_dir, depth=2):
+    """Return the roots of the git repositories at most |depth| levels below |src_dir|."""
+    repos = []
+    for dirpath, dirnames, _ in os.walk(src_dir):
+        if os.path.isdir(os.path.join(dirpath, '.git')):
+            repos.append(dirpath)
+            dirnames[:] = []
+        elif dirpath[len(src_dir):].count(os.sep) >= depth:
+            dirnames[:] = []
+        else:
+            dirnames[:] = [d for d in dirnames if d not in ('proc', 'sys', 'dev', 'usr', 'lib', 'tmp')]
+    return repos
+
+
+def build_index(repo, output=None, extensions=SOURCE_EXTENSIONS):
+    """Build the churn index of |repo|, return its path or None for shallow clones."""
+    root = os.path.realpath(git(repo, 'rev-parse', '--show-toplevel').decode().strip())
+    if output is None:
+        output = os.path.join(git(repo, 'rev-parse', '--absolute-git-dir').decode().strip(), INDEX_NAME)
+
+    commits = read_commits(root)
+    if len(commits) <= 1:
+        print('[-] {}: shallow repository, no index written'.format(root), file=sys.stderr)
+        return None
+
+    index = {c[0]: i for i, c in enumerate(commits)}
+    counts, sides = ancestry(commits, index)
+    touched = touched_files(root, extensions) if sides else {}
+
+    lineages = Lineages(commits, sides, touched)
+    replay_history(root, commits, index, lineages, extensions)
+
+    write_index(output, root.encode(), commits, counts, lineages.files)
+    print('[+] {}: indexed {} commits, {} files -> {}'.format(root, len(commits), len(lineages.files), output), file=sys.stderr)
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the aflchurn history index of git repositories')
+    parser.add_argument('repos', nargs='*', help='git repositories (default: all repositories under --src)')
+    parser.add_argument('--src', type=str, help='directory to search for repositories', default=os.environ.get('SRC', '.'))
+    parser.add_argument('-o', '--output', type=str, help='index path, only with a single repository', default=None)
+    parser.add_argument('--extensions', nargs='+', help='source file extensions to index', default=SOURCE_EXTENSIONS)
+
+    args = parser.parse_args()
+
+    repos = args.repos or find_repositories(os.path.abspath(args.src))
+    if args.output and len(repos) != 1:
+        parser.error('--output needs exactly one repository')
+
+    indexes = [build_index(repo, args.output, args.extensions) for repo in repos]
+    # Colon-separated list, ready to be used as AFLCHURN_INDEX.
+    print(':'.join(i for i in indexes if i))